@@ -1,10 +1,32 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from database import db
+from serializers import FastJSONProvider
+from compression import init_compression
+from query_stats import init_query_stats
+from metrics import init_metrics
+from logging_config import init_logging
+from profiling import init_profiling
+from passwords import init_passwords
+from rate_limit import init_rate_limit
+from revocation import init_revocation
+from authz import init_authz
+from datetime import timedelta
+import json
+import logging
 import os
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # orjson-backed when installed, native datetime support
+logger = logging.getLogger(__name__)
+
+# Logging: JSON records (or LOG_FORMAT=text) written off the request thread
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'json')
+app.config['LOG_DEBUG_SAMPLE_RATE'] = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 1.0))  # Fraction of DEBUG records kept
+init_logging(app)
 
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -15,15 +37,86 @@ base_dir = os.path.dirname(os.path.abspath(__file__))
 instance_dir = os.path.join(base_dir, 'instance')
 os.makedirs(instance_dir, exist_ok=True)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(instance_dir, "gm_finance.db")}'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', f'sqlite:///{os.path.join(instance_dir, "gm_finance.db")}')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = os.path.join(base_dir, 'uploads')
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    # Wait for the write lock instead of failing with "database is locked" when several workers write
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 30))}}
+app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', os.path.join(base_dir, 'uploads'))
+app.config['ENTITY_UPLOAD_WORKERS'] = int(os.environ.get('ENTITY_UPLOAD_WORKERS', 4))  # Parallel file saves per entity creation
+app.config['ENTITY_IMPORT_CHUNK_SIZE'] = int(os.environ.get('ENTITY_IMPORT_CHUNK_SIZE', 500))  # Rows per insert in bulk imports
+app.config['ENTITY_REVIEW_BATCH_LIMIT'] = int(os.environ.get('ENTITY_REVIEW_BATCH_LIMIT', 1000))  # Max entities per bulk approve/reject
+
+# Store re-uploaded text/spreadsheet versions as deltas against the previous version
+app.config['DOCUMENT_DELTA_STORAGE'] = os.environ.get('DOCUMENT_DELTA_STORAGE', 'false').lower() == 'true'
+app.config['DELTA_SNAPSHOT_INTERVAL'] = max(1, int(os.environ.get('DELTA_SNAPSHOT_INTERVAL', 10)))  # 1 = every version full
+
+# Cold tier: compress documents older than this or belonging to closed financial years
+app.config['COLD_STORAGE_AGE_DAYS'] = int(os.environ.get('COLD_STORAGE_AGE_DAYS', 180))
+app.config['COLD_STORAGE_CODEC'] = os.environ.get('COLD_STORAGE_CODEC', 'gzip')  # gzip, xz, zstd
+
+# Compress JSON responses above this size (gzip, or brotli when installed)
+app.config['COMPRESS_RESPONSES'] = os.environ.get('COMPRESS_RESPONSES', 'true').lower() == 'true'
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+app.config['COMPRESS_BROTLI_LEVEL'] = int(os.environ.get('COMPRESS_BROTLI_LEVEL', 5))
+app.config['STREAM_BATCH_SIZE'] = int(os.environ.get('STREAM_BATCH_SIZE', 500))  # Rows per chunk in ?stream= responses
+
+# Per-request query counting: X-Query-* headers in development, a log line for N+1 patterns otherwise
+app.config['QUERY_STATS'] = os.environ.get('QUERY_STATS', 'true').lower() == 'true'
+app.config['QUERY_STATS_HEADERS'] = os.environ.get('QUERY_STATS_HEADERS', 'false').lower() == 'true'
+app.config['QUERY_REPEAT_THRESHOLD'] = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 5))  # Same statement this often in one request = N+1
+
+# Prometheus metrics at /metrics (needs prometheus_client); set METRICS_TOKEN to require a bearer token
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+app.config['ACTIVE_SESSION_WINDOW_HOURS'] = int(os.environ.get('ACTIVE_SESSION_WINDOW_HOURS', 12))
+
+# On-demand request profiles (switched on by a super admin at /api/profiling/settings)
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(instance_dir, 'profiles'))
+app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', 50))  # Newest profiles kept on disk
+
+# Let the fronting web server send stored documents instead of a worker:
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache mod_xsendfile, lighttpd)
+app.config['DOCUMENT_OFFLOAD'] = os.environ.get('DOCUMENT_OFFLOAD', '').lower()
+app.config['DOCUMENT_OFFLOAD_PREFIX'] = os.environ.get('DOCUMENT_OFFLOAD_PREFIX', '/protected-uploads/')  # nginx internal location mapped to UPLOAD_FOLDER
+
+# Password hashing: bcrypt, argon2id (needs argon2-cffi) or pbkdf2; hashes with other settings are upgraded at login
+app.config['PASSWORD_HASH_ALGORITHM'] = os.environ.get('PASSWORD_HASH_ALGORITHM', 'bcrypt').lower()
+app.config['PASSWORD_BCRYPT_ROUNDS'] = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 10))
+app.config['PASSWORD_ARGON2_TIME_COST'] = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+app.config['PASSWORD_ARGON2_MEMORY_KIB'] = int(os.environ.get('PASSWORD_ARGON2_MEMORY_KIB', 19456))
+app.config['PASSWORD_ARGON2_PARALLELISM'] = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1))
+app.config['PASSWORD_PBKDF2_ITERATIONS'] = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # Concurrent hashes per process
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))  # Waiting hashes before logins get 503
+
+# Sliding-window rate limits checked before the view runs; RATE_LIMITS is JSON such as
+# {"auth.login": ["ip:20/minute", "email:10/15minutes"], "documents": ["user:600/minute"]}
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+app.config['RATE_LIMIT_STORAGE_URL'] = os.environ.get('RATE_LIMIT_STORAGE_URL', 'memory://')  # or redis://localhost:6379/0 to share counters
+app.config['RATE_LIMITS'] = json.loads(os.environ.get('RATE_LIMITS', '{}'))  # Added to / replacing the defaults in rate_limit.py
+
+# Proxies in front of the app whose X-Forwarded-For is trusted (1 behind nginx). Rate limits and
+# the audit log use the client address; with 0 every proxied client shares the proxy's address
+app.config['PROXY_FIX_X_FOR'] = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+
+# Short-lived access tokens renewed with single-use refresh tokens; revocations are
+# mirrored in a per-worker bloom filter and read from the table every REVOCATION_SYNC_SECONDS
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.environ.get('ACCESS_TOKEN_MINUTES', 15)))
+app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=int(os.environ.get('REFRESH_TOKEN_DAYS', 14)))
+app.config['REVOCATION_SYNC_SECONDS'] = float(os.environ.get('REVOCATION_SYNC_SECONDS', 1))
+app.config['REVOCATION_PRUNE_SECONDS'] = int(os.environ.get('REVOCATION_PRUNE_SECONDS', 3600))
+app.config['REVOCATION_BLOOM_CAPACITY'] = int(os.environ.get('REVOCATION_BLOOM_CAPACITY', 100000))
+app.config['REVOCATION_BLOOM_ERROR_RATE'] = float(os.environ.get('REVOCATION_BLOOM_ERROR_RATE', 0.001))
+app.config['ACL_SYNC_SECONDS'] = float(os.environ.get('ACL_SYNC_SECONDS', 1))  # How often workers read changed role/acl_version claims
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # Initialize extensions
-CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
+# Preflights are cached by the browser so cached GETs don't wait on an OPTIONS round trip
+CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True, max_age=600)
 jwt = JWTManager(app)
 
 # Configure JWT to work with multipart/form-data
@@ -31,16 +124,26 @@ jwt = JWTManager(app)
 app.config['JWT_TOKEN_LOCATION'] = ['headers']
 app.config['JWT_HEADER_NAME'] = 'Authorization'
 app.config['JWT_HEADER_TYPE'] = 'Bearer'
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False  # For development - no expiration
+
+if app.config['PROXY_FIX_X_FOR']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 
 db.init_app(app)
+init_compression(app)
+init_query_stats(app)
+init_metrics(app)
+init_profiling(app)
+init_passwords(app)
+init_rate_limit(app)
+init_revocation(app, jwt)
+init_authz(app)
 
 # Error handlers
 @app.errorhandler(422)
 def handle_422_error(e):
     """Handle 422 Unprocessable Entity errors"""
     error_description = str(e.description) if hasattr(e, 'description') else str(e)
-    print(f"422 Error: {error_description}")
+    logger.warning('422 Unprocessable Entity: %s', error_description)
     return jsonify({
         'error': 'Request could not be processed',
         'details': error_description
@@ -64,7 +167,7 @@ def expired_token_callback(jwt_header, jwt_payload):
 @jwt.invalid_token_loader
 def invalid_token_callback(error):
     error_msg = str(error)
-    print(f"Invalid token error: {error_msg}")
+    logger.info('Rejected invalid token: %s', error_msg)
     # If it's the "Subject must be a string" error, provide clear message
     if 'Subject must be a string' in error_msg or 'subject' in error_msg.lower():
         return jsonify({
@@ -85,6 +188,8 @@ from routes.entities import entities_bp
 from routes.documents import documents_bp
 from routes.notifications import notifications_bp
 from routes.audit import audit_bp
+from routes.sync import sync_bp
+from routes.profiling import profiling_bp
 
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(users_bp, url_prefix='/api/users')
@@ -92,11 +197,67 @@ app.register_blueprint(entities_bp, url_prefix='/api/entities')
 app.register_blueprint(documents_bp, url_prefix='/api/documents')
 app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
 app.register_blueprint(audit_bp, url_prefix='/api/audit')
+app.register_blueprint(sync_bp, url_prefix='/api/sync')
+app.register_blueprint(profiling_bp, url_prefix='/api/profiling')
 
 # Create database tables and default admin user
 with app.app_context():
     db.create_all()
 
+    # WAL lets readers in other worker processes run while one of them writes
+    if db.engine.dialect.name == 'sqlite':
+        try:
+            from sqlalchemy import text
+            with db.engine.connect() as conn:
+                conn.execute(text('PRAGMA journal_mode=WAL'))
+        except Exception as e:
+            logger.warning('Could not enable SQLite WAL mode: %s', e)
+
+    # Migrate: Add row_version/updated_at to synced tables and backfill existing rows.
+    # Runs before any ORM-based migration: the models' onupdate columns must exist before the ORM updates a row
+    try:
+        from sqlalchemy import inspect, text
+        inspector = inspect(db.engine)
+        versioned_tables = {
+            'users': 'COALESCE(last_login, created_at)',
+            'entities': 'COALESCE(approved_at, created_at)',
+            'entity_assignments': 'assigned_at',
+            'permanent_documents': 'uploaded_at',
+            'periodic_documents': 'uploaded_at',
+            'notifications': 'created_at'
+        }
+        with db.engine.connect() as conn:
+            for table, stamp in versioned_tables.items():
+                columns = [col['name'] for col in inspector.get_columns(table)]
+                if 'row_version' not in columns:
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN row_version INTEGER'))
+                    logger.info('Added row_version column to %s table', table)
+                if 'updated_at' not in columns:
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN updated_at DATETIME'))
+                    logger.info('Added updated_at column to %s table', table)
+                # Rows written before versioning all count as version 1
+                conn.execute(text(f'UPDATE {table} SET row_version = 1 WHERE row_version IS NULL'))
+                conn.execute(text(f'UPDATE {table} SET updated_at = {stamp} WHERE updated_at IS NULL'))
+                conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table}_row_version ON {table} (row_version)'))
+                conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)'))
+            conn.execute(text('INSERT OR IGNORE INTO row_version_counter (id, value) VALUES (1, 1)'))
+            conn.commit()
+    except Exception as e:
+        logger.warning('Row version migration incomplete: %s', e)
+
+    # Migrate: Add acl_version column to users for role claims in tokens
+    try:
+        from sqlalchemy import inspect, text
+        inspector = inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('users')]
+        if 'acl_version' not in columns:
+            with db.engine.connect() as conn:
+                conn.execute(text('ALTER TABLE users ADD COLUMN acl_version INTEGER DEFAULT 1'))
+                conn.commit()
+            logger.info('Added acl_version column to users table')
+    except Exception as e:
+        pass
+
     # Migrate: Add access_type column to entity_assignments if it doesn't exist
     try:
         from sqlalchemy import inspect, text
@@ -107,26 +268,98 @@ with app.app_context():
                 with db.engine.connect() as conn:
                     conn.execute(text('ALTER TABLE entity_assignments ADD COLUMN access_type VARCHAR(50) DEFAULT "all"'))
                     conn.commit()
-                print("Added access_type column to entity_assignments table")
+                logger.info('Added access_type column to entity_assignments table')
     except Exception as e:
         # Column might already exist - that's okay
         pass
 
+    # Migrate: Add delta storage columns to periodic_documents
+    try:
+        from sqlalchemy import inspect, text
+        inspector = inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('periodic_documents')]
+        with db.engine.connect() as conn:
+            if 'storage' not in columns:
+                conn.execute(text('ALTER TABLE periodic_documents ADD COLUMN storage VARCHAR(20) DEFAULT "full"'))
+                logger.info('Added storage column to periodic_documents table')
+            if 'base_document_id' not in columns:
+                conn.execute(text('ALTER TABLE periodic_documents ADD COLUMN base_document_id INTEGER REFERENCES periodic_documents(id)'))
+                logger.info('Added base_document_id column to periodic_documents table')
+            conn.commit()
+    except Exception as e:
+        pass
+
+    # Migrate: Add codec column to document tables for the cold storage tier
+    try:
+        from sqlalchemy import inspect, text
+        inspector = inspect(db.engine)
+        with db.engine.connect() as conn:
+            for table in ['permanent_documents', 'periodic_documents']:
+                columns = [col['name'] for col in inspector.get_columns(table)]
+                if 'codec' not in columns:
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN codec VARCHAR(20)'))
+                    logger.info('Added codec column to %s table', table)
+            conn.commit()
+    except Exception as e:
+        pass
+
+    # Migrate: Add slot_id to periodic_documents and backfill document slots
+    try:
+        from sqlalchemy import inspect, text
+        from database import backfill_document_slots
+        inspector = inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('periodic_documents')]
+        if 'slot_id' not in columns:
+            with db.engine.connect() as conn:
+                conn.execute(text('ALTER TABLE periodic_documents ADD COLUMN slot_id INTEGER REFERENCES document_slots(id)'))
+                conn.commit()
+            logger.info('Added slot_id column to periodic_documents table')
+        backfilled = backfill_document_slots()
+        if backfilled:
+            logger.info('Backfilled %s document slots', backfilled)
+        with db.engine.connect() as conn:
+            conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_periodic_documents_slot_version ON periodic_documents (slot_id, version)'))
+            conn.commit()
+    except Exception as e:
+        # Existing duplicate versions prevent the unique index - uploads still work.
+        # Roll back so the failed backfill doesn't keep holding the SQLite write lock
+        db.session.rollback()
+        logger.warning('Document slot migration incomplete: %s', e)
+
+    # Migrate: Indexes for the pending approvals listing
+    try:
+        from sqlalchemy import text
+        with db.engine.connect() as conn:
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_entities_status ON entities (status)'))
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_permanent_documents_entity_id ON permanent_documents (entity_id)'))
+            conn.commit()
+    except Exception as e:
+        pass
+
+    # Migrate: Index for the active session count in /metrics
+    try:
+        from sqlalchemy import text
+        with db.engine.connect() as conn:
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_audit_logs_action_created_at ON audit_logs (action, created_at)'))
+            conn.commit()
+    except Exception as e:
+        pass
+
     # Create default super admin if not exists
     from database import User
-    from werkzeug.security import generate_password_hash
+    from passwords import hash_password
 
     admin = User.query.filter_by(email='admin@gmfinance.com').first()
     if not admin:
         admin = User(
             email='admin@gmfinance.com',
-            password_hash=generate_password_hash('admin123'),
+            password_hash=hash_password('admin123'),
             role='super_admin',
             is_active=True
         )
         db.session.add(admin)
         db.session.commit()
-        print("Default admin user created: admin@gmfinance.com / admin123")
+        logger.info('Default admin user created: admin@gmfinance.com')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
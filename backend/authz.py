@@ -0,0 +1,100 @@
+"""Role checks from token claims instead of a user lookup per request.
+
+Tokens carry the user's role and acl_version (see routes.auth.issue_tokens).
+Anything that changes what a user may do - their role, deactivation - calls
+bump_acl_version, which makes tokens minted before it stale. Each worker keeps
+the acl_version of users whose access has changed, read from the users table
+at most every ACL_SYNC_SECONDS (new rows are found by row_version), so:
+
+- claims whose acl_version is current are trusted without a query
+- stale claims, or tokens minted before roles were embedded, fall back to
+  loading the user; the next refresh mints current claims
+
+Role-gated views use @require_role('super_admin') in place of @jwt_required().
+"""
+from flask import current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from database import db, User
+from functools import wraps
+import threading
+import time
+
+class AclVersions:
+    """acl_version of every user whose access changed, as last read by this worker"""
+
+    def __init__(self, sync_seconds):
+        self.sync_seconds = sync_seconds
+        self.lock = threading.Lock()
+        self.versions = {}
+        self.row_version = None
+        self.synced_at = None
+
+    def sync(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.synced_at is not None and now - self.synced_at < self.sync_seconds:
+            return
+        with self.lock:
+            if self.synced_at is not None and now - self.synced_at < self.sync_seconds:
+                return
+            query = db.session.query(User.id, User.acl_version, User.row_version)
+            if self.row_version is None:
+                # First load: every user whose access ever changed; later syncs read rows updated since
+                self.row_version = db.session.query(db.func.max(User.row_version)).scalar() or 0
+                rows = query.filter(User.acl_version > 1).all()
+            else:
+                rows = query.filter(User.row_version > self.row_version).all()
+            for user_id, acl_version, row_version in rows:
+                if acl_version and acl_version > 1:
+                    self.versions[user_id] = acl_version
+                self.row_version = max(self.row_version, row_version or 0)
+            self.synced_at = now
+
+    def is_current(self, user_id, acl_version):
+        """Whether claims minted at acl_version still describe the user's access"""
+        return acl_version is not None and acl_version >= self.versions.get(user_id, 1)
+
+def _versions():
+    return current_app.extensions['acl_versions']
+
+def bump_acl_version(user):
+    """Mark tokens minted so far as stale for this user; the caller commits"""
+    user.acl_version = (user.acl_version or 1) + 1
+    _versions().versions[user.id] = user.acl_version
+
+def token_claims(user):
+    """Claims embedded in a user's tokens for role checks"""
+    return {'role': user.role, 'acl_version': user.acl_version or 1}
+
+def current_role():
+    """The requesting user's role: from the token when its claims are current, else from the database"""
+    claims = get_jwt()
+    user_id = int(get_jwt_identity())
+    versions = _versions()
+    versions.sync()
+    if 'role' in claims and versions.is_current(user_id, claims.get('acl_version')):
+        return claims['role']
+
+    user = User.query.get(user_id)
+    if not user or not user.is_active:
+        return None
+    return user.role
+
+def require_role(*roles, error='Access denied'):
+    """View decorator: a valid access token for a user with one of `roles`, else 403 with `error`"""
+    def decorator(view):
+        @wraps(view)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            try:
+                role = current_role()
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid token format'}), 401
+            if role not in roles:
+                return jsonify({'error': error}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def init_authz(app):
+    """Set up this app's view of users' ACL versions"""
+    app.extensions['acl_versions'] = AclVersions(app.config.get('ACL_SYNC_SECONDS', 1))
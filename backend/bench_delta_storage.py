@@ -0,0 +1,116 @@
+"""Benchmark delta storage on realistic ledger churn.
+
+Simulates an accountant re-uploading a general ledger CSV and a trial balance
+workbook many times in a period (appended entries, corrected amounts, a few
+deleted rows) and compares disk usage of full copies against delta storage.
+
+Usage: python bench_delta_storage.py [--rows 20000] [--versions 12] [--interval 10]
+"""
+import argparse
+import io
+import random
+import time
+import zipfile
+
+from document_storage import encode_delta, apply_delta, MAX_DELTA_RATIO
+
+ACCOUNTS = ['Sales', 'Purchases', 'Cash', 'Bank - HDFC', 'Bank - SBI', 'Debtors', 'Creditors',
+            'GST Input', 'GST Output', 'TDS Payable', 'Salaries', 'Rent', 'Depreciation']
+
+def ledger_rows(rng, count, start=1):
+    rows = []
+    for i in range(start, start + count):
+        rows.append(f'{i},2024-{rng.randint(4, 12):02d}-{rng.randint(1, 28):02d},'
+                    f'{rng.choice(ACCOUNTS)},INV-{rng.randint(1000, 99999)},'
+                    f'{rng.randint(100, 500000)}.{rng.randint(0, 99):02d},'
+                    f'{rng.choice(["Dr", "Cr"])}\n')
+    return rows
+
+def churn(rng, rows):
+    """Apply one re-upload worth of changes to the ledger"""
+    rows = list(rows)
+    # Corrections to existing amounts
+    for _ in range(max(1, len(rows) // 500)):
+        i = rng.randrange(len(rows))
+        parts = rows[i].split(',')
+        parts[4] = f'{rng.randint(100, 500000)}.{rng.randint(0, 99):02d}'
+        rows[i] = ','.join(parts)
+    # Deleted duplicate entries
+    for _ in range(max(1, len(rows) // 2000)):
+        del rows[rng.randrange(len(rows))]
+    # New entries for the rest of the period
+    rows.extend(ledger_rows(rng, max(10, len(rows) // 100), start=len(rows) + 1))
+    return rows
+
+def workbook(rows, sheets):
+    """Build an xlsx-like zip container where only the current month's sheet changes.
+
+    Members are compressed individually, so only unchanged members can be
+    shared between versions of a zip container.
+    """
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        for name, content in sheets.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/worksheets/ledger.xml', ''.join(rows))
+    return buf.getvalue()
+
+def run(label, versions, interval):
+    full_bytes = 0
+    stored_bytes = 0
+    encode_time = 0.0
+    decode_time = 0.0
+    previous = None
+    for version, data in enumerate(versions, start=1):
+        full_bytes += len(data)
+        if previous is None or (interval and (version - 1) % interval == 0):
+            stored_bytes += len(data)
+        else:
+            start = time.perf_counter()
+            delta = encode_delta(previous, data)
+            encode_time += time.perf_counter() - start
+            if len(delta) > len(data) * MAX_DELTA_RATIO:
+                stored_bytes += len(data)
+            else:
+                start = time.perf_counter()
+                assert apply_delta(previous, delta) == data
+                decode_time += time.perf_counter() - start
+                stored_bytes += len(delta)
+        previous = data
+
+    print(f'{label}:')
+    print(f'  versions:        {len(versions)}')
+    print(f'  full copies:     {full_bytes / 1024:,.1f} KB')
+    print(f'  delta storage:   {stored_bytes / 1024:,.1f} KB ({stored_bytes / full_bytes:.1%} of full)')
+    print(f'  encode time:     {encode_time * 1000:,.1f} ms total')
+    print(f'  reconstruct:     {decode_time * 1000:,.1f} ms total')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--versions', type=int, default=12)
+    parser.add_argument('--interval', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = ledger_rows(rng, args.rows)
+    header = 'id,date,account,reference,amount,side\n'
+
+    csv_versions = []
+    xlsx_versions = []
+    # Closed months of the workbook, one sheet each
+    closed_months = {f'xl/worksheets/sheet{i}.xml': ''.join(ledger_rows(rng, args.rows // 12)) for i in range(1, 12)}
+    month_rows = ledger_rows(rng, args.rows // 12)
+    for _ in range(args.versions):
+        csv_versions.append((header + ''.join(rows)).encode())
+        xlsx_versions.append(workbook(month_rows, closed_months))
+        rows = churn(rng, rows)
+        month_rows = churn(rng, month_rows)
+
+    run('General ledger CSV', csv_versions, args.interval)
+    run('Trial balance workbook (zip container)', xlsx_versions, args.interval)
+
+if __name__ == '__main__':
+    main()
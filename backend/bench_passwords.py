@@ -0,0 +1,121 @@
+"""Benchmark password hashing settings and login throughput.
+
+For each candidate setting (algorithm:cost) it times hashing and verifying on
+one thread, then runs verifies on every core through the hashing pool, and
+finally times POST /api/auth/login through the Flask test client with the
+setting active. Logins per second per core is what a 9am login burst needs;
+pick the highest cost that still covers it.
+
+The first login of a user whose hash was made with other settings also
+stores a new hash; the report shows that upgrade for the last candidate.
+
+Usage: python bench_passwords.py [--candidates pbkdf2:600000,bcrypt:10,bcrypt:12,argon2id:2] [--verifies 20] [--logins 20]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+def parse_candidate(text):
+    """'bcrypt:12' -> config overrides for that algorithm and cost"""
+    algorithm, _, cost = text.partition(':')
+    config = {'PASSWORD_HASH_ALGORITHM': algorithm}
+    if algorithm == 'bcrypt' and cost:
+        config['PASSWORD_BCRYPT_ROUNDS'] = int(cost)
+    elif algorithm == 'argon2id' and cost:
+        config['PASSWORD_ARGON2_TIME_COST'] = int(cost)
+    elif algorithm == 'pbkdf2' and cost:
+        config['PASSWORD_PBKDF2_ITERATIONS'] = int(cost)
+    return config
+
+def time_calls(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def parallel_rate(app, fn, total, threads):
+    """Calls per second with `threads` callers sharing the hashing pool"""
+    def worker(count):
+        with app.app_context():
+            for _ in range(count):
+                fn()
+    pool = [threading.Thread(target=worker, args=(total // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return (total // threads) * threads / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark password hashing and login throughput')
+    parser.add_argument('--candidates', default='pbkdf2:600000,bcrypt:10,bcrypt:12,argon2id:2',
+                        help='Comma-separated algorithm:cost settings to compare')
+    parser.add_argument('--verifies', type=int, default=20, help='Verifies per measurement')
+    parser.add_argument('--logins', type=int, default=20, help='Logins through the test client per setting')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gm_passwords_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'  # Repeated logins from one client would be throttled
+
+    from app import app
+    from database import db, User
+    import passwords
+
+    cores = os.cpu_count() or 1
+    app.config['PASSWORD_HASH_WORKERS'] = cores
+    app.config['PASSWORD_HASH_QUEUE'] = cores * 4
+    defaults = {key: value for key, value in app.config.items() if key.startswith('PASSWORD_')}
+    client = app.test_client()
+    email, password = 'bench-login@gmfinance.test', 'correct horse battery'
+
+    print(f'{cores} CPU cores, hashing pool of {cores} threads')
+    print(f"{'setting':<18} {'hash ms':>8} {'verify ms':>10} {'verify/s/core':>14} {'verify/s all':>13} {'login ms':>9} {'logins/s/core':>14}")
+    upgraded = None
+    for text in [c.strip() for c in args.candidates.split(',') if c.strip()]:
+        app.config.update(defaults)
+        app.config.update(parse_candidate(text))
+        if app.config['PASSWORD_HASH_ALGORITHM'] == 'argon2id' and passwords.argon2 is None:
+            print(f'{text:<18} skipped - argon2-cffi is not installed')
+            continue
+        if app.config['PASSWORD_HASH_ALGORITHM'] == 'bcrypt' and passwords.bcrypt is None:
+            print(f'{text:<18} skipped - bcrypt is not installed')
+            continue
+
+        with app.app_context():
+            stored = passwords.hash_password(password)
+            hash_ms = time_calls(lambda: passwords.hash_password(password), max(3, args.verifies // 4))
+            verify_ms = time_calls(lambda: passwords.verify_password(stored, password), args.verifies)
+            all_rate = parallel_rate(app, lambda: passwords.verify_password(stored, password), args.verifies * cores, cores)
+
+            # Start from the previous setting's hash so the first login shows the upgrade
+            user = User.query.filter_by(email=email).first()
+            if user is None:
+                user = User(email=email, password_hash=stored, role='accountant', is_active=True)
+                db.session.add(user)
+            before = passwords.hash_scheme(user.password_hash)
+            db.session.commit()
+
+        def login():
+            response = client.post('/api/auth/login', json={'email': email, 'password': password})
+            assert response.status_code == 200, response.get_data(as_text=True)
+        login()
+        with app.app_context():
+            upgraded = (before, passwords.hash_scheme(User.query.filter_by(email=email).first().password_hash))
+        login_ms = time_calls(login, args.logins)
+
+        print(f'{text:<18} {hash_ms:>8.1f} {verify_ms:>10.1f} {1000 / verify_ms:>14.1f} {all_rate:>13.1f} '
+              f'{login_ms:>9.1f} {1000 / login_ms:>14.1f}')
+
+    if upgraded and upgraded[0] != upgraded[1]:
+        print(f'\nFirst login rehashed the stored password: {upgraded[0]} -> {upgraded[1]}')
+
+if __name__ == '__main__':
+    main()
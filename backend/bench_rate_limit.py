@@ -0,0 +1,87 @@
+"""Measure what rate limiting costs per request.
+
+Times the counter store on its own (MemoryStore, or a Redis-protocol server
+with --redis-url), then a cheap endpoint through the Flask test client with
+rate limiting switched on and off, and finally what a rejected login costs
+compared with a login that reaches the password hash.
+
+Usage: python bench_rate_limit.py [--requests 2000] [--redis-url redis://localhost:6379/15]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+def per_call_us(fn, count, rounds=5):
+    """Median over rounds of the mean microseconds per call"""
+    results = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        results.append((time.perf_counter() - start) * 1_000_000 / count)
+    return statistics.median(results)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rate limiting overhead')
+    parser.add_argument('--requests', type=int, default=2000, help='Calls per measurement round')
+    parser.add_argument('--redis-url', help='Also time a Redis-protocol counter store at this URL')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gm_rate_limit_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+    # A limit on a cheap endpoint that is never reached, and one login attempt per day
+    os.environ['RATE_LIMITS'] = json.dumps({
+        'entities.get_categories': ['ip:1000000000/minute'],
+        'auth.login': ['ip:1000000000/minute', 'email:1/day'],
+    })
+
+    from app import app
+    import rate_limit
+
+    print(f"{'measurement':<44} {'us/call':>10}")
+    rule = rate_limit.Rule('ip:1000000000/minute')
+    stores = [('memory store hit', rate_limit.MemoryStore())]
+    if args.redis_url:
+        stores.append(('redis store hit', rate_limit.create_store(args.redis_url)))
+    for name, store in stores:
+        keys = [f'10.0.{i // 256}.{i % 256}' for i in range(1000)]
+        counter = iter(range(10 ** 9))
+        us = per_call_us(lambda: store.hit(rule, keys[next(counter) % len(keys)], time.time()), args.requests)
+        print(f'{name:<44} {us:>10.2f}')
+
+    client = app.test_client()
+    for _ in range(100):
+        client.get('/api/entities/categories')
+    # Alternate off/on rounds so drift on the machine affects both alike
+    timings = {False: [], True: []}
+    for _ in range(5):
+        for enabled in (False, True):
+            app.config['RATE_LIMIT_ENABLED'] = enabled
+            timings[enabled].append(per_call_us(lambda: client.get('/api/entities/categories'), args.requests, rounds=1))
+    off, on = statistics.median(timings[False]), statistics.median(timings[True])
+    print(f"{'GET /api/entities/categories, limits off':<44} {off:>10.2f}")
+    print(f"{'GET /api/entities/categories, limits on':<44} {on:>10.2f}")
+    print(f"{'  overhead per limited request':<44} {on - off:>10.2f}")
+
+    # The first attempt uses the day's allowance for this email; later ones are rejected before any hash
+    login = {'email': 'admin@gmfinance.com', 'password': 'not-the-password'}
+    start = time.perf_counter()
+    allowed = client.post('/api/auth/login', json=login)
+    allowed_us = (time.perf_counter() - start) * 1_000_000
+    status = {'allowed': allowed.status_code}
+
+    def rejected_login():
+        response = client.post('/api/auth/login', json=login)
+        status['rejected'] = response.status_code
+    rejected_us = per_call_us(rejected_login, max(1, args.requests // 10))
+    reached = f"login attempt reaching the hash ({status['allowed']})"
+    rejected = f"login attempt rejected by the limit ({status['rejected']})"
+    print(f'{reached:<44} {allowed_us:>10.2f}')
+    print(f'{rejected:<44} {rejected_us:>10.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Benchmark JSON serialization of the vault and audit log endpoints.
+
+Seeds a throwaway SQLite database with periodic documents and audit logs,
+then times GET /api/documents/vault and GET /api/audit/logs through the Flask
+test client with the orjson encoder and with the standard library fallback.
+The encode step is also timed on its own so query time can be told apart
+from serialization time.
+
+Usage: python bench_serialization.py [--documents 10000] [--logs 1000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def seed(db, models, documents, logs):
+    Entity, User, PeriodicDocument, AuditLog = models
+    rng = random.Random(42)
+    admin = User.query.filter_by(email='admin@gmfinance.com').first()
+
+    entities = []
+    for i in range(20):
+        entities.append({
+            'company_name': f'Client {i} Private Limited',
+            'pan': f'ABCDE{i:04d}F',
+            'gstin': f'27ABCDE{i:04d}F1Z5',
+            'company_type': 'Private Limited',
+            'address': f'{i} Market Road, Mumbai',
+            'status': 'active',
+            'secretary_id': admin.id
+        })
+    db.session.bulk_insert_mappings(Entity, entities)
+    db.session.commit()
+    entity_ids = [e.id for e in Entity.query.all()]
+
+    now = datetime.utcnow()
+    months = ['April', 'May', 'June', 'July', 'August', 'September', 'October',
+              'November', 'December', 'January', 'February', 'March']
+    db.session.bulk_insert_mappings(PeriodicDocument, [{
+        'entity_id': rng.choice(entity_ids),
+        'period': 'monthly',
+        'period_value': rng.choice(months),
+        'document_type': rng.choice(['GSTR-1', 'GSTR-3B', 'TDS Return', 'Bank Statement', 'Ledger']),
+        'financial_year': rng.choice(['2023-2024', '2024-2025']),
+        'file_path': f'/tmp/bench/{i}.pdf',
+        'file_name': f'20240101000000_v1_document_{i}.pdf',
+        'file_size': rng.randint(10_000, 5_000_000),
+        'version': 1,
+        'uploaded_by': admin.id,
+        'uploaded_at': now - timedelta(minutes=i)
+    } for i in range(documents)])
+
+    db.session.bulk_insert_mappings(AuditLog, [{
+        'user_id': admin.id,
+        'action': rng.choice(['login', 'view_document', 'download_document', 'upload_document']),
+        'resource_type': 'document',
+        'resource_id': rng.randint(1, documents or 1),
+        'ip_address': '10.0.0.1',
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        'details': f'Viewed periodic document: document_{i}.pdf',
+        'created_at': now - timedelta(seconds=i)
+    } for i in range(logs)])
+    db.session.commit()
+
+def capture_payload(app, client, url, headers):
+    """Return the object a route passed to jsonify, with datetimes still native"""
+    captured = {}
+    original = app.json.response
+
+    def capture(*args, **kwargs):
+        captured['payload'] = app.json._prepare_response_obj(args, kwargs)
+        return original(*args, **kwargs)
+
+    app.json.response = capture
+    try:
+        client.get(url, headers=headers)
+    finally:
+        del app.json.response
+    return captured['payload']
+
+def time_calls(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API response serialization')
+    parser.add_argument('--documents', type=int, default=10000, help='Periodic documents to seed')
+    parser.add_argument('--logs', type=int, default=1000, help='Audit logs to seed (the endpoint returns at most 1000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Requests per measurement (median is reported)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gm_bench_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import app
+    from database import db, Entity, User, PeriodicDocument, AuditLog
+    import serializers
+
+    with app.app_context():
+        seed(db, (Entity, User, PeriodicDocument, AuditLog), args.documents, args.logs)
+
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'admin@gmfinance.com', 'password': 'admin123'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    endpoints = [('vault', '/api/documents/vault'), ('audit', '/api/audit/logs?days=3650')]
+    encoders = [('stdlib', False)]
+    if serializers.orjson is not None:
+        encoders.append(('orjson', True))
+    else:
+        print('[WARN] orjson is not installed - only the stdlib encoder is measured')
+
+    print(f"{'endpoint':<8} {'encoder':<8} {'items':>7} {'bytes':>10} {'request ms':>11} {'encode ms':>10}")
+    for name, url in endpoints:
+        payload = capture_payload(app, client, url, headers)
+        items = len(next(iter(payload.values())))
+        with app.app_context():
+            for encoder, use_orjson in encoders:
+                app.json.use_orjson = use_orjson
+                body = client.get(url, headers=headers).data
+                request_ms = time_calls(lambda: client.get(url, headers=headers), args.repeat)
+                encode_ms = time_calls(lambda: app.json.response(payload), args.repeat)
+                print(f'{name:<8} {encoder:<8} {items:>7} {len(body):>10} {request_ms:>11.1f} {encode_ms:>10.1f}')
+        app.json.use_orjson = serializers.orjson is not None
+
+if __name__ == '__main__':
+    main()
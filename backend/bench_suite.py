@@ -0,0 +1,258 @@
+"""Reproducible benchmark suite for the API.
+
+Seeds a throwaway database with seed_data.generate() at the chosen scale and
+times key operations through the Flask test client:
+
+- macro benchmarks: whole requests - login, vault (per role), accountant
+  status, audit logs, notifications, periodic and permanent uploads, views
+  and downloads
+- micro benchmarks: the pieces underneath - password check, token decode,
+  vault query alone and vault JSON encoding
+
+Each benchmark is warmed up, then timed `--repeat` times; the report keeps
+min/median/mean/p95 milliseconds, response bytes and SQL queries per request.
+Results are written to a JSON report together with the git commit and scale.
+Pass an earlier report with --compare to print the change per benchmark and
+exit non-zero when a median got slower than --threshold allows, so runs on
+two commits show regressions.
+
+Usage: python bench_suite.py [--scale small|medium|large] [--repeat 20] [--only vault,login]
+                             [--output bench_report.json] [--compare baseline.json] [--threshold 0.15]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from seed_data import scale_options, scale_from_args
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def git_info():
+    """Commit and dirty flag of the working tree, when run from a git checkout"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit, 'dirty': dirty}
+
+class Bench:
+    """Runs the registered benchmarks and collects their timings"""
+
+    def __init__(self, app, repeat, warmup, only=None):
+        self.app = app
+        self.client = app.test_client()
+        self.repeat = repeat
+        self.warmup = warmup
+        self.only = only
+        self.results = {}
+
+    def wanted(self, name):
+        return not self.only or any(part in name for part in self.only)
+
+    def measure(self, name, kind, fn):
+        """Time fn() repeatedly; fn may return a test client response to record its size and queries"""
+        if not self.wanted(name):
+            return
+        for _ in range(self.warmup):
+            fn()
+        timings = []
+        size = queries = None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - start) * 1000)
+            if hasattr(result, 'status_code'):
+                if result.status_code >= 400:
+                    raise RuntimeError(f'{name}: HTTP {result.status_code} {result.get_data(as_text=True)[:200]}')
+                size = len(result.get_data())
+                if 'X-Query-Count' in result.headers:
+                    queries = int(result.headers['X-Query-Count'])
+        self.results[name] = {
+            'kind': kind,
+            'runs': len(timings),
+            'min_ms': round(min(timings), 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'bytes': size,
+            'queries': queries,
+        }
+        r = self.results[name]
+        print(f"{name:<32} {kind:<6} {r['median_ms']:>10.2f} {r['p95_ms']:>10.2f} "
+              f"{r['bytes'] if r['bytes'] is not None else '-':>10} {r['queries'] if r['queries'] is not None else '-':>8}")
+
+    def login(self, email, password):
+        response = self.client.post('/api/auth/login', json={'email': email, 'password': password})
+        return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+def run_macro(bench, seeded, headers):
+    client = bench.client
+    password = seeded['password']
+    admin, secretary, accountant = headers['super_admin'], headers['company_secretary'], headers['accountant']
+
+    from database import PeriodicDocument, PermanentDocument, Entity, EntityAssignment, User
+    with bench.app.app_context():
+        secretary_id = User.query.filter_by(email=seeded['users']['company_secretary']).first().id
+        accountant_id = User.query.filter_by(email=seeded['users']['accountant']).first().id
+        entity_id = Entity.query.filter_by(secretary_id=secretary_id).order_by(Entity.id).first().id
+        assigned_entity_id = EntityAssignment.query.filter_by(accountant_id=accountant_id) \
+            .order_by(EntityAssignment.entity_id).first().entity_id
+        periodic_id = PeriodicDocument.query.filter_by(entity_id=entity_id).order_by(PeriodicDocument.id).first().id
+        permanent_id = PermanentDocument.query.filter_by(entity_id=entity_id).order_by(PermanentDocument.id).first().id
+
+    bench.measure('login', 'macro', lambda: client.post(
+        '/api/auth/login', json={'email': seeded['users']['company_secretary'], 'password': password}))
+    bench.measure('vault.super_admin', 'macro', lambda: client.get('/api/documents/vault', headers=admin))
+    bench.measure('vault.secretary', 'macro', lambda: client.get('/api/documents/vault', headers=secretary))
+    bench.measure('vault.accountant', 'macro', lambda: client.get('/api/documents/vault', headers=accountant))
+    bench.measure('vault.stream', 'macro', lambda: client.get('/api/documents/vault?stream=ndjson', headers=admin))
+    bench.measure('accountant_status', 'macro', lambda: client.get('/api/documents/accountant-status', headers=accountant))
+    bench.measure('audit_logs', 'macro', lambda: client.get('/api/audit/logs?days=90', headers=admin))
+    bench.measure('entities.my_entities', 'macro', lambda: client.get('/api/entities/my-entities', headers=secretary))
+    bench.measure('notifications', 'macro', lambda: client.get('/api/notifications/', headers=secretary))
+
+    upload_body = b'%PDF-1.4\n' + os.urandom(200_000)
+    # Periodic documents are uploaded by the entity's accountants
+    bench.measure('upload.periodic', 'macro', lambda: client.post('/api/documents/upload', headers=accountant, data={
+        'file': (io.BytesIO(upload_body), 'bench.pdf'),
+        'entity_id': str(assigned_entity_id),
+        'period': 'monthly',
+        'period_value': 'April',
+        'document_type': 'Bench Upload',
+        'financial_year': '2024-2025'
+    }, content_type='multipart/form-data'))
+    bench.measure('upload.permanent', 'macro', lambda: client.post('/api/documents/permanent/upload', headers=secretary, data={
+        'file': (io.BytesIO(upload_body), 'bench.pdf'),
+        'entity_id': str(entity_id),
+        'document_type': 'pan_card'
+    }, content_type='multipart/form-data'))
+    bench.measure('download.periodic', 'macro', lambda: client.get(f'/api/documents/periodic/{periodic_id}/download', headers=secretary))
+    bench.measure('view.permanent', 'macro', lambda: client.get(f'/api/documents/permanent/{permanent_id}/view', headers=secretary))
+
+def run_micro(bench, seeded, headers):
+    app = bench.app
+    from database import db, User, PeriodicDocument
+    from passwords import verify_password
+    from flask_jwt_extended import decode_token
+    from field_selection import row_to_dict
+    from routes.documents import vault_query, PERIODIC_VAULT_COLUMNS, PERIODIC_VAULT_CONSTANTS, VAULT_FIELDS
+
+    with app.app_context():
+        password_hash = User.query.filter_by(email=seeded['users']['company_secretary']).first().password_hash
+        token = headers['super_admin']['Authorization'].split(' ', 1)[1]
+        bench.measure('password_check', 'micro', lambda: verify_password(password_hash, seeded['password']))
+        bench.measure('token_decode', 'micro', lambda: decode_token(token))
+
+        def vault_rows():
+            rows = vault_query(PeriodicDocument, PERIODIC_VAULT_COLUMNS, VAULT_FIELDS) \
+                .order_by(PeriodicDocument.uploaded_at.desc()).all()
+            db.session.remove()
+            return rows
+        bench.measure('vault_query', 'micro', vault_rows)
+
+        payload = {'vault': [row_to_dict(row, VAULT_FIELDS, PERIODIC_VAULT_CONSTANTS) for row in vault_rows()]}
+        bench.measure('vault_encode', 'micro', lambda: app.json.dumps(payload))
+
+def compare(results, baseline_path, threshold):
+    """Print the change against an earlier report; returns the names that got slower than allowed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get('scale') != results['scale']:
+        print(f'[WARN] baseline was run at a different scale: {baseline.get("scale")}')
+
+    print(f"\nAgainst {baseline_path} (commit {baseline.get('git', {}).get('commit')}):")
+    print(f"{'benchmark':<32} {'before':>10} {'after':>10} {'change':>8}")
+    regressions = []
+    for name, result in results['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            print(f"{name:<32} {'-':>10} {result['median_ms']:>10.2f}      new")
+            continue
+        change = (result['median_ms'] - before['median_ms']) / before['median_ms'] if before['median_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<32} {before['median_ms']:>10.2f} {result['median_ms']:>10.2f} {change:>+7.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the API benchmark suite and write a JSON report')
+    scale_options(parser)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per benchmark')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed runs before timing')
+    parser.add_argument('--only', help='Comma-separated substrings; run only matching benchmarks')
+    parser.add_argument('--output', default='bench_report.json', help='Where to write the JSON report')
+    parser.add_argument('--compare', help='Earlier report to compare medians against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed median slowdown before a benchmark counts as a regression')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gm_suite_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['QUERY_STATS_HEADERS'] = 'true'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'  # Repeated logins from one client would be throttled
+    os.environ.setdefault('PROFILE_DIR', os.path.join(workdir, 'profiles'))
+
+    from app import app
+    from database import db
+    import seed_data
+
+    # Keep seeded and uploaded files out of the real upload folder
+    app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    scale = scale_from_args(args)
+    start = time.perf_counter()
+    with app.app_context():
+        seeded = seed_data.generate(db, app.config['UPLOAD_FOLDER'], seed=args.seed, **scale)
+    seed_seconds = time.perf_counter() - start
+    print(f"Seeded {args.scale} scale in {seed_seconds:.1f}s: "
+          + ', '.join(f'{n} {table}' for table, n in seeded['counts'].items()))
+
+    bench = Bench(app, args.repeat, args.warmup, [s.strip() for s in args.only.split(',')] if args.only else None)
+    headers = {'super_admin': bench.login('admin@gmfinance.com', 'admin123')}
+    for role in ('company_secretary', 'accountant'):
+        headers[role] = bench.login(seeded['users'][role], seeded['password'])
+
+    print(f"\n{'benchmark':<32} {'kind':<6} {'median ms':>10} {'p95 ms':>10} {'bytes':>10} {'queries':>8}")
+    run_micro(bench, seeded, headers)
+    run_macro(bench, seeded, headers)
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'git': git_info(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'scale': {'name': args.scale, 'seed': args.seed, **scale},
+        'seed_seconds': round(seed_seconds, 2),
+        'repeat': args.repeat,
+        'results': bench.results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nReport written to {args.output}')
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
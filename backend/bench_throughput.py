@@ -0,0 +1,182 @@
+"""Measure how API throughput scales with gunicorn worker processes.
+
+Seeds a throwaway SQLite database, then for each worker count starts
+gunicorn with gunicorn.conf.py on a local port and drives it with keep-alive
+HTTP clients for a fixed time. Reports requests/second, latency percentiles
+and the speedup over a single worker. The load generator runs in its own
+processes so it does not compete with the server for one GIL.
+
+Usage: python bench_throughput.py [--workers 1,2,4] [--threads 4] [--clients 32] [--duration 10]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Read-heavy mix resembling the dashboard pages: profile, entity list, notifications, vault
+ENDPOINTS = [
+    '/api/auth/me',
+    '/api/entities/my-entities',
+    '/api/notifications/unread-count',
+    '/api/documents/vault',
+]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def login(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    body = json.dumps({'email': 'admin@gmfinance.com', 'password': 'admin123'})
+    conn.request('POST', '/api/auth/login', body=body, headers={'Content-Type': 'application/json'})
+    token = json.loads(conn.getresponse().read())['token']
+    conn.close()
+    return token
+
+def client_process(port, token, threads, duration, results):
+    """Run `threads` keep-alive clients for `duration` seconds and report their latencies"""
+    headers = {'Authorization': f'Bearer {token}', 'Accept-Encoding': 'gzip'}
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run(offset):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local, failed, i = [], 0, offset
+        while time.perf_counter() < deadline:
+            url = ENDPOINTS[i % len(ENDPOINTS)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request('GET', url, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            local.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    pool = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((latencies, errors[0]))
+
+def run_load(port, token, clients, duration):
+    procs = min(clients, multiprocessing.cpu_count())
+    results = multiprocessing.Queue()
+    workers = []
+    for n in range(procs):
+        threads = clients // procs + (1 if n < clients % procs else 0)
+        workers.append(multiprocessing.Process(target=client_process, args=(port, token, threads, duration, results)))
+    for proc in workers:
+        proc.start()
+
+    latencies, errors = [], 0
+    for _ in workers:
+        proc_latencies, proc_errors = results.get()
+        latencies.extend(proc_latencies)
+        errors += proc_errors
+    for proc in workers:
+        proc.join()
+    return latencies, errors
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def main():
+    cpus = multiprocessing.cpu_count()
+    default_workers = [1]
+    while default_workers[-1] * 2 <= cpus:
+        default_workers.append(default_workers[-1] * 2)
+
+    parser = argparse.ArgumentParser(description='Benchmark throughput against gunicorn worker count')
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)), help='Comma-separated worker counts to test')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+    parser.add_argument('--worker-class', default='gthread', help='Gunicorn worker class')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=int, default=10, help='Seconds of load per worker count')
+    parser.add_argument('--documents', type=int, default=2000, help='Periodic documents to seed')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gm_throughput_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import app
+    from database import db, Entity, User, PeriodicDocument, AuditLog
+    from bench_serialization import seed
+
+    with app.app_context():
+        seed(db, (Entity, User, PeriodicDocument, AuditLog), args.documents, 0)
+        db.session.remove()
+        db.engine.dispose()
+
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    print(f'{cpus} CPU cores, {args.clients} clients, {args.duration}s per run, '
+          f'{args.worker_class} workers with {args.threads} threads')
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8}")
+
+    baseline = None
+    for count in [int(n) for n in args.workers.split(',') if n.strip()]:
+        port = free_port()
+        env = dict(os.environ,
+                   WEB_CONCURRENCY=str(count),
+                   WEB_THREADS=str(args.threads),
+                   WEB_WORKER_CLASS=args.worker_class,
+                   WEB_BIND=f'127.0.0.1:{port}',
+                   WEB_ACCESS_LOG='',
+                   WEB_LOG_LEVEL='warning')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+            cwd=backend_dir, env=env, stdout=subprocess.DEVNULL
+        )
+        try:
+            if not wait_for_server(port):
+                print(f'{count:>7} gunicorn did not start')
+                continue
+            token = login(port)
+            latencies, errors = run_load(port, token, args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+        throughput = len(latencies) / args.duration
+        baseline = baseline or throughput
+        print(f'{count:>7} {throughput:>9.1f} {statistics.median(latencies) if latencies else 0:>8.1f} '
+              f'{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} {errors:>7} '
+              f'{throughput / baseline if baseline else 0:>7.2f}x')
+
+if __name__ == '__main__':
+    main()
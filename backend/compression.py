@@ -0,0 +1,93 @@
+"""Compression of JSON API responses.
+
+JSON responses above COMPRESS_MIN_SIZE are gzip or brotli encoded depending
+on the client's Accept-Encoding. Brotli is used only when the brotli package
+is installed. Streamed JSON/NDJSON responses are compressed chunk by chunk so
+they still reach the client as rows are produced. File downloads are left
+alone; most stored documents are already compressed formats.
+"""
+from flask import request
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson'}
+
+def _gzip_compress(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk if isinstance(chunk, bytes) else chunk.encode())
+        # Sync flush so each chunk of rows reaches the client without waiting for the next
+        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _brotli_compress(data, level):
+    return brotli.compress(data, quality=level)
+
+def _brotli_stream(chunks, level):
+    compressor = brotli.Compressor(quality=level)
+    for chunk in chunks:
+        data = compressor.process(chunk if isinstance(chunk, bytes) else chunk.encode())
+        data += compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+def _closing(chunks, compressed):
+    """Close the wrapped iterable too, so streamed responses release their cursor on disconnect"""
+    try:
+        yield from compressed
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+# encoding -> (compress(data, level), stream(chunks, level), config key for the level)
+ENCODINGS = {'gzip': (_gzip_compress, _gzip_stream, 'COMPRESS_GZIP_LEVEL')}
+if brotli is not None:
+    ENCODINGS['br'] = (_brotli_compress, _brotli_stream, 'COMPRESS_BROTLI_LEVEL')
+
+def negotiate_encoding():
+    """Pick the best supported encoding from Accept-Encoding, preferring brotli on ties"""
+    offered = [e for e in ('br', 'gzip') if e in ENCODINGS]
+    return request.accept_encodings.best_match(offered)
+
+def init_compression(app):
+    """Register the after_request hook that compresses JSON responses"""
+    config = app.config
+
+    @app.after_request
+    def compress_response(response):
+        if not config.get('COMPRESS_RESPONSES', True):
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough:
+            return response
+        if 'Content-Encoding' in response.headers or not 200 <= response.status_code < 300:
+            return response
+
+        streamed = response.is_streamed
+        if not streamed and response.calculate_content_length() < config.get('COMPRESS_MIN_SIZE', 1024):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding()
+        if not encoding:
+            return response
+
+        compress, stream, level_key = ENCODINGS[encoding]
+        level = config.get(level_key)
+        if streamed:
+            response.response = _closing(response.response, stream(response.response, level))
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(response.get_data(), level))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,81 @@
+"""pytest fixtures: the app on a throwaway SQLite database seeded by seed_data.
+
+Run from backend/: python -m pytest -q
+
+The app reads its configuration from the environment when app.py is first
+imported, so the database, upload and profile locations are pointed at a
+temporary directory here, before any test imports it.
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Scripts that run against the developer database or a live server on import; not pytest tests
+collect_ignore = ['test_app.py', 'test_entity_creation.py', 'test_entity_creation_api.py', 'test_token.py']
+
+WORKDIR = tempfile.mkdtemp(prefix='gm_tests_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'test.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(WORKDIR, 'uploads')
+os.environ['PROFILE_DIR'] = os.path.join(WORKDIR, 'profiles')
+os.environ['LOG_LEVEL'] = 'WARNING'
+os.environ['RATE_LIMIT_ENABLED'] = 'false'  # Tests log in from one address many times
+os.environ['PROXY_FIX_X_FOR'] = '1'  # As behind nginx
+os.environ['PASSWORD_BCRYPT_ROUNDS'] = '4'  # The minimum; hashing cost is not under test
+# Revocation and ACL version syncs run on the first authenticated request only, not in the middle of a measured one
+os.environ['REVOCATION_SYNC_SECONDS'] = '3600'
+os.environ['ACL_SYNC_SECONDS'] = '3600'
+
+# Enough rows per table that a query per row shows up against a budget
+SEED_SCALE = {'users': 6, 'entities': 12, 'documents_per_entity': 6, 'permanent_per_entity': 2,
+              'audit_logs': 200, 'notifications_per_user': 3}
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    return app
+
+@pytest.fixture(scope='session')
+def seeded(app):
+    """Row counts and a login per role (see seed_data.generate)"""
+    from database import db
+    import seed_data
+    with app.app_context():
+        return seed_data.generate(db, app.config['UPLOAD_FOLDER'], **SEED_SCALE)
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def login(client):
+    """login(email, password) -> Authorization headers for that user"""
+    def login(email, password):
+        response = client.post('/api/auth/login', json={'email': email, 'password': password})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return {'Authorization': f"Bearer {response.get_json()['token']}"}
+    return login
+
+@pytest.fixture
+def headers(seeded, login):
+    """Authorization headers per role for the seeded users"""
+    return {
+        'super_admin': login('admin@gmfinance.com', 'admin123'),
+        'company_secretary': login(seeded['users']['company_secretary'], seeded['password']),
+        'accountant': login(seeded['users']['accountant'], seeded['password']),
+    }
+
+@pytest.fixture
+def query_budget():
+    """Context manager failing the test when a request inside it runs more queries than its
+    endpoint's QUERY_BUDGETS entry (or the given limit):
+
+        with query_budget():
+            client.get('/api/documents/vault', headers=headers['accountant'])
+    """
+    from query_stats import query_budget
+    return query_budget
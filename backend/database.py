@@ -1,9 +1,48 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, update, func, text, event
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
 db = SQLAlchemy()
 
-class User(db.Model):
+class RowVersionCounter(db.Model):
+    """Single-row counter that hands out row versions"""
+    __tablename__ = 'row_version_counter'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+def next_row_version(context):
+    """Column default/onupdate hook allocating the row version for a write.
+    
+    Every row written in one transaction gets the same version, taken from
+    row_version_counter on the statement's own connection. The counter UPDATE
+    holds the write lock until commit, so versions become visible in order.
+    Being a column hook it also runs for bulk_insert_mappings and bulk UPDATEs.
+    """
+    conn = context.connection
+    transaction = conn.get_transaction()
+    cached = conn.info.get('row_version')
+    if cached and cached[0] is transaction:
+        return cached[1]
+    
+    result = conn.execute(text('UPDATE row_version_counter SET value = value + 1 WHERE id = 1'))
+    if result.rowcount == 0:
+        conn.execute(text('INSERT INTO row_version_counter (id, value) VALUES (1, 1)'))
+    version = conn.execute(text('SELECT value FROM row_version_counter WHERE id = 1')).scalar()
+    conn.info['row_version'] = (transaction, version)
+    return version
+
+def current_row_version():
+    """Highest row version handed out so far"""
+    return db.session.execute(select(RowVersionCounter.value).where(RowVersionCounter.id == 1)).scalar() or 0
+
+class VersionedMixin:
+    """Adds row_version and updated_at, bumped on every insert and update"""
+    row_version = db.Column(db.Integer, default=next_row_version, onupdate=next_row_version, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+class User(VersionedMixin, db.Model):
     __tablename__ = 'users'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -13,6 +52,7 @@ class User(db.Model):
     pan = db.Column(db.String(10), unique=True, nullable=True)
     gstin = db.Column(db.String(15), unique=True, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
+    acl_version = db.Column(db.Integer, default=1)  # bumped when role or is_active changes; see authz.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime, nullable=True)
     
@@ -22,7 +62,7 @@ class User(db.Model):
     notifications = db.relationship('Notification', backref='user', lazy=True)
     audit_logs = db.relationship('AuditLog', backref='user', lazy=True)
 
-class Entity(db.Model):
+class Entity(VersionedMixin, db.Model):
     __tablename__ = 'entities'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -37,7 +77,7 @@ class Entity(db.Model):
     fy_start = db.Column(db.Date, nullable=True)  # Financial Year Start
     fy_end = db.Column(db.Date, nullable=True)    # Financial Year End
     owner = db.Column(db.String(255), nullable=True)
-    status = db.Column(db.String(50), default='pending_approval')  # pending_approval, active, rejected
+    status = db.Column(db.String(50), default='pending_approval', index=True)  # pending_approval, active, rejected
     secretary_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     admin_remarks = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -48,27 +88,47 @@ class Entity(db.Model):
     permanent_documents = db.relationship('PermanentDocument', backref='entity', lazy=True, cascade='all, delete-orphan')
     periodic_documents = db.relationship('PeriodicDocument', backref='entity', lazy=True, cascade='all, delete-orphan')
     assignments = db.relationship('EntityAssignment', backref='entity', lazy=True, cascade='all, delete-orphan')
+    document_slots = db.relationship('DocumentSlot', backref='entity', lazy=True, cascade='all, delete-orphan')
 
-class PermanentDocument(db.Model):
+class PermanentDocument(VersionedMixin, db.Model):
     __tablename__ = 'permanent_documents'
     
     id = db.Column(db.Integer, primary_key=True)
-    entity_id = db.Column(db.Integer, db.ForeignKey('entities.id'), nullable=False)
+    entity_id = db.Column(db.Integer, db.ForeignKey('entities.id'), nullable=False, index=True)
     document_type = db.Column(db.String(100), nullable=False)  # pan_card, gst_certificate, incorporation_cert, moa_aoa
     file_path = db.Column(db.String(500), nullable=False)
     file_name = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)
+    codec = db.Column(db.String(20), nullable=True)  # gzip, xz, zstd - None means stored raw
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     # Relationships
     uploader = db.relationship('User', foreign_keys=[uploaded_by], backref='uploaded_permanent_documents')
 
-class PeriodicDocument(db.Model):
+class DocumentSlot(db.Model):
+    """One logical periodic document (entity, period, period_value, type, FY) and its version counter"""
+    __tablename__ = 'document_slots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entity_id = db.Column(db.Integer, db.ForeignKey('entities.id'), nullable=False)
+    financial_year = db.Column(db.String(10), nullable=False)
+    period = db.Column(db.String(50), nullable=False)
+    period_value = db.Column(db.String(50), nullable=False)
+    document_type = db.Column(db.String(100), nullable=False)
+    current_version = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('entity_id', 'period', 'period_value', 'document_type', 'financial_year',
+                            name='unique_document_slot'),
+    )
+
+class PeriodicDocument(VersionedMixin, db.Model):
     __tablename__ = 'periodic_documents'
     
     id = db.Column(db.Integer, primary_key=True)
     entity_id = db.Column(db.Integer, db.ForeignKey('entities.id'), nullable=False)
+    slot_id = db.Column(db.Integer, db.ForeignKey('document_slots.id'), nullable=True)
     financial_year = db.Column(db.String(10), nullable=False)  # e.g., "2023-24"
     period = db.Column(db.String(50), nullable=False)  # monthly, quarterly, yearly
     period_value = db.Column(db.String(50), nullable=False)  # e.g., "Q1", "January", "FY2023-24"
@@ -77,13 +137,21 @@ class PeriodicDocument(db.Model):
     file_name = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)
     version = db.Column(db.Integer, default=1)
+    storage = db.Column(db.String(20), default='full')  # full, delta
+    codec = db.Column(db.String(20), nullable=True)  # gzip, xz, zstd - None means stored raw
+    base_document_id = db.Column(db.Integer, db.ForeignKey('periodic_documents.id'), nullable=True)  # Version a delta applies to
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Relationships
     uploader = db.relationship('User', foreign_keys=[uploaded_by], backref='uploaded_periodic_documents')
+    slot = db.relationship('DocumentSlot', backref=db.backref('versions', lazy=True))
+    
+    __table_args__ = (
+        db.Index('ix_periodic_documents_slot_version', 'slot_id', 'version', unique=True),
+    )
 
-class EntityAssignment(db.Model):
+class EntityAssignment(VersionedMixin, db.Model):
     __tablename__ = 'entity_assignments'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -95,7 +163,7 @@ class EntityAssignment(db.Model):
     
     __table_args__ = (db.UniqueConstraint('entity_id', 'accountant_id', name='unique_assignment'),)
 
-class Notification(db.Model):
+class Notification(VersionedMixin, db.Model):
     __tablename__ = 'notifications'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -120,17 +188,127 @@ class AuditLog(db.Model):
     details = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class RevokedToken(db.Model):
+    """A revoked token, login session or user's tokens; see revocation.py"""
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(80), unique=True, nullable=False)  # jti:<jti>, sid:<sid> or user:<id>
+    user_id = db.Column(db.Integer, nullable=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)  # after this the revoked tokens have expired anyway
+
+class Tombstone(db.Model):
+    """Marker left behind by a deleted row so sync clients can drop their copy"""
+    __tablename__ = 'tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    resource = db.Column(db.String(50), nullable=False)  # table name of the deleted row
+    row_id = db.Column(db.Integer, nullable=False)
+    entity_id = db.Column(db.Integer, nullable=True)  # for access scoping; the entity may be gone too
+    user_id = db.Column(db.Integer, nullable=True)  # owner, accountant or recipient of the row
+    row_version = db.Column(db.Integer, default=next_row_version, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# model -> (entity id attribute, user id attribute) recorded on its tombstones
+TOMBSTONE_SCOPES = {
+    User: (None, 'id'),
+    Entity: ('id', 'secretary_id'),
+    EntityAssignment: ('entity_id', 'accountant_id'),
+    PermanentDocument: ('entity_id', 'uploaded_by'),
+    PeriodicDocument: ('entity_id', 'uploaded_by'),
+    Notification: ('related_entity_id', 'user_id')
+}
+
+def record_tombstone(mapper, connection, target):
+    """after_delete hook; bulk query.delete() calls bypass it and leave no tombstone"""
+    entity_attr, user_attr = TOMBSTONE_SCOPES[type(target)]
+    connection.execute(Tombstone.__table__.insert().values(
+        resource=target.__tablename__,
+        row_id=target.id,
+        entity_id=getattr(target, entity_attr) if entity_attr else None,
+        user_id=getattr(target, user_attr) if user_attr else None
+    ))
+
+for _model in TOMBSTONE_SCOPES:
+    event.listen(_model, 'after_delete', record_tombstone)
+
+def reserve_document_version(entity_id, financial_year, period, period_value, document_type):
+    """Atomically reserve the next version number for a document slot.
+    
+    The increment is a single UPDATE, so the row (SQLite: database) write lock is
+    held until the caller commits and concurrent uploads to the same slot serialize.
+    """
+    key = {
+        'entity_id': entity_id,
+        'financial_year': financial_year,
+        'period': period,
+        'period_value': period_value,
+        'document_type': document_type
+    }
+    slot = DocumentSlot.query.filter_by(**key).first()
+    if not slot:
+        try:
+            with db.session.begin_nested():
+                slot = DocumentSlot(current_version=0, **key)
+                db.session.add(slot)
+        except IntegrityError:
+            # Another upload created the slot first
+            slot = DocumentSlot.query.filter_by(**key).first()
+    
+    db.session.execute(
+        update(DocumentSlot)
+        .where(DocumentSlot.id == slot.id)
+        .values(current_version=DocumentSlot.current_version + 1)
+    )
+    version = db.session.execute(
+        select(DocumentSlot.current_version).where(DocumentSlot.id == slot.id)
+    ).scalar_one()
+    return slot, version
+
+def backfill_document_slots():
+    """Create slots for periodic documents uploaded before slots existed"""
+    key_columns = (
+        PeriodicDocument.entity_id,
+        PeriodicDocument.financial_year,
+        PeriodicDocument.period,
+        PeriodicDocument.period_value,
+        PeriodicDocument.document_type
+    )
+    rows = db.session.query(*key_columns, func.max(PeriodicDocument.version)).filter(
+        PeriodicDocument.slot_id.is_(None)
+    ).group_by(*key_columns).all()
+    
+    for entity_id, financial_year, period, period_value, document_type, max_version in rows:
+        key = {
+            'entity_id': entity_id,
+            'financial_year': financial_year,
+            'period': period,
+            'period_value': period_value,
+            'document_type': document_type
+        }
+        slot = DocumentSlot.query.filter_by(**key).first()
+        if not slot:
+            slot = DocumentSlot(current_version=0, **key)
+            db.session.add(slot)
+            db.session.flush()
+        slot.current_version = max(slot.current_version, max_version or 1)
+        PeriodicDocument.query.filter_by(slot_id=None, **key).update({'slot_id': slot.id})
+    
+    db.session.commit()
+    return len(rows)
+
 def init_db():
     """Initialize the database"""
     db.create_all()
     
     # Create default super admin if not exists
-    from werkzeug.security import generate_password_hash
+    from passwords import hash_password
     admin = User.query.filter_by(email='admin@gmfinance.com').first()
     if not admin:
         admin = User(
             email='admin@gmfinance.com',
-            password_hash=generate_password_hash('admin123'),
+            password_hash=hash_password('admin123'),
             role='super_admin',
             is_active=True
         )
@@ -0,0 +1,411 @@
+"""On-disk storage of uploaded documents.
+
+Periodic documents can optionally be stored as binary deltas against the
+previous version of the same document slot. Re-uploaded ledgers, trial
+balances and GSTR exports usually differ in a few rows, so only the changed
+chunks are written. Every DELTA_SNAPSHOT_INTERVAL versions a full copy is
+kept so reconstruction never walks a long chain.
+
+Cold documents (old uploads and closed financial years) can be compressed in
+place by tier_cold_documents(). The codec is recorded on the document row and
+reads decompress while streaming; hot documents stay raw.
+
+Raw documents can be handed to the fronting web server (DOCUMENT_OFFLOAD):
+Flask checks access and writes the audit log, then returns an
+X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd) header and the web
+server streams the file itself with sendfile. Delta and compressed documents
+have to be rebuilt in Python, so they are always streamed by the worker.
+"""
+from flask import current_app, request, send_file, stream_with_context
+from urllib.parse import quote
+from werkzeug.utils import send_file as werkzeug_send_file
+from metrics import record_download
+from datetime import date, datetime, timedelta
+import gzip
+import io
+import lzma
+import os
+import re
+import shutil
+import struct
+import unicodedata
+import zipfile
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DELTA_MAGIC = b'GMD1'
+
+# Formats whose re-uploads share most of their bytes with the previous version
+TEXT_EXTENSIONS = {'.csv', '.tsv', '.txt', '.json', '.xml'}
+ZIP_EXTENSIONS = {'.xlsx', '.xlsm', '.docx', '.ods', '.zip'}
+
+# Upper bound for a single chunk so files without line breaks still diff well
+MAX_CHUNK_SIZE = 4096
+
+# A delta larger than this fraction of the full file is not worth the reconstruction cost
+MAX_DELTA_RATIO = 0.5
+
+# Hard cap on deltas behind a stored version, whatever DELTA_SNAPSHOT_INTERVAL is set to
+MAX_DELTA_CHAIN = 100
+
+# Bytes decompressed per chunk when streaming a cold-tier document
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def is_delta_candidate(filename):
+    """Check if a file format benefits from delta storage"""
+    ext = os.path.splitext(filename)[1].lower()
+    return ext in TEXT_EXTENSIONS or ext in ZIP_EXTENSIONS
+
+def _split_long(data, start, end, chunks):
+    while end - start > MAX_CHUNK_SIZE:
+        chunks.append((start, start + MAX_CHUNK_SIZE))
+        start += MAX_CHUNK_SIZE
+    if end > start:
+        chunks.append((start, end))
+
+def _chunk_boundaries(data):
+    """Split data into (start, end) chunks at line breaks or zip member headers"""
+    chunks = []
+    offsets = None
+    if data[:4] == b'PK\x03\x04':
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                offsets = sorted({info.header_offset for info in archive.infolist()})
+        except zipfile.BadZipFile:
+            offsets = None
+
+    if offsets:
+        # Unchanged members keep identical compressed bytes between versions
+        bounds = [0] + [o for o in offsets if 0 < o < len(data)] + [len(data)]
+        for start, end in zip(bounds, bounds[1:]):
+            _split_long(data, start, end, chunks)
+        return chunks
+
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', start)
+        end = len(data) if end == -1 else end + 1
+        _split_long(data, start, end, chunks)
+        start = end
+    return chunks
+
+def encode_delta(base, target):
+    """Encode target as copy/insert operations against base"""
+    index = {}
+    for start, end in _chunk_boundaries(base):
+        index.setdefault(base[start:end], start)
+
+    ops = []
+    pending_copy = None  # (offset, length)
+    for start, end in _chunk_boundaries(target):
+        chunk = target[start:end]
+        offset = index.get(chunk)
+        if offset is not None:
+            if pending_copy and pending_copy[0] + pending_copy[1] == offset:
+                pending_copy = (pending_copy[0], pending_copy[1] + len(chunk))
+                continue
+            if pending_copy:
+                ops.append(b'C' + struct.pack('>II', *pending_copy))
+            pending_copy = (offset, len(chunk))
+        else:
+            if pending_copy:
+                ops.append(b'C' + struct.pack('>II', *pending_copy))
+                pending_copy = None
+            ops.append(b'I' + struct.pack('>I', len(chunk)) + chunk)
+    if pending_copy:
+        ops.append(b'C' + struct.pack('>II', *pending_copy))
+
+    return DELTA_MAGIC + zlib.compress(b''.join(ops))
+
+def apply_delta(base, delta):
+    """Rebuild the target bytes from base and an encoded delta"""
+    if delta[:4] != DELTA_MAGIC:
+        raise ValueError('Not a document delta')
+
+    payload = zlib.decompress(delta[4:])
+    out = io.BytesIO()
+    pos = 0
+    while pos < len(payload):
+        op = payload[pos:pos + 1]
+        if op == b'C':
+            offset, length = struct.unpack_from('>II', payload, pos + 1)
+            out.write(base[offset:offset + length])
+            pos += 9
+        elif op == b'I':
+            (length,) = struct.unpack_from('>I', payload, pos + 1)
+            out.write(payload[pos + 5:pos + 5 + length])
+            pos += 5 + length
+        else:
+            raise ValueError('Corrupt document delta')
+    return out.getvalue()
+
+def _gzip_compress(src, dst):
+    with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=9) as out:
+        shutil.copyfileobj(src, out)
+
+def _xz_compress(src, dst):
+    with lzma.LZMAFile(dst, mode='wb', preset=6) as out:
+        shutil.copyfileobj(src, out)
+
+def _zstd_open(path):
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+def _zstd_compress(src, dst):
+    zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+
+# codec name -> (file suffix, opener returning a decompressing stream, compressor(src, dst))
+CODECS = {
+    'gzip': ('.gz', lambda path: gzip.open(path, 'rb'), _gzip_compress),
+    'xz': ('.xz', lambda path: lzma.open(path, 'rb'), _xz_compress),
+}
+if zstandard is not None:
+    CODECS['zstd'] = ('.zst', _zstd_open, _zstd_compress)
+
+def open_document(doc):
+    """Open a stored document file for reading, decompressing cold-tier files"""
+    codec = getattr(doc, 'codec', None)
+    if not codec:
+        return open(doc.file_path, 'rb')
+    if codec not in CODECS:
+        raise ValueError(f'Unsupported storage codec: {codec}')
+    return CODECS[codec][1](doc.file_path)
+
+def _delta_chain(doc):
+    """doc and the versions its contents are rebuilt from, newest first, ending at a full copy"""
+    chain = [doc]
+    while getattr(chain[-1], 'storage', 'full') == 'delta':
+        if len(chain) > MAX_DELTA_CHAIN:
+            raise ValueError(f'Delta chain of {doc.file_name} is longer than {MAX_DELTA_CHAIN} versions')
+        base_doc = type(doc).query.get(chain[-1].base_document_id)
+        if not base_doc:
+            raise FileNotFoundError(f'Base version of {doc.file_name} is missing')
+        chain.append(base_doc)
+    return chain
+
+def read_document_bytes(doc):
+    """Read a document's full contents, reconstructing delta-stored versions"""
+    chain = _delta_chain(doc)
+    with open_document(chain[-1]) as f:
+        data = f.read()
+    for delta_doc in reversed(chain[:-1]):
+        with open_document(delta_doc) as f:
+            data = apply_delta(data, f.read())
+    return data
+
+def store_as_delta(doc, previous_doc):
+    """Replace a freshly saved full file with a delta against previous_doc when worthwhile.
+
+    Returns True if the document row was switched to delta storage.
+    """
+    config = current_app.config
+    if not config.get('DOCUMENT_DELTA_STORAGE'):
+        return False
+    if not previous_doc or not is_delta_candidate(doc.file_name):
+        return False
+
+    # Keep a full snapshot every N versions to bound the reconstruction chain
+    interval = max(1, config.get('DELTA_SNAPSHOT_INTERVAL', 10))
+    if (doc.version - 1) % interval == 0:
+        return False
+
+    try:
+        # A chain already at the cap (e.g. versions that skipped their snapshot) starts over with a full copy
+        if len(_delta_chain(previous_doc)) > MAX_DELTA_CHAIN:
+            return False
+        base = read_document_bytes(previous_doc)
+    except (OSError, ValueError):
+        return False
+
+    with open(doc.file_path, 'rb') as f:
+        target = f.read()
+    delta = encode_delta(base, target)
+    if len(delta) > len(target) * MAX_DELTA_RATIO:
+        return False
+
+    delta_path = doc.file_path + '.delta'
+    with open(delta_path, 'wb') as f:
+        f.write(delta)
+    os.remove(doc.file_path)
+
+    doc.file_path = delta_path
+    doc.storage = 'delta'
+    doc.base_document_id = previous_doc.id
+    return True
+
+def offload_document(doc, as_attachment):
+    """Response asking the web server to send a raw stored file, or None if it can't be offloaded"""
+    config = current_app.config
+    mode = config.get('DOCUMENT_OFFLOAD')
+    if mode not in ('x-accel-redirect', 'x-sendfile'):
+        return None
+
+    path = os.path.abspath(doc.file_path)
+    upload_root = os.path.abspath(config['UPLOAD_FOLDER'])
+    if os.path.commonpath([path, upload_root]) != upload_root:
+        return None
+
+    # Werkzeug builds the disposition and last-modified headers and an empty
+    # X-Sendfile body without opening the file. Conditional and range requests
+    # are left to the web server, which answers them from the file it sends
+    response = werkzeug_send_file(
+        path,
+        request.environ,
+        as_attachment=as_attachment,
+        download_name=doc.file_name,
+        mimetype='application/octet-stream',
+        use_x_sendfile=True,
+        conditional=False,
+        etag=False,
+        response_class=current_app.response_class
+    )
+    if mode == 'x-accel-redirect':
+        del response.headers['X-Sendfile']
+        relative = os.path.relpath(path, upload_root).replace(os.sep, '/')
+        prefix = config.get('DOCUMENT_OFFLOAD_PREFIX', '/protected-uploads/').rstrip('/')
+        response.headers['X-Accel-Redirect'] = f'{prefix}/{quote(relative)}'
+        # The body is empty; nginx sends the length of the file it serves
+        response.headers.pop('Content-Length', None)
+    return response
+
+def _disposition_params(file_name):
+    """Content-Disposition filename parameters, as werkzeug's send_file builds them"""
+    try:
+        file_name.encode('ascii')
+        return {'filename': file_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', file_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(file_name, safe='!#$&+-.^_`|~')}"}
+
+def _stream_decompressed(doc, as_attachment):
+    """Stream a cold-tier document, decompressing it chunk by chunk.
+
+    The decompressing readers expose fileno() of the compressed file, so they
+    must not reach send_file: wsgi.file_wrapper would sendfile the compressed
+    bytes (or fail, as gunicorn does on GzipFile's integer mode).
+    """
+    f = open_document(doc)
+
+    def chunks():
+        with f:
+            yield from iter(lambda: f.read(STREAM_CHUNK_SIZE), b'')
+
+    response = current_app.response_class(stream_with_context(chunks()), mimetype='application/octet-stream')
+    response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline',
+                         **_disposition_params(doc.file_name))
+    if doc.file_size is not None:
+        # file_size is the uncompressed size recorded at upload
+        response.content_length = doc.file_size
+    return response
+
+def send_document(doc, as_attachment):
+    """Send a stored document, reconstructing or decompressing it if needed"""
+    doc_type = 'periodic' if doc.__tablename__ == 'periodic_documents' else 'permanent'
+    if getattr(doc, 'storage', 'full') == 'delta':
+        record_download(doc_type, doc.file_size)
+        return send_file(
+            io.BytesIO(read_document_bytes(doc)),
+            as_attachment=as_attachment,
+            download_name=doc.file_name,
+            mimetype='application/octet-stream'
+        )
+
+    if getattr(doc, 'codec', None):
+        record_download(doc_type, doc.file_size)
+        return _stream_decompressed(doc, as_attachment)
+
+    offloaded = offload_document(doc, as_attachment)
+    if offloaded is not None:
+        record_download(doc_type, doc.file_size, offloaded=True)
+        return offloaded
+
+    record_download(doc_type, doc.file_size)
+    return send_file(
+        doc.file_path,
+        as_attachment=as_attachment,
+        download_name=doc.file_name,
+        mimetype='application/octet-stream'
+    )
+
+def financial_year_closed(financial_year, today=None):
+    """Check if a financial year label such as "2023-24" or "FY2023-2024" has ended (31 March)"""
+    match = re.search(r'(\d{4})', financial_year or '')
+    if not match:
+        return False
+    today = today or date.today()
+    return date(int(match.group(1)) + 1, 3, 31) < today
+
+def compress_document(doc, codec):
+    """Compress a raw document file in place and record the codec on its row.
+
+    The raw file is left on disk; the caller removes it after committing so
+    concurrent readers of the old row never hit a missing file.
+    Returns the path of the raw file.
+    """
+    if codec not in CODECS:
+        raise ValueError(f'Unsupported storage codec: {codec}')
+
+    suffix, _, compress = CODECS[codec]
+    raw_path = doc.file_path
+    compressed_path = raw_path + suffix
+    tmp_path = compressed_path + '.tmp'
+    with open(raw_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        compress(src, dst)
+    os.replace(tmp_path, compressed_path)
+
+    doc.file_path = compressed_path
+    doc.codec = codec
+    return raw_path
+
+def tier_cold_documents(age_days=None, codec=None, dry_run=False, batch_size=100):
+    """Compress documents older than age_days or belonging to closed financial years.
+
+    Returns a dict with the number of documents and bytes before/after compression.
+    """
+    from database import db, PermanentDocument, PeriodicDocument
+
+    config = current_app.config
+    age_days = age_days if age_days is not None else config.get('COLD_STORAGE_AGE_DAYS', 180)
+    codec = codec or config.get('COLD_STORAGE_CODEC', 'gzip')
+    cutoff = datetime.utcnow() - timedelta(days=age_days)
+
+    candidates = list(PermanentDocument.query.filter(
+        PermanentDocument.codec.is_(None),
+        PermanentDocument.uploaded_at < cutoff
+    ).all())
+
+    # Delta files are already compressed; closed FYs are checked in Python as labels vary
+    for doc in PeriodicDocument.query.filter(
+        PeriodicDocument.codec.is_(None),
+        db.or_(PeriodicDocument.storage.is_(None), PeriodicDocument.storage == 'full')
+    ).all():
+        if (doc.uploaded_at and doc.uploaded_at < cutoff) or financial_year_closed(doc.financial_year):
+            candidates.append(doc)
+
+    stats = {'documents': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+    raw_paths = []
+    for doc in candidates:
+        if not os.path.exists(doc.file_path):
+            continue
+        raw_size = os.path.getsize(doc.file_path)
+        stats['documents'] += 1
+        stats['raw_bytes'] += raw_size
+        if dry_run:
+            continue
+
+        raw_paths.append(compress_document(doc, codec))
+        stats['stored_bytes'] += os.path.getsize(doc.file_path)
+
+        if len(raw_paths) >= batch_size:
+            db.session.commit()
+            for path in raw_paths:
+                os.remove(path)
+            raw_paths = []
+
+    db.session.commit()
+    for path in raw_paths:
+        os.remove(path)
+    return stats
@@ -0,0 +1,225 @@
+"""Bulk entity onboarding from CSV or Excel (.xlsx) files.
+
+Used by POST /api/entities/import and the import_entities.py command line tool.
+Rows are validated with the same PAN/GSTIN rules as signup, checked for
+uniqueness against the database in a single query, and inserted in chunks.
+"""
+from database import db, Entity
+from routes.auth import validate_pan, validate_gstin
+from sqlalchemy import or_
+from datetime import datetime, date, timedelta
+import csv
+import io
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+ENTITY_FIELDS = ['company_name', 'pan', 'gstin', 'company_type', 'address', 'contact',
+                 'cin', 'incorporation_date', 'fy_start', 'fy_end', 'owner']
+REQUIRED_FIELDS = ['company_name', 'pan', 'gstin', 'company_type', 'address']
+DATE_FIELDS = ['incorporation_date', 'fy_start', 'fy_end']
+EXCEL_MAX_SERIAL = 2958465  # 9999-12-31; larger numbers are not Excel dates
+
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+def normalize_header(name):
+    return re.sub(r'[^a-z0-9]+', '_', (name or '').strip().lower()).strip('_')
+
+def _column_index(cell_ref):
+    """Convert a cell reference such as "C12" to a zero-based column index"""
+    index = 0
+    for ch in cell_ref:
+        if not ch.isalpha():
+            break
+        index = index * 26 + (ord(ch.upper()) - ord('A') + 1)
+    return index - 1
+
+def _iter_xlsx_rows(stream):
+    """Yield each row of the first worksheet as a list of strings"""
+    with zipfile.ZipFile(stream) as archive:
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            with archive.open('xl/sharedStrings.xml') as f:
+                for _, elem in ET.iterparse(f):
+                    if elem.tag == SHEET_NS + 'si':
+                        shared_strings.append(''.join(t.text or '' for t in elem.iter(SHEET_NS + 't')))
+                        elem.clear()
+
+        sheets = sorted(n for n in archive.namelist() if re.match(r'xl/worksheets/sheet\d+\.xml$', n))
+        if not sheets:
+            raise ValueError('Workbook has no worksheets')
+        sheet = 'xl/worksheets/sheet1.xml' if 'xl/worksheets/sheet1.xml' in sheets else sheets[0]
+
+        with archive.open(sheet) as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag != SHEET_NS + 'row':
+                    continue
+                values = {}
+                for cell in elem.iter(SHEET_NS + 'c'):
+                    cell_type = cell.get('t')
+                    if cell_type == 'inlineStr':
+                        value = ''.join(t.text or '' for t in cell.iter(SHEET_NS + 't'))
+                    else:
+                        v = cell.find(SHEET_NS + 'v')
+                        value = v.text if v is not None and v.text is not None else ''
+                        if cell_type == 's' and value:
+                            value = shared_strings[int(value)]
+                    values[_column_index(cell.get('r', 'A'))] = value
+                elem.clear()
+                yield [values.get(i, '') for i in range(max(values) + 1)] if values else []
+
+def iter_entity_rows(stream, filename):
+    """Stream (row_number, {field: value}) pairs from a CSV or XLSX upload"""
+    if filename.lower().endswith('.xlsx'):
+        rows = _iter_xlsx_rows(stream)
+    elif filename.lower().endswith('.csv'):
+        rows = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    else:
+        raise ValueError('Only .csv and .xlsx files are supported')
+
+    header = None
+    for row_number, row in enumerate(rows, start=1):
+        if header is None:
+            header = [normalize_header(h) for h in row]
+            missing = [f for f in REQUIRED_FIELDS if f not in header]
+            if missing:
+                raise ValueError(f"Missing required columns: {', '.join(missing)}")
+            continue
+        if not any((value or '').strip() for value in row):
+            continue
+        yield row_number, {
+            name: (row[i] or '').strip() if i < len(row) else ''
+            for i, name in enumerate(header) if name in ENTITY_FIELDS
+        }
+
+def parse_date(value):
+    """Parse YYYY-MM-DD, DD/MM/YYYY or an Excel serial day number"""
+    if re.match(r'^\d+(\.0+)?$', value) and 1 <= float(value) <= EXCEL_MAX_SERIAL:
+        return date(1899, 12, 30) + timedelta(days=int(float(value)))
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+def validate_entity_row(values):
+    """Validate and normalize one row. Returns (entity_values, errors)"""
+    errors = []
+    for field in REQUIRED_FIELDS:
+        if not values.get(field):
+            errors.append(f'{field} is required')
+
+    pan = values.get('pan', '').upper()
+    gstin = values.get('gstin', '').upper()
+    if pan and not validate_pan(pan):
+        errors.append('Invalid PAN format')
+    if gstin and not validate_gstin(gstin):
+        errors.append('Invalid GSTIN format')
+
+    entity_values = {
+        'company_name': values.get('company_name', ''),
+        'pan': pan,
+        'gstin': gstin,
+        'company_type': values.get('company_type', ''),
+        'address': values.get('address', ''),
+        'contact': values.get('contact') or None,
+        'cin': values.get('cin', '').upper() or None,
+        'owner': values.get('owner') or None
+    }
+    for field in DATE_FIELDS:
+        entity_values[field] = None
+        if values.get(field):
+            try:
+                entity_values[field] = parse_date(values[field])
+            except (ValueError, OverflowError):
+                errors.append(f'Invalid {field} date: {values[field]}')
+
+    return entity_values, errors
+
+def import_entities(rows, secretary_id, chunk_size=500, dry_run=False):
+    """Validate and insert entity rows for a Company Secretary.
+
+    rows is an iterable of (row_number, {field: value}). Returns a report with
+    per-row errors; rows that fail validation are skipped, the rest are inserted.
+    """
+    report = {'total': 0, 'created': 0, 'failed': 0, 'errors': []}
+
+    def fail(row_number, values, errors):
+        report['failed'] += 1
+        report['errors'].append({
+            'row': row_number,
+            'company_name': values.get('company_name'),
+            'pan': values.get('pan'),
+            'errors': errors
+        })
+
+    valid = []
+    seen_pans = {}
+    seen_gstins = {}
+    for row_number, values in rows:
+        report['total'] += 1
+        entity_values, errors = validate_entity_row(values)
+        pan, gstin = entity_values['pan'], entity_values['gstin']
+        if pan and pan in seen_pans:
+            errors.append(f'Duplicate PAN in file (row {seen_pans[pan]})')
+        if gstin and gstin in seen_gstins:
+            errors.append(f'Duplicate GSTIN in file (row {seen_gstins[gstin]})')
+        if errors:
+            fail(row_number, entity_values, errors)
+            continue
+        seen_pans[pan] = row_number
+        seen_gstins[gstin] = row_number
+        valid.append((row_number, entity_values))
+
+    # One set query for uniqueness of the whole batch
+    existing_pans = set()
+    existing_gstins = set()
+    if valid:
+        for pan, gstin in db.session.query(Entity.pan, Entity.gstin).filter(or_(
+            Entity.pan.in_([v['pan'] for _, v in valid]),
+            Entity.gstin.in_([v['gstin'] for _, v in valid])
+        )):
+            existing_pans.add(pan)
+            existing_gstins.add(gstin)
+
+    to_insert = []
+    for row_number, entity_values in valid:
+        errors = []
+        if entity_values['pan'] in existing_pans:
+            errors.append('An entity with this PAN already exists')
+        if entity_values['gstin'] in existing_gstins:
+            errors.append('An entity with this GSTIN already exists')
+        if errors:
+            fail(row_number, entity_values, errors)
+        else:
+            to_insert.append((row_number, entity_values))
+
+    if dry_run:
+        report['created'] = len(to_insert)
+        return report
+
+    for start in range(0, len(to_insert), chunk_size):
+        chunk = to_insert[start:start + chunk_size]
+        mappings = [
+            dict(values, secretary_id=secretary_id, status='pending_approval')
+            for _, values in chunk
+        ]
+        try:
+            db.session.bulk_insert_mappings(Entity, mappings)
+            db.session.commit()
+            report['created'] += len(chunk)
+        except Exception:
+            # A concurrent insert took a PAN/GSTIN - retry row by row to isolate it
+            db.session.rollback()
+            for (row_number, values), mapping in zip(chunk, mappings):
+                try:
+                    db.session.add(Entity(**mapping))
+                    db.session.commit()
+                    report['created'] += 1
+                except Exception as e:
+                    db.session.rollback()
+                    fail(row_number, values, [f'Could not be saved: {e.__class__.__name__}'])
+
+    report['errors'].sort(key=lambda e: e['row'])
+    return report
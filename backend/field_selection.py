@@ -0,0 +1,36 @@
+"""Sparse fieldsets for list endpoints.
+
+List endpoints accept ?fields=id,company_name to return only some keys.
+Each endpoint maps its public field names to column expressions; only the
+requested columns are selected (and only the joins they need are made), so
+dropdowns and typeaheads skip wide columns such as address.
+"""
+from flask import request
+
+def requested_fields(available, always=('id',)):
+    """Parse the fields query parameter against the fields an endpoint offers.
+
+    Returns the requested fields in the endpoint's order, or all of them when
+    the parameter is absent. Raises ValueError for unknown fields.
+    """
+    raw = request.args.get('fields', '').strip()
+    if not raw:
+        return list(available)
+
+    requested = {f.strip() for f in raw.split(',') if f.strip()}
+    unknown = sorted(requested - set(available))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}")
+    requested.update(f for f in always if f in available)
+    return [f for f in available if f in requested]
+
+def select_columns(column_map, fields):
+    """Labelled column expressions for the requested fields that map to columns"""
+    return [column_map[f].label(f) for f in fields if f in column_map]
+
+def row_to_dict(row, fields, constants=None):
+    """Build a response dict from a selected row, filling constant fields"""
+    values = row._mapping
+    if constants:
+        return {f: constants[f] if f in constants else values[f] for f in fields}
+    return {f: values[f] for f in fields}
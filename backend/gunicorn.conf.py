@@ -0,0 +1,74 @@
+"""Gunicorn settings for serving the API in production.
+
+Usage: gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden with an environment variable:
+
+- WEB_CONCURRENCY: worker processes (default 2 x CPU cores + 1)
+- WEB_THREADS: threads per worker for the gthread worker (default 4)
+- WEB_WORKER_CLASS: gthread (default), sync, or any installed gunicorn worker
+- WEB_KEEPALIVE: seconds an idle keep-alive connection is held open (default 5)
+- WEB_TIMEOUT: seconds before a stuck worker is restarted (default 120, large uploads)
+- WEB_MAX_REQUESTS: recycle a worker after this many requests (default 2000, 0 disables)
+- PORT / WEB_BIND: listen address (default 0.0.0.0:5000)
+
+Requests mostly wait on SQLite and disk, so each process runs a few threads;
+processes are what scale throughput with cores since the GIL limits a single
+one. The app is preloaded so startup migrations run once in the master before
+the workers fork.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('WEB_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('WEB_THREADS', 4))
+
+# Keep-alive lets the frontend reuse connections for its burst of API calls per page
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers periodically to cap memory growth; jitter avoids restarting them all at once
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 200))
+
+preload_app = True
+backlog = int(os.environ.get('WEB_BACKLOG', 2048))
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None  # empty disables the access log
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+# Workers write metric samples here so /metrics can add them up (see metrics.py).
+# Must be set before the app, and with it prometheus_client, is imported
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'gm_finance_metrics'))
+
+# Trust X-Forwarded-* only from the local reverse proxy (the app reads the client
+# address from X-Forwarded-For when PROXY_FIX_X_FOR is set, see app.py)
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+def on_starting(server):
+    """Start each server run with empty metric files"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    """Drop a dead worker's live samples so restarts don't inflate the totals"""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master; each worker opens its own"""
+    from app import app
+    from database import db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,60 @@
+"""HTTP caching for slow-changing endpoints.
+
+@cached() adds a Cache-Control header and a weak ETag to successful GET
+responses and answers a matching If-None-Match with 304 Not Modified, so the
+browser can reuse its copy instead of downloading the body again.
+
+The ETag is a hash of the response body unless the route passes an etag
+function, which is called with the view arguments before the view runs; a
+matching tag then skips the view (and its queries) entirely.
+"""
+from flask import request, make_response
+from functools import wraps
+import hashlib
+
+def weak_etag(*parts):
+    """Build a short tag from the given parts (row versions, timestamps, ids)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+def _not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def cached(max_age=0, private=True, etag=None):
+    """Decorator adding Cache-Control and weak ETag handling to a GET view.
+
+    private responses are only stored by the user's browser and vary on the
+    Authorization header; max_age=0 makes the browser revalidate every time.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            tag = etag(*args, **kwargs) if etag else None
+            if tag and request.if_none_match.contains_weak(tag):
+                response = _not_modified(tag)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if tag:
+                    response.set_etag(tag, weak=True)
+                elif not response.is_streamed:
+                    response.set_etag(weak_etag(response.get_data()), weak=True)
+                response.make_conditional(request)
+
+            if private:
+                response.cache_control.private = True
+                response.vary.add('Authorization')
+            else:
+                response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            if not max_age:
+                response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,52 @@
+"""Bulk import entities from a CSV or XLSX file.
+
+The file needs a header row with at least company_name, pan, gstin,
+company_type and address columns. Optional columns: contact, cin,
+incorporation_date, fy_start, fy_end, owner.
+
+Usage: python import_entities.py clients.xlsx --secretary-email cs@example.com [--dry-run]
+"""
+import argparse
+import json
+import sys
+
+from app import app
+from database import User
+from entity_import import iter_entity_rows, import_entities
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import entities from CSV/XLSX')
+    parser.add_argument('path', help='CSV or XLSX file to import')
+    parser.add_argument('--secretary-email', required=True, help='Company Secretary who will own the entities')
+    parser.add_argument('--chunk-size', type=int, default=None, help='Rows per insert (default: ENTITY_IMPORT_CHUNK_SIZE)')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only, do not insert')
+    parser.add_argument('--report', help='Write the full JSON report to this file')
+    args = parser.parse_args()
+
+    with app.app_context():
+        secretary = User.query.filter_by(email=args.secretary_email.strip().lower()).first()
+        if not secretary or secretary.role != 'company_secretary':
+            print(f"[ERROR] {args.secretary_email} is not a Company Secretary")
+            sys.exit(1)
+
+        chunk_size = args.chunk_size or app.config.get('ENTITY_IMPORT_CHUNK_SIZE', 500)
+        with open(args.path, 'rb') as f:
+            try:
+                report = import_entities(iter_entity_rows(f, args.path), secretary.id,
+                                         chunk_size=chunk_size, dry_run=args.dry_run)
+            except ValueError as e:
+                print(f"[ERROR] {e}")
+                sys.exit(1)
+
+    label = 'valid' if args.dry_run else 'created'
+    print(f"[OK] {report['total']} rows: {report['created']} {label}, {report['failed']} failed")
+    for error in report['errors']:
+        print(f"  Row {error['row']} ({error['company_name'] or '-'}): {'; '.join(error['errors'])}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Report written to {args.report}")
+
+if __name__ == '__main__':
+    main()
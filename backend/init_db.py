@@ -1,7 +1,7 @@
 """Initialize database and verify all tables exist"""
 from app import app
 from database import db, User
-from werkzeug.security import generate_password_hash
+from passwords import hash_password
 
 with app.app_context():
     # Create all tables
@@ -18,7 +18,7 @@ with app.app_context():
     if not admin:
         admin = User(
             email='admin@gmfinance.com',
-            password_hash=generate_password_hash('admin123'),
+            password_hash=hash_password('admin123'),
             role='super_admin',
             is_active=True
         )
@@ -0,0 +1,428 @@
+"""HTTP load test built from the frontend's role workflows.
+
+Virtual accountants and company secretaries log in and then repeat what the
+pages in frontend/pages do, picking an action by weight each time:
+
+- entity list: /entities/my-entities and the synced entity list
+- vault browse: the vault list kept current with /sync/delta, sometimes
+  filtered by entity as on the vault page
+- download: fetch a document picked from the user's vault
+- upload: accountants upload a periodic document (accountant/upload page),
+  secretaries a permanent one
+- notification polling: unread count and the synced notification list
+
+Every session starts with a login and a full sync, and users log in again
+after --session-actions actions. The test runs in stages of increasing
+concurrency (--concurrency 1,2,4,...), each for --duration seconds, and
+reports per stage the throughput, p50/p95/p99 latency and error rate, per
+request step and overall. The stages together form the saturation curve: the
+point where throughput stops growing while latency keeps rising is the
+node's capacity. The curve is printed and written to a JSON report.
+
+Without --url a throwaway database is seeded with seed_data and served by
+gunicorn (gunicorn.conf.py, --workers). With --url the target must have been
+seeded with seed_data.py at the same --scale, since virtual users log in as
+the generated accounts, and run with RATE_LIMIT_ENABLED=false, since they all
+log in from one address.
+
+Usage: python loadtest.py [--concurrency 1,2,4,8,16,32] [--duration 20] [--think-ms 0]
+                          [--url http://localhost:5000] [--workers 4] [--output loadtest_report.json]
+"""
+import argparse
+import gzip
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from seed_data import scale_options, scale_from_args, user_emails, SEED_PASSWORD
+
+# Action weights per role, roughly how often the pages are used
+ACTIONS = {
+    'accountant': {'entity_list': 10, 'vault_browse': 30, 'download': 15, 'upload': 10, 'notification_poll': 35},
+    'company_secretary': {'entity_list': 30, 'vault_browse': 20, 'download': 10, 'upload': 5, 'notification_poll': 35},
+}
+ACCOUNTANT_SHARE = 0.6  # of the virtual users; the rest are secretaries
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(host, port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def multipart(fields, file_field, file_name, content):
+    """Encode a multipart/form-data body; returns (body, content type)"""
+    boundary = f'----loadtest{random.getrandbits(64):016x}'
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{file_name}"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'.encode() + content + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+class StepFailed(Exception):
+    pass
+
+class VirtualUser:
+    """One simulated user on a keep-alive connection, recording (step, ms, ok) per request"""
+
+    def __init__(self, host, port, role, email, options, rng, record):
+        self.host = host
+        self.port = port
+        self.role = role
+        self.email = email
+        self.options = options
+        self.rng = rng
+        self.record = record
+        self.conn = None
+        self.token = None
+        self.marks = {}
+        self.vault = []
+        self.entity_ids = []
+        self.upload_body = b'%PDF-1.4\n' + os.urandom(options['upload_kb'] * 1024)
+
+    def request(self, step, method, path, body=None, headers=None, parse=False):
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        headers.setdefault('Accept-Encoding', 'gzip')
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.record(step, (time.perf_counter() - start) * 1000, False)
+            self.conn.close()
+            self.conn = None
+            raise StepFailed(step)
+        ok = response.status < 400
+        self.record(step, (time.perf_counter() - start) * 1000, ok)
+        if not ok:
+            raise StepFailed(step)
+        if parse:
+            if response.getheader('Content-Encoding') == 'gzip':
+                data = gzip.decompress(data)
+            return json.loads(data)
+        return data
+
+    def sync(self, step, resources):
+        """Bring the cached lists up to date like frontend/utils/syncCache.ts"""
+        query = '&'.join(f'{r}={self.marks.get(r, 0)}' for r in resources)
+        delta = self.request(step, 'GET', f'/api/sync/delta?{query}', parse=True)
+        for resource in resources:
+            self.marks[resource] = delta[resource]['version']
+        if 'vault' in delta:
+            upserted = delta['vault']['upserted']
+            if upserted or not self.vault:
+                known = {(d['doc_type'], d['id']): d for d in self.vault}
+                known.update({(d['doc_type'], d['id']): d for d in upserted})
+                self.vault = list(known.values())
+        if 'entities' in delta and delta['entities']['upserted']:
+            self.entity_ids = sorted({e['id'] for e in delta['entities']['upserted']} | set(self.entity_ids))
+
+    def login(self):
+        self.token = None
+        self.marks = {}
+        body = json.dumps({'email': self.email, 'password': self.options['password']})
+        result = self.request('login', 'POST', '/api/auth/login', body=body,
+                              headers={'Content-Type': 'application/json'}, parse=True)
+        self.token = result['token']
+        self.request('me', 'GET', '/api/auth/me')
+        # Dashboard load: a full sync of the lists the pages show
+        self.sync('sync_full', ['entities', 'vault', 'notifications'])
+
+    def entity_list(self):
+        self.request('my_entities', 'GET', '/api/entities/my-entities')
+        self.sync('sync_entities', ['entities'])
+        if self.entity_ids:
+            self.request('entity_detail', 'GET', f'/api/entities/{self.rng.choice(self.entity_ids)}')
+
+    def vault_browse(self):
+        self.sync('sync_vault', ['vault'])
+        if self.entity_ids and self.rng.random() < 0.3:
+            self.request('vault_filtered', 'GET', f'/api/documents/vault?entity_id={self.rng.choice(self.entity_ids)}')
+
+    def download(self):
+        if not self.vault:
+            return self.vault_browse()
+        doc = self.rng.choice(self.vault)
+        self.request('download', 'GET', f"/api/documents/{doc['doc_type']}/{doc['id']}/download")
+
+    def upload(self):
+        entities = self.request('upload_entities', 'GET', '/api/entities/my-entities?fields=id,company_name', parse=True)
+        ids = [e['id'] for e in entities.get('entities', [])]
+        if not ids:
+            return
+        entity_id = self.rng.choice(ids)
+        if self.role == 'accountant':
+            body, content_type = multipart({
+                'entity_id': entity_id,
+                'period': 'monthly',
+                'period_value': self.rng.choice(['April', 'May', 'June']),
+                'document_type': 'Load Test',
+                'financial_year': '2024-2025'
+            }, 'file', 'loadtest.pdf', self.upload_body)
+            self.request('upload_periodic', 'POST', '/api/documents/upload', body=body,
+                         headers={'Content-Type': content_type})
+        else:
+            body, content_type = multipart({'entity_id': entity_id, 'document_type': 'moa_aoa'},
+                                           'file', 'loadtest.pdf', self.upload_body)
+            self.request('upload_permanent', 'POST', '/api/documents/permanent/upload', body=body,
+                         headers={'Content-Type': content_type})
+
+    def notification_poll(self):
+        self.request('unread_count', 'GET', '/api/notifications/unread-count')
+        self.sync('sync_notifications', ['notifications'])
+
+    def run(self, deadline):
+        weights = ACTIONS[self.role]
+        names, counts = list(weights), list(weights.values())
+        actions = 0
+        while time.perf_counter() < deadline:
+            try:
+                if self.token is None or actions >= self.options['session_actions']:
+                    actions = 0
+                    self.login()
+                getattr(self, self.rng.choices(names, counts)[0])()
+                actions += 1
+            except StepFailed:
+                time.sleep(0.05)  # a failed login leaves token unset, so the next pass retries it
+            if self.options['think_ms']:
+                time.sleep(self.rng.expovariate(1000 / self.options['think_ms']))
+        if self.conn is not None:
+            self.conn.close()
+
+def client_process(host, port, users, options, duration, results):
+    """Run the given (role, email, seed) virtual users for duration seconds and return their samples"""
+    samples = {}
+    lock = threading.Lock()
+
+    def record(step, ms, ok):
+        with lock:
+            latencies, errors = samples.setdefault(step, ([], [0]))
+            latencies.append(ms)
+            if not ok:
+                errors[0] += 1
+
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=VirtualUser(host, port, role, email, options, random.Random(seed), record).run,
+                         args=(deadline,))
+        for role, email, seed in users
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put({step: (latencies, errors[0]) for step, (latencies, errors) in samples.items()})
+
+def run_stage(host, port, concurrency, duration, emails, options, seed):
+    """One load stage; returns {step: (latencies, errors)}"""
+    rng = random.Random(seed + concurrency)
+    users = []
+    for n in range(concurrency):
+        role = 'accountant' if rng.random() < ACCOUNTANT_SHARE else 'company_secretary'
+        users.append((role, emails[role][n % len(emails[role])], rng.getrandbits(32)))
+
+    procs = max(1, min(concurrency, multiprocessing.cpu_count()))
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=client_process,
+                                args=(host, port, users[n::procs], options, duration, results))
+        for n in range(procs)
+    ]
+    for proc in workers:
+        proc.start()
+    merged = {}
+    for _ in workers:
+        for step, (latencies, errors) in results.get().items():
+            all_latencies, all_errors = merged.setdefault(step, ([], [0]))
+            all_latencies.extend(latencies)
+            all_errors[0] += errors
+    for proc in workers:
+        proc.join()
+    return {step: (latencies, errors[0]) for step, (latencies, errors) in merged.items()}
+
+def summarize(latencies, errors, duration):
+    return {
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / duration, 2),
+        'errors': errors,
+        'error_rate': round(errors / len(latencies), 4) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+def find_capacity(stages, slo_ms, max_error_rate):
+    """Highest concurrency meeting the latency/error objective, and where throughput stopped scaling"""
+    capacity = None
+    for stage in stages:
+        total = stage['total']
+        if total['p95_ms'] <= slo_ms and total['error_rate'] <= max_error_rate:
+            capacity = stage['concurrency']
+    knee = None
+    for previous, stage in zip(stages, stages[1:]):
+        if stage['total']['throughput'] < previous['total']['throughput'] * 1.1:
+            knee = previous['concurrency']
+            break
+    return capacity, knee
+
+def print_curve(stages):
+    peak = max((s['total']['throughput'] for s in stages), default=0) or 1
+    print('\nSaturation curve (throughput, with p95 latency):')
+    for stage in stages:
+        total = stage['total']
+        bar = '#' * int(40 * total['throughput'] / peak)
+        print(f"{stage['concurrency']:>5} users |{bar:<40}| {total['throughput']:>8.1f} req/s  p95 {total['p95_ms']:>8.1f} ms")
+
+def start_server(args, scale, workdir):
+    """Seed a throwaway database and start gunicorn on it; returns (process, host, port)"""
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'  # All virtual users log in from one address
+
+    from app import app
+    from database import db
+    import seed_data
+
+    with app.app_context():
+        seed_data.generate(db, app.config['UPLOAD_FOLDER'], seed=args.seed, **scale)
+        db.session.remove()
+        db.engine.dispose()
+
+    port = free_port()
+    env = dict(os.environ,
+               WEB_CONCURRENCY=str(args.workers),
+               WEB_BIND=f'127.0.0.1:{port}',
+               WEB_ACCESS_LOG='',
+               WEB_LOG_LEVEL='warning',
+               PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'prometheus'))
+    # Server logs (e.g. query budget warnings) go to a file so they don't interleave with the results
+    log_path = os.path.join(workdir, 'server.log')
+    with open(log_path, 'w') as log:
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stdout=subprocess.DEVNULL, stderr=log
+        )
+    print(f'Started gunicorn with {args.workers} workers on port {port}; server log: {log_path}')
+    return server, '127.0.0.1', port
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the API with role-based user workflows')
+    parser.add_argument('--url', help='Server to test (seeded with seed_data.py); default starts gunicorn on a throwaway database')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count() * 2 + 1, help='Gunicorn workers when no --url is given')
+    parser.add_argument('--concurrency', default='1,2,4,8,16,32', help='Comma-separated virtual user counts, one stage each')
+    parser.add_argument('--duration', type=int, default=20, help='Seconds per stage')
+    parser.add_argument('--think-ms', type=float, default=0, help='Mean pause between actions (0 = closed loop, as fast as possible)')
+    parser.add_argument('--session-actions', type=int, default=25, help='Actions before a virtual user logs in again')
+    parser.add_argument('--upload-kb', type=int, default=200, help='Size of uploaded documents')
+    parser.add_argument('--slo-ms', type=float, default=500, help='p95 latency objective used to state capacity')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='Error rate objective used to state capacity')
+    parser.add_argument('--output', default='loadtest_report.json', help='Where to write the JSON report')
+    scale_options(parser)
+    args = parser.parse_args()
+
+    scale = scale_from_args(args)
+    emails = user_emails(scale['users'])
+    options = {
+        'password': SEED_PASSWORD,
+        'think_ms': args.think_ms,
+        'session_actions': args.session_actions,
+        'upload_kb': args.upload_kb,
+    }
+
+    server = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        workdir = tempfile.mkdtemp(prefix='gm_loadtest_')
+        server, host, port = start_server(args, scale, workdir)
+    try:
+        if not wait_for_server(host, port):
+            print(f'Server at {host}:{port} is not reachable')
+            sys.exit(1)
+
+        print(f"{'users':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'err %':>6}")
+        stages = []
+        for concurrency in [int(n) for n in args.concurrency.split(',') if n.strip()]:
+            samples = run_stage(host, port, concurrency, args.duration, emails, options, args.seed)
+            all_latencies = [ms for latencies, _ in samples.values() for ms in latencies]
+            total = summarize(all_latencies, sum(errors for _, errors in samples.values()), args.duration)
+            stages.append({
+                'concurrency': concurrency,
+                'total': total,
+                'steps': {step: summarize(latencies, errors, args.duration)
+                          for step, (latencies, errors) in sorted(samples.items())}
+            })
+            print(f"{concurrency:>5} {total['throughput']:>9.1f} {total['p50_ms']:>8.1f} {total['p95_ms']:>8.1f} "
+                  f"{total['p99_ms']:>8.1f} {total['errors']:>7} {total['error_rate'] * 100:>5.1f}%")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if not stages:
+        return
+    print(f"\nPer step at {stages[-1]['concurrency']} users:")
+    print(f"{'step':<20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for step, s in stages[-1]['steps'].items():
+        print(f"{step:<20} {s['throughput']:>8.1f} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['errors']:>7}")
+
+    print_curve(stages)
+    capacity, knee = find_capacity(stages, args.slo_ms, args.max_error_rate)
+    print(f"\nCapacity: {capacity if capacity is not None else 'none of the stages'} concurrent users within "
+          f"p95 <= {args.slo_ms:.0f} ms and <= {args.max_error_rate:.0%} errors")
+    if knee is not None:
+        print(f'Throughput stopped scaling after {knee} users')
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'target': args.url or f'gunicorn, {args.workers} workers',
+        'cpus': os.cpu_count(),
+        'scale': {'name': args.scale, 'seed': args.seed, **scale},
+        'duration': args.duration,
+        'think_ms': args.think_ms,
+        'slo': {'p95_ms': args.slo_ms, 'max_error_rate': args.max_error_rate},
+        'capacity': capacity,
+        'knee': knee,
+        'stages': stages,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Report written to {args.output}')
+
+if __name__ == '__main__':
+    main()
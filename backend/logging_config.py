@@ -0,0 +1,154 @@
+"""Application logging.
+
+Every module logs through logging.getLogger(__name__). init_logging() sets up
+the root logger so that:
+
+- records are JSON objects (LOG_FORMAT=json, the default) or readable lines
+  (LOG_FORMAT=text, for development), filtered by LOG_LEVEL
+- records made while handling a request carry its request_id, method and
+  path; the id is taken from an incoming X-Request-ID header or generated,
+  and returned in the X-Request-ID response header
+- DEBUG records are sampled (LOG_DEBUG_SAMPLE_RATE) so verbose debugging can
+  stay switched on under load
+- request threads only put records on a queue; a listener thread formats
+  and writes them, so slow stdout/disk never holds up a response
+"""
+from flask import g, request, has_request_context
+from datetime import datetime, timezone
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# LogRecord attributes that are not extra fields
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id', 'method', 'path'}
+
+_listener = None
+
+class RequestContextFilter(logging.Filter):
+    """Add the current request's id, method and path to records logged during a request"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+        else:
+            record.request_id = record.method = record.path = None
+        return True
+
+class DebugSamplingFilter(logging.Filter):
+    """Keep only a fraction of DEBUG records; other levels always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; extra={...} fields are included as keys"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+            entry['method'] = record.method
+            entry['path'] = record.path
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Readable single lines for development, with the request id when there is one"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        if getattr(record, 'request_id', None):
+            line = f'{line} [{record.request_id}]'
+        return line
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves formatting to the listener but renders arguments and tracebacks now"""
+
+    def prepare(self, record):
+        # Arguments and exc_info may reference request objects that are gone by the time the listener runs
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _start_listener(handler, output):
+    """Start the thread that writes queued records; also run in forked workers"""
+    global _listener
+    handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+def init_logging(app):
+    """Route all logging through a queue to JSON (or text) output and add request ids"""
+    config = app.config
+    level = logging.getLevelName(str(config.get('LOG_LEVEL', 'INFO')).upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(TextFormatter() if config.get('LOG_FORMAT') == 'text' else JsonFormatter())
+
+    # Filters run on the thread that logs, before the record is queued
+    handler = _QueueHandler(queue.SimpleQueue())
+    handler.addFilter(DebugSamplingFilter(config.get('LOG_DEBUG_SAMPLE_RATE', 1.0)))
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _start_listener(handler, output)
+    atexit.register(_stop_listener)
+    # The listener thread does not survive fork (gunicorn preload); give each worker its own
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: _start_listener(handler, output))
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get('X-Request-ID', '')
+        g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def return_request_id(response):
+        if g.get('request_id'):
+            response.headers['X-Request-ID'] = g.request_id
+        return response
@@ -0,0 +1,153 @@
+"""Prometheus metrics exposed at /metrics.
+
+- http_request_duration_seconds: latency histogram per blueprint, route, method and status
+- db_request_queries / db_request_duration_seconds: queries and DB time per request
+  (from query_stats)
+- document_upload_bytes_total / document_download_bytes_total: stored document traffic
+- audit_log_writes_total: audit records written, by action
+- rate_limited_requests_total: requests rejected by rate_limit, by endpoint and key
+- active_sessions: users whose latest login within ACTIVE_SESSION_WINDOW_HOURS
+  has not been followed by a logout (read from the audit log at scrape time)
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(set up by gunicorn.conf.py) and a scrape aggregates them, so /metrics shows
+the whole server whichever worker answers. Recording a sample is an in-memory
+or mmap write; nothing is sent per request. Without prometheus_client
+installed the hooks are not registered and /metrics returns 503.
+"""
+from flask import g, request, current_app, jsonify
+from sqlalchemy import event
+from datetime import datetime, timedelta
+import os
+import time
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client.core import GaugeMetricFamily
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+# Seconds; spans fast cached GETs up to large uploads
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'http_request_duration_seconds', 'Time to produce a response',
+        ['blueprint', 'route', 'method', 'status'], buckets=LATENCY_BUCKETS
+    )
+    REQUEST_QUERIES = Histogram(
+        'db_request_queries', 'SQL statements executed per request',
+        ['blueprint'], buckets=QUERY_BUCKETS
+    )
+    REQUEST_DB_TIME = Histogram(
+        'db_request_duration_seconds', 'Time spent in the database per request',
+        ['blueprint'], buckets=LATENCY_BUCKETS
+    )
+    UPLOAD_BYTES = Counter('document_upload_bytes', 'Bytes of documents uploaded', ['doc_type'])
+    DOWNLOAD_BYTES = Counter('document_download_bytes', 'Bytes of documents viewed or downloaded', ['doc_type', 'offloaded'])
+    AUDIT_WRITES = Counter('audit_log_writes', 'Audit log records written', ['action'])
+    RATE_LIMITED = Counter('rate_limited_requests', 'Requests rejected by a rate limit', ['endpoint', 'key'])
+
+def record_upload(doc_type, size):
+    """Count the bytes of a stored upload (doc_type: permanent or periodic)"""
+    if prometheus_client is not None and size:
+        UPLOAD_BYTES.labels(doc_type).inc(size)
+
+def record_download(doc_type, size, offloaded=False):
+    """Count the bytes of a document sent to a client, by the worker or the web server"""
+    if prometheus_client is not None and size:
+        DOWNLOAD_BYTES.labels(doc_type, 'true' if offloaded else 'false').inc(size)
+
+def record_audit_writes(action, count):
+    """Count audit records written with bulk inserts, which skip the AuditLog after_insert hook"""
+    if prometheus_client is not None and count:
+        AUDIT_WRITES.labels(action).inc(count)
+
+def record_rate_limited(endpoint, key_type):
+    """Count a request rejected by a rate limit rule keyed by ip, email or user"""
+    if prometheus_client is not None:
+        RATE_LIMITED.labels(endpoint, key_type).inc()
+
+class ActiveSessionCollector:
+    """Counts active sessions from the audit log when /metrics is scraped"""
+
+    def __init__(self, window_hours):
+        self.window_hours = window_hours
+
+    def collect(self):
+        from database import db, AuditLog
+        cutoff = datetime.utcnow() - timedelta(hours=self.window_hours)
+        logout = db.aliased(AuditLog)
+        active = db.session.query(db.func.count(db.distinct(AuditLog.user_id))).filter(
+            AuditLog.action == 'login',
+            AuditLog.created_at >= cutoff,
+            ~db.session.query(logout.id).filter(
+                logout.user_id == AuditLog.user_id,
+                logout.action == 'logout',
+                logout.created_at > AuditLog.created_at
+            ).exists()
+        ).scalar()
+        gauge = GaugeMetricFamily('active_sessions', 'Users logged in within the session window and not logged out')
+        gauge.add_metric([], active or 0)
+        yield gauge
+
+def _record_audit_write(mapper, connection, target):
+    AUDIT_WRITES.labels(target.action or '').inc()
+
+def init_metrics(app):
+    """Register the timing hooks and the /metrics endpoint"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    if prometheus_client is None:
+        @app.route('/metrics')
+        def metrics_unavailable():
+            return jsonify({'error': 'Metrics need the prometheus_client package'}), 503
+        return
+
+    from database import AuditLog
+    if not event.contains(AuditLog, 'after_insert', _record_audit_write):
+        event.listen(AuditLog, 'after_insert', _record_audit_write)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get('request_start')
+        if start is None or request.endpoint == 'metrics':
+            return response
+        blueprint = request.blueprint or 'app'
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(blueprint, route, request.method, str(response.status_code)).observe(
+            time.perf_counter() - start
+        )
+        stats = g.get('query_stats')
+        if stats is not None:
+            REQUEST_QUERIES.labels(blueprint).observe(stats.count)
+            REQUEST_DB_TIME.labels(blueprint).observe(stats.total_time)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return jsonify({'error': 'Authentication required'}), 401
+
+        registry = CollectorRegistry()
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry.register(_ProcessMetrics())
+        registry.register(ActiveSessionCollector(app.config.get('ACTIVE_SESSION_WINDOW_HOURS', 12)))
+        return current_app.response_class(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+class _ProcessMetrics:
+    """This process's metrics from the default registry, for single-process servers"""
+
+    def collect(self):
+        return prometheus_client.REGISTRY.collect()
@@ -0,0 +1,169 @@
+"""Password hashing with a configurable algorithm and cost.
+
+PASSWORD_HASH_ALGORITHM selects how new hashes are made:
+
+- bcrypt (default): PASSWORD_BCRYPT_ROUNDS
+- argon2id: PASSWORD_ARGON2_TIME_COST, PASSWORD_ARGON2_MEMORY_KIB and
+  PASSWORD_ARGON2_PARALLELISM; needs the argon2-cffi package
+- pbkdf2: PBKDF2-SHA256 with PASSWORD_PBKDF2_ITERATIONS (Werkzeug's format)
+
+Stored hashes of any of these, and older Werkzeug hashes, still verify. When
+a user logs in with a hash made by another algorithm or cost, login stores a
+fresh hash, so changing the settings upgrades accounts as people log in.
+
+Hashing is slow on purpose. It runs in a small thread pool per process
+(PASSWORD_HASH_WORKERS threads; the libraries release the GIL), so a burst
+of logins uses at most that many cores per process while other requests keep
+being served. When more than PASSWORD_HASH_QUEUE hashes are already waiting,
+PasswordHashBusy is raised and the caller should answer 503.
+"""
+from flask import current_app
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+import base64
+import hashlib
+import logging
+import os
+import threading
+
+try:
+    import bcrypt
+except ImportError:
+    bcrypt = None
+
+try:
+    import argon2
+except ImportError:
+    argon2 = None
+
+ALGORITHMS = ('bcrypt', 'argon2id', 'pbkdf2')
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+logger = logging.getLogger(__name__)
+
+_pool = {'pid': None, 'executor': None, 'pending': 0}
+_pool_lock = threading.Lock()
+
+class PasswordHashBusy(Exception):
+    """Too many password hashes are already queued in this process"""
+
+def _settings():
+    config = current_app.config
+    return {
+        'algorithm': config.get('PASSWORD_HASH_ALGORITHM', 'bcrypt'),
+        'bcrypt_rounds': config.get('PASSWORD_BCRYPT_ROUNDS', 10),
+        'argon2_time_cost': config.get('PASSWORD_ARGON2_TIME_COST', 2),
+        'argon2_memory_kib': config.get('PASSWORD_ARGON2_MEMORY_KIB', 19456),
+        'argon2_parallelism': config.get('PASSWORD_ARGON2_PARALLELISM', 1),
+        'pbkdf2_iterations': config.get('PASSWORD_PBKDF2_ITERATIONS', 600000),
+    }
+
+def _argon2_hasher(settings):
+    return argon2.PasswordHasher(
+        time_cost=settings['argon2_time_cost'],
+        memory_cost=settings['argon2_memory_kib'],
+        parallelism=settings['argon2_parallelism'],
+        type=argon2.Type.ID
+    )
+
+def _bcrypt_input(password):
+    """bcrypt only reads 72 bytes; longer passwords are pre-hashed so every byte counts"""
+    data = password.encode('utf-8')
+    if len(data) > 72:
+        data = base64.b64encode(hashlib.sha256(data).digest())
+    return data
+
+def _hash(settings, password):
+    algorithm = settings['algorithm']
+    if algorithm == 'bcrypt':
+        return bcrypt.hashpw(_bcrypt_input(password), bcrypt.gensalt(settings['bcrypt_rounds'])).decode('ascii')
+    if algorithm == 'argon2id':
+        return _argon2_hasher(settings).hash(password)
+    return generate_password_hash(password, method=f"pbkdf2:sha256:{settings['pbkdf2_iterations']}")
+
+def _verify(stored_hash, password):
+    if stored_hash.startswith(BCRYPT_PREFIXES):
+        if bcrypt is None:
+            logger.error('A bcrypt password hash cannot be checked without the bcrypt package')
+            return False
+        try:
+            return bcrypt.checkpw(_bcrypt_input(password), stored_hash.encode('ascii'))
+        except ValueError:
+            return False
+    if stored_hash.startswith('$argon2'):
+        if argon2 is None:
+            logger.error('An argon2 password hash cannot be checked without the argon2-cffi package')
+            return False
+        try:
+            return argon2.PasswordHasher().verify(stored_hash, password)
+        except argon2.exceptions.VerificationError:
+            return False
+        except argon2.exceptions.InvalidHashError:
+            return False
+    return check_password_hash(stored_hash, password)
+
+def _run(fn, *args):
+    """Run fn in this process's hashing pool and wait for the result"""
+    with _pool_lock:
+        # Threads do not survive fork, so each gunicorn worker starts its own pool
+        if _pool['pid'] != os.getpid():
+            _pool['executor'] = ThreadPoolExecutor(
+                max_workers=current_app.config.get('PASSWORD_HASH_WORKERS', 2),
+                thread_name_prefix='password-hash'
+            )
+            _pool['pid'] = os.getpid()
+            _pool['pending'] = 0
+        if _pool['pending'] >= current_app.config.get('PASSWORD_HASH_QUEUE', 32):
+            raise PasswordHashBusy('Too many logins at once, try again shortly')
+        _pool['pending'] += 1
+        executor = _pool['executor']
+    try:
+        return executor.submit(fn, *args).result()
+    finally:
+        with _pool_lock:
+            _pool['pending'] -= 1
+
+def hash_password(password):
+    """Hash a password with the configured algorithm and cost"""
+    return _run(_hash, _settings(), password)
+
+def verify_password(stored_hash, password):
+    """Check a password against a stored hash of any supported algorithm"""
+    if not stored_hash or password is None:
+        return False
+    return _run(_verify, stored_hash, password)
+
+def needs_rehash(stored_hash):
+    """Whether a stored hash was made with another algorithm or cost than configured now"""
+    settings = _settings()
+    algorithm = settings['algorithm']
+    if algorithm == 'bcrypt':
+        if not stored_hash.startswith(BCRYPT_PREFIXES):
+            return True
+        return int(stored_hash.split('$')[2]) != settings['bcrypt_rounds']
+    if algorithm == 'argon2id':
+        if not stored_hash.startswith('$argon2id$'):
+            return True
+        return _argon2_hasher(settings).check_needs_rehash(stored_hash)
+    return stored_hash.split('$', 1)[0] != f"pbkdf2:sha256:{settings['pbkdf2_iterations']}"
+
+def hash_scheme(stored_hash):
+    """Short description of a stored hash, e.g. bcrypt:10 or pbkdf2:sha256:600000"""
+    if stored_hash.startswith(BCRYPT_PREFIXES):
+        return f"bcrypt:{stored_hash.split('$')[2]}"
+    if stored_hash.startswith('$argon2'):
+        return stored_hash.split('$')[1]
+    return stored_hash.split('$', 1)[0]
+
+def init_passwords(app):
+    """Check the configured algorithm can be used, falling back to one that can"""
+    algorithm = app.config.get('PASSWORD_HASH_ALGORITHM', 'bcrypt')
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"PASSWORD_HASH_ALGORITHM must be one of: {', '.join(ALGORITHMS)}")
+    if algorithm == 'argon2id' and argon2 is None:
+        logger.warning('argon2-cffi is not installed - hashing new passwords with bcrypt instead of argon2id')
+        algorithm = 'bcrypt'
+    if algorithm == 'bcrypt' and bcrypt is None:
+        logger.warning('bcrypt is not installed - hashing new passwords with pbkdf2 instead')
+        algorithm = 'pbkdf2'
+    app.config['PASSWORD_HASH_ALGORITHM'] = algorithm
@@ -0,0 +1,296 @@
+"""On-demand sampling profiler for API requests.
+
+A super admin switches profiling on through /api/profiling/settings, for one
+route (endpoint name such as documents.get_vault, or a URL rule such as
+/api/documents/vault) and/or a fraction of requests. While a selected request
+runs, a sampler thread reads its stack every interval_ms:
+
+- wall mode weights each sample by elapsed time (shows waiting on the DB/disk)
+- cpu mode weights it by the thread's CPU time (shows where Python burns CPU)
+
+Each finished request is saved to PROFILE_DIR, keeping the newest
+PROFILE_KEEP, and can be downloaded as collapsed stacks (flamegraph.pl,
+speedscope, inferno) or speedscope JSON.
+
+Settings live in a file next to the profiles so every gunicorn worker picks
+them up without a restart; workers re-read it at most once a second. While
+profiling is off, a request costs one cached settings lookup.
+"""
+from flask import g, request, current_app
+from collections import Counter
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+PROFILE_MODES = ('wall', 'cpu')
+SETTINGS_FILE = 'settings.json'
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'route': None,         # endpoint name or URL rule; None profiles any route
+    'sample_rate': 1.0,    # fraction of matching requests to profile
+    'mode': 'wall',
+    'interval_ms': 5,
+    'expires_at': None     # profiling switches itself off after this time
+}
+
+logger = logging.getLogger(__name__)
+
+_settings_cache = {'checked': 0.0, 'mtime': None, 'settings': DEFAULT_SETTINGS}
+_active = {}  # thread id -> RequestProfile being sampled
+_active_lock = threading.Lock()
+_sampler = None
+
+class RequestProfile:
+    """Stack samples of one request, weighted in microseconds"""
+
+    def __init__(self, thread_id, mode, interval):
+        self.thread_id = thread_id
+        self.mode = mode
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.started_at = datetime.utcnow()
+        self.cpu_clock = time.pthread_getcpuclockid(thread_id) if mode == 'cpu' else None
+        self.cpu_started = self._now()
+        self.last = self.cpu_started
+
+    def _now(self):
+        if self.cpu_clock is not None:
+            return time.clock_gettime(self.cpu_clock)
+        return time.perf_counter()
+
+    def sample(self, frame):
+        now = self._now()
+        weight = int((now - self.last) * 1_000_000)
+        self.last = now
+        if weight <= 0:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(stack))] += weight
+        self.samples += 1
+
+def _short_path(filename):
+    """Path relative to the backend or site-packages, so frames stay readable"""
+    for marker in ('site-packages' + os.sep, 'backend' + os.sep):
+        index = filename.rfind(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+    return os.path.basename(filename)
+
+def _sample_loop():
+    global _sampler
+    while True:
+        with _active_lock:
+            profiles = list(_active.values())
+            if not profiles:
+                _sampler = None
+                return
+        frames = sys._current_frames()
+        for profile in profiles:
+            frame = frames.get(profile.thread_id)
+            if frame is not None:
+                profile.sample(frame)
+        del frames
+        time.sleep(min(p.interval for p in profiles))
+
+def _start_sampling(profile):
+    global _sampler
+    with _active_lock:
+        _active[profile.thread_id] = profile
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name='request-profiler', daemon=True)
+            _sampler.start()
+
+def _stop_sampling(profile):
+    with _active_lock:
+        _active.pop(profile.thread_id, None)
+
+def profile_dir():
+    return current_app.config['PROFILE_DIR']
+
+def load_settings(max_age=1.0):
+    """Current profiling settings, re-reading the shared settings file at most every max_age seconds"""
+    now = time.monotonic()
+    if now - _settings_cache['checked'] < max_age:
+        return _settings_cache['settings']
+    _settings_cache['checked'] = now
+
+    path = os.path.join(profile_dir(), SETTINGS_FILE)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        _settings_cache['mtime'] = None
+        _settings_cache['settings'] = DEFAULT_SETTINGS
+        return DEFAULT_SETTINGS
+    if mtime != _settings_cache['mtime']:
+        try:
+            with open(path) as f:
+                settings = {**DEFAULT_SETTINGS, **json.load(f)}
+        except (OSError, ValueError):
+            settings = DEFAULT_SETTINGS
+        _settings_cache['mtime'] = mtime
+        _settings_cache['settings'] = settings
+    return _settings_cache['settings']
+
+def save_settings(changes):
+    """Validate and store new settings for all workers; raises ValueError on bad input.
+
+    changes may include duration_s (default 600): how long profiling stays on.
+    """
+    changes = dict(changes)
+    duration = int(changes.pop('duration_s', None) or 600)
+    settings = {**load_settings(max_age=0), **{k: v for k, v in changes.items() if k in DEFAULT_SETTINGS}}
+    if settings['mode'] not in PROFILE_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(PROFILE_MODES)}")
+    if settings['mode'] == 'cpu' and not hasattr(time, 'pthread_getcpuclockid'):
+        raise ValueError('cpu mode is not available on this platform')
+    rate = float(settings['sample_rate'])
+    if not 0 < rate <= 1:
+        raise ValueError('sample_rate must be between 0 and 1')
+    interval = int(settings['interval_ms'])
+    if not 1 <= interval <= 1000:
+        raise ValueError('interval_ms must be between 1 and 1000')
+
+    settings.update(
+        enabled=bool(settings['enabled']),
+        route=settings['route'] or None,
+        sample_rate=rate,
+        interval_ms=interval,
+        expires_at=(datetime.utcnow() + timedelta(seconds=duration)).isoformat() if settings['enabled'] else None
+    )
+
+    os.makedirs(profile_dir(), exist_ok=True)
+    path = os.path.join(profile_dir(), SETTINGS_FILE)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(settings, f)
+    os.replace(tmp_path, path)
+    return load_settings(max_age=0)
+
+def _should_profile(settings):
+    if not settings['enabled']:
+        return False
+    if settings['expires_at'] and settings['expires_at'] < datetime.utcnow().isoformat():
+        return False
+    route = settings['route']
+    if route and route not in (request.endpoint, request.url_rule.rule if request.url_rule else None):
+        return False
+    return random.random() < settings['sample_rate']
+
+def _save_profile(profile):
+    profile_id = f"{profile.started_at.strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+    wall_ms = (time.perf_counter() - profile.started) * 1000
+    record = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'request_id': g.get('request_id'),
+        'mode': profile.mode,
+        'interval_ms': int(profile.interval * 1000),
+        'started_at': profile.started_at.isoformat(),
+        'wall_ms': round(wall_ms, 2),
+        'samples': profile.samples,
+        'stacks': dict(profile.stacks)
+    }
+    if profile.mode == 'cpu':
+        record['cpu_ms'] = round((profile.last - profile.cpu_started) * 1000, 2)
+
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as f:
+        json.dump(record, f)
+
+    # Keep only the newest PROFILE_KEEP profiles
+    keep = current_app.config.get('PROFILE_KEEP', 50)
+    for old in list_profile_ids()[keep:]:
+        try:
+            os.remove(os.path.join(directory, f'{old}.json'))
+        except OSError:
+            pass
+
+def list_profile_ids():
+    """Stored profile ids, newest first"""
+    try:
+        names = os.listdir(profile_dir())
+    except OSError:
+        return []
+    return sorted((n[:-5] for n in names if n.endswith('.json') and n != SETTINGS_FILE), reverse=True)
+
+def load_profile(profile_id):
+    """A stored profile, or None if it doesn't exist (ids are checked against the stored list)"""
+    if profile_id not in list_profile_ids():
+        return None
+    with open(os.path.join(profile_dir(), f'{profile_id}.json')) as f:
+        return json.load(f)
+
+def to_collapsed(profile):
+    """Collapsed stack lines ("frame;frame;frame weight") for flamegraph.pl, inferno or speedscope"""
+    return ''.join(f'{stack} {weight}\n' for stack, weight in sorted(profile['stacks'].items()))
+
+def to_speedscope(profile):
+    """Speedscope sampled-profile JSON"""
+    frames = []
+    frame_index = {}
+    samples = []
+    weights = []
+    for stack, weight in profile['stacks'].items():
+        sample = []
+        for name in stack.split(';'):
+            if name not in frame_index:
+                frame_index[name] = len(frames)
+                function, _, location = name.partition(' (')
+                file, _, line = location.rstrip(')').rpartition(':')
+                frames.append({'name': function, 'file': file, 'line': int(line) if line.isdigit() else None})
+            sample.append(frame_index[name])
+        samples.append(sample)
+        weights.append(weight)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': f"{profile['method']} {profile['path']} ({profile['mode']})",
+        'exporter': 'gm-finance profiling',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': f"{profile['endpoint']} {profile['started_at']}",
+            'unit': 'microseconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights
+        }]
+    }
+
+def init_profiling(app):
+    """Register the hooks that start and stop sampling for selected requests"""
+
+    @app.before_request
+    def start_profile():
+        settings = load_settings()
+        if not settings['enabled'] or not _should_profile(settings):
+            return
+        profile = RequestProfile(threading.get_ident(), settings['mode'], settings['interval_ms'] / 1000)
+        g.request_profile = profile
+        _start_sampling(profile)
+
+    @app.teardown_request
+    def finish_profile(exc):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return
+        _stop_sampling(profile)
+        try:
+            _save_profile(profile)
+        except OSError as e:
+            logger.warning('Could not save request profile: %s', e)
@@ -0,0 +1,159 @@
+"""Per-request SQL query statistics and N+1 detection.
+
+Every statement executed while handling a request is counted and timed
+through SQLAlchemy's cursor events. Statements are grouped by shape (the SQL
+text with IN-lists collapsed), so a lazy relationship or a query inside a
+loop shows up as the same shape repeated many times.
+
+- QUERY_STATS_HEADERS (dev): X-Query-Count, X-Query-Time-Ms and
+  X-Query-Repeats headers on every response
+- otherwise one JSON log line per request that runs a repeated shape or goes
+  over its query budget
+- query_budget(): context manager for tests and scripts that fails when a
+  request made inside it exceeds the query budget of its endpoint (the
+  query_budget pytest fixture in conftest.py)
+
+Budgets are per endpoint in QUERY_BUDGETS, with QUERY_BUDGET_DEFAULT for the rest.
+"""
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from contextlib import contextmanager
+from collections import Counter
+import logging
+import re
+import threading
+import time
+
+# Expected queries per request for endpoints that are checked against a budget
+QUERY_BUDGETS = {
+    'auth.get_current_user': 2,
+    'entities.get_my_entities': 4,
+    'entities.get_entity': 4,
+    'users.get_entity_accountants': 4,
+    'documents.get_vault': 4,
+    'documents.get_all_permanent_documents': 3,
+    'notifications.get_notifications': 3,
+    'audit.get_audit_logs': 3,
+    'users.get_users': 2,
+    'entities.get_pending_entities': 3,
+    'sync.get_delta': 12,
+}
+QUERY_BUDGET_DEFAULT = 10
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+# Recorders opened by query_budget(), shared with requests served by the test client
+_recorders = []
+_recorders_lock = threading.Lock()
+
+class QueryStats:
+    """Queries executed during one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total_time += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """(shape, times) for shapes executed at least threshold times, most frequent first"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+def statement_shape(statement):
+    """Normalize a statement so the same query with different IN-list lengths groups together"""
+    return _IN_LIST.sub('(?...)', _WHITESPACE.sub(' ', statement).strip())
+
+def endpoint_budget(endpoint):
+    return QUERY_BUDGETS.get(endpoint, QUERY_BUDGET_DEFAULT)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    stats = g.get('query_stats')
+    if stats is None:
+        stats = g.query_stats = QueryStats()
+    stats.record(statement, duration)
+
+def _report(stats, endpoint, threshold):
+    repeated = stats.repeated(threshold)
+    budget = endpoint_budget(endpoint)
+    if not repeated and stats.count <= budget:
+        return
+    logger.warning('Request ran repeated statements or went over its query budget', extra={
+        'event': 'query_stats',
+        'endpoint': endpoint,
+        'queries': stats.count,
+        'budget': budget,
+        'db_ms': round(stats.total_time * 1000, 2),
+        'repeated': [{'statement': shape[:300], 'times': n} for shape, n in repeated[:5]],
+    })
+
+def init_query_stats(app):
+    """Register the cursor listeners and the after_request hook reporting per-request stats"""
+    if not app.config.get('QUERY_STATS', True):
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats') or QueryStats()
+        endpoint = request.endpoint or ''
+        threshold = app.config.get('QUERY_REPEAT_THRESHOLD', 5)
+
+        if app.config.get('QUERY_STATS_HEADERS'):
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time-Ms'] = f'{stats.total_time * 1000:.2f}'
+            response.headers['X-Query-Repeats'] = str(max(stats.shapes.values(), default=0))
+        else:
+            _report(stats, endpoint, threshold)
+
+        with _recorders_lock:
+            for recorder in _recorders:
+                recorder.append((request.method, request.path, endpoint, stats))
+        return response
+
+@contextmanager
+def query_budget(limit=None):
+    """Fail if a request made inside the block runs more queries than its budget.
+
+    Uses the endpoint's QUERY_BUDGETS entry, or limit when given:
+
+        with query_budget():
+            client.get('/api/documents/vault', headers=headers)
+    """
+    recorded = []
+    with _recorders_lock:
+        _recorders.append(recorded)
+    try:
+        yield recorded
+    finally:
+        with _recorders_lock:
+            _recorders.remove(recorded)
+
+    over = []
+    for method, path, endpoint, stats in recorded:
+        budget = limit if limit is not None else endpoint_budget(endpoint)
+        if stats.count > budget:
+            worst = stats.shapes.most_common(1)
+            hint = f' (most repeated, {worst[0][1]}x: {worst[0][0][:200]})' if worst else ''
+            over.append(f'{method} {path}: {stats.count} queries, budget {budget}{hint}')
+    if over:
+        raise AssertionError('Query budget exceeded:\n' + '\n'.join(over))
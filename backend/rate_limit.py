@@ -0,0 +1,231 @@
+"""Request rate limiting with sliding-window counters.
+
+Limits are rules of the form "<key>:<count>/<period>", e.g. "ip:20/minute"
+or "email:10/15minutes", listed per endpoint (auth.login) or per blueprint
+(auth) in RATE_LIMITS; an endpoint's own entry replaces its blueprint's.
+Keys:
+
+- ip: the client address (behind a proxy, set PROXY_FIX_X_FOR so this is the
+  client; staff behind one office NAT still share one address)
+- email: the "email" field of a JSON body, lower-cased - a brute-force
+  attempt on one account is throttled however many addresses it comes from
+- user: the JWT identity of an authenticated request, falling back to ip
+
+Each rule keeps two fixed windows per key and estimates the sliding-window
+count as the current window plus the overlapping share of the previous one,
+so memory is two integers per key and a burst cannot straddle a window edge.
+The check runs in before_request, ahead of the view's DB lookups and password
+hashing. Over-limit requests get 429 with Retry-After and are not counted by
+the rule that rejected them.
+
+Counters live in process memory by default. RATE_LIMIT_STORAGE_URL=redis://...
+(any Redis-protocol server, needs the redis package) shares them between
+gunicorn workers and servers; with in-memory counters each worker counts on
+its own, so the effective limit is per worker.
+"""
+from flask import request, jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from metrics import record_rate_limited
+import logging
+import math
+import re
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Default rules; RATE_LIMITS in the app config adds to or replaces these per endpoint/blueprint
+RATE_LIMITS = {
+    'auth.login': ['ip:20/minute', 'email:10/15minutes'],
+    'auth.signup': ['ip:10/hour'],
+}
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_RULE = re.compile(r'^\s*(ip|email|user)\s*:\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+
+logger = logging.getLogger(__name__)
+
+class Rule:
+    """One parsed limit: at most `limit` requests per `period` seconds per key"""
+
+    def __init__(self, text):
+        match = _RULE.match(text)
+        if not match:
+            raise ValueError(f'Invalid rate limit {text!r}; expected e.g. "ip:20/minute" or "email:10/15minutes"')
+        self.text = text.strip()
+        self.key_type = match.group(1)
+        self.limit = int(match.group(2))
+        self.period = int(match.group(3) or 1) * PERIODS[match.group(4)]
+
+def parse_rules(config):
+    """{endpoint or blueprint: [Rule]} from a {name: ["ip:20/minute", ...]} mapping"""
+    return {name: [Rule(text) for text in rules] for name, rules in config.items()}
+
+def _estimate(previous, current, now, period):
+    """Sliding-window count: the previous window weighted by how much of it is still inside the window"""
+    elapsed = (now % period) / period
+    return previous * (1 - elapsed) + current
+
+class MemoryStore:
+    """Per-process counters: {(rule, key): [window index, current count, previous count, period]}"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self.windows = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+
+    def hit(self, rule, key, now):
+        """Count a request if it is within the limit; returns (allowed, seconds until a retry can pass)"""
+        index = int(now // rule.period)
+        bucket = (rule.text, key)
+        with self.lock:
+            window = self.windows.get(bucket)
+            if window is None or window[0] < index - 1:
+                window = [index, 0, 0, rule.period]
+            elif window[0] == index - 1:
+                window = [index, 0, window[1], rule.period]
+            self.windows[bucket] = window
+            if _estimate(window[2], window[1] + 1, now, rule.period) > rule.limit:
+                return False, _retry_after(window[2], window[1], now, rule)
+            window[1] += 1
+
+            self.hits += 1
+            if self.hits % self.PRUNE_EVERY == 0:
+                self._prune(now)
+        return True, 0
+
+    def _prune(self, now):
+        for bucket, window in list(self.windows.items()):
+            if window[0] < int(now // window[3]) - 1:
+                del self.windows[bucket]
+
+class RedisStore:
+    """Counters in a Redis-protocol server, shared by every worker; one round trip per rule"""
+
+    # KEYS: current, previous window counters; ARGV: limit, previous window weight, expiry seconds
+    SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[2]) + current + 1 > tonumber(ARGV[1]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return {1, current, previous}
+"""
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def hit(self, rule, key, now):
+        index = int(now // rule.period)
+        prefix = f'ratelimit:{rule.text}:{key}'
+        weight = 1 - (now % rule.period) / rule.period
+        allowed, current, previous = self.script(
+            keys=[f'{prefix}:{index}', f'{prefix}:{index - 1}'],
+            args=[rule.limit, repr(weight), rule.period * 2]
+        )
+        if allowed:
+            return True, 0
+        return False, _retry_after(previous, current, now, rule)
+
+def _retry_after(previous, current, now, rule):
+    """Seconds until the sliding-window count drops enough for one more request"""
+    index = int(now // rule.period)
+    step = max(1.0, rule.period / 60)
+    wait = step
+    while wait < rule.period * 2:
+        later = now + wait
+        later_index = int(later // rule.period)
+        if later_index == index:
+            counts = (previous, current)
+        elif later_index == index + 1:
+            counts = (current, 0)
+        else:
+            counts = (0, 0)
+        if _estimate(counts[0], counts[1] + 1, later, rule.period) <= rule.limit:
+            break
+        wait += step
+    return math.ceil(wait)
+
+def create_store(url):
+    """Counter store for RATE_LIMIT_STORAGE_URL: memory:// or redis://host:port/db"""
+    if not url or url.startswith('memory://'):
+        return MemoryStore()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        if redis is None:
+            logger.warning('The redis package is not installed - rate limit counters are kept in memory')
+            return MemoryStore()
+        return RedisStore(url)
+    raise ValueError(f'Unsupported RATE_LIMIT_STORAGE_URL: {url}')
+
+def _key_value(rule):
+    if rule.key_type == 'email':
+        data = request.get_json(silent=True)
+        email = data.get('email') if isinstance(data, dict) else None
+        return email.strip().lower() if isinstance(email, str) and email.strip() else None
+    if rule.key_type == 'user':
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+        except Exception:
+            identity = None
+        if identity is not None:
+            return f'user:{identity}'
+    return request.remote_addr or 'unknown'
+
+def check_limits(rules, store, now=None):
+    """Apply rules to the current request; returns None or the number of seconds to wait"""
+    now = time.time() if now is None else now
+    for rule in rules:
+        value = _key_value(rule)
+        if value is None:
+            continue
+        allowed, retry_after = store.hit(rule, value, now)
+        if not allowed:
+            logger.warning('Rate limit exceeded', extra={
+                'event': 'rate_limited',
+                'endpoint': request.endpoint,
+                'rule': rule.text,
+                'key_type': rule.key_type,
+            })
+            record_rate_limited(request.endpoint or '', rule.key_type)
+            return retry_after
+    return None
+
+def init_rate_limit(app):
+    """Register the before_request check for the configured endpoints and blueprints"""
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return
+    rules = parse_rules({**RATE_LIMITS, **app.config.get('RATE_LIMITS', {})})
+    store = create_store(app.config.get('RATE_LIMIT_STORAGE_URL', 'memory://'))
+    app.extensions['rate_limit'] = store
+
+    @app.before_request
+    def enforce_rate_limits():
+        if request.method == 'OPTIONS' or not current_app.config.get('RATE_LIMIT_ENABLED', True):
+            return None
+        endpoint_rules = rules.get(request.endpoint)
+        if endpoint_rules is None:
+            endpoint_rules = rules.get(request.blueprint)
+        if not endpoint_rules:
+            return None
+        try:
+            retry_after = check_limits(endpoint_rules, store)
+        except Exception as e:
+            # A limiter outage (e.g. Redis down) must not take the API down with it
+            logger.warning('Rate limit check failed, letting the request through: %s', e)
+            return None
+        if retry_after is None:
+            return None
+        return jsonify({'error': f'Too many requests, try again in {retry_after} seconds'}), 429, {
+            'Retry-After': str(retry_after)
+        }
@@ -0,0 +1,216 @@
+"""Token revocation checked without a database query per request.
+
+Access tokens live JWT_ACCESS_TOKEN_EXPIRES (15 minutes by default) and are
+renewed at POST /api/auth/refresh with a refresh token. Every refresh token
+can be used once: refreshing revokes it and returns a new pair. All tokens of
+one login share an "sid" (session id) claim, and revocations are rows in the
+revoked_tokens table keyed by what they revoke:
+
+- jti:<jti>   one token (a used refresh token, the access token at logout)
+- sid:<sid>   every token of a login session (logout, a refresh token reused)
+- user:<id>   every token issued to a user up to revoked_at (deactivation)
+
+Each worker mirrors the keys in an in-memory bloom filter. A token whose
+keys are not in the filter - nearly every request - is accepted after a few
+hash lookups; only a filter hit (a revoked token, or a rare false positive)
+is confirmed against the table. A revocation is in the revoking worker's
+filter at once; other workers read new rows at most every
+REVOCATION_SYNC_SECONDS, so deactivating a user locks out their tokens
+everywhere within that time without looking the user up on each request.
+
+Rows are deleted once the tokens they cover have expired, and the filter is
+rebuilt from what is left every REVOCATION_PRUNE_SECONDS.
+"""
+from flask import current_app, jsonify
+from database import db, RevokedToken
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Set membership with no false negatives, sized for `capacity` keys at `error_rate` false positives"""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class RevocationStore:
+    """This worker's bloom filter of revoked keys and how far it has read the table"""
+
+    # Rows committed out of id order by concurrent writers are still picked up
+    SYNC_LOOKBACK = timedelta(seconds=60)
+
+    def __init__(self, capacity, error_rate, sync_seconds, prune_seconds):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.prune_seconds = prune_seconds
+        self.lock = threading.Lock()
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.last_id = 0
+        self.synced_at = None
+        self.pruned_at = None
+
+    def add(self, key):
+        self.bloom.add(key)
+
+    def sync(self, now=None):
+        """Read revocations written since the last sync (by any worker); prune and rebuild when due"""
+        now = time.monotonic() if now is None else now
+        if self.synced_at is not None and now - self.synced_at < self.sync_seconds:
+            return
+        with self.lock:
+            if self.synced_at is not None and now - self.synced_at < self.sync_seconds:
+                return
+            if self.pruned_at is None or now - self.pruned_at >= self.prune_seconds:
+                self._rebuild()
+                self.pruned_at = now
+            else:
+                since = datetime.utcnow() - self.SYNC_LOOKBACK
+                rows = db.session.query(RevokedToken.id, RevokedToken.key).filter(
+                    or_(RevokedToken.id > self.last_id, RevokedToken.revoked_at >= since)
+                ).all()
+                for row_id, key in rows:
+                    self.bloom.add(key)
+                    self.last_id = max(self.last_id, row_id)
+            self.synced_at = now
+
+    def _rebuild(self):
+        deleted = RevokedToken.query.filter(RevokedToken.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+        db.session.commit()
+        rows = db.session.query(RevokedToken.id, RevokedToken.key).all()
+        # Grow the filter rather than let the false positive rate climb past error_rate
+        bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+        for _, key in rows:
+            bloom.add(key)
+        self.bloom = bloom
+        self.last_id = max((row_id for row_id, _ in rows), default=self.last_id)
+        if deleted:
+            logger.info('Pruned %s expired token revocations', deleted)
+
+def _store():
+    return current_app.extensions['revocation']
+
+def _expires_at(exp=None):
+    """When a revocation stops mattering: the token's own expiry, or the longest lifetime of a token issued now"""
+    if exp is not None:
+        return datetime.utcfromtimestamp(exp)
+    lifetime = current_app.config.get('JWT_REFRESH_TOKEN_EXPIRES')
+    if not lifetime:
+        return None
+    return datetime.utcnow() + lifetime
+
+def _revoke(key, user_id, expires_at):
+    """Insert a revocation row and add it to this worker's filter; False if it already existed"""
+    try:
+        db.session.add(RevokedToken(key=key, user_id=user_id, expires_at=expires_at))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    _store().add(key)
+    return True
+
+def revoke_token(payload):
+    """Revoke one token by its decoded payload; False if it was already revoked"""
+    return _revoke(f"jti:{payload['jti']}", _user_id(payload), _expires_at(exp=payload.get('exp')))
+
+def revoke_session(sid, user_id=None):
+    """Revoke every token issued for one login"""
+    if sid:
+        _revoke(f'sid:{sid}', user_id, _expires_at())
+
+def revoke_user_tokens(user_id):
+    """Revoke every token issued to a user so far; tokens issued later are unaffected"""
+    key = f'user:{user_id}'
+    row = RevokedToken.query.filter_by(key=key).first()
+    if row:
+        # Deactivated again after a reactivation: move the cut-off forward
+        row.revoked_at = datetime.utcnow()
+        row.expires_at = _expires_at()
+        db.session.commit()
+        _store().add(key)
+    else:
+        _revoke(key, int(user_id), _expires_at())
+
+def _user_id(payload):
+    try:
+        return int(payload.get('sub'))
+    except (TypeError, ValueError):
+        return None
+
+def _issued_before(payload, revoked_at):
+    return payload.get('iat', 0) <= revoked_at.replace(tzinfo=timezone.utc).timestamp()
+
+def is_revoked(payload):
+    """Whether a decoded token has been revoked; only a bloom filter hit reaches the database"""
+    store = _store()
+    store.sync()
+    sid = payload.get('sid')
+    jti_key, user_key, sid_key = f"jti:{payload['jti']}", f"user:{payload.get('sub')}", f'sid:{sid}'
+    keys = [jti_key, user_key, sid_key] if sid else [jti_key, user_key]
+    candidates = [key for key in keys if key in store.bloom]
+    if not candidates:
+        return False
+
+    rows = db.session.query(RevokedToken.key, RevokedToken.revoked_at).filter(RevokedToken.key.in_(candidates)).all()
+    revoked = {key: revoked_at for key, revoked_at in rows}
+    if user_key in revoked and _issued_before(payload, revoked[user_key]):
+        return True
+    if sid and sid_key in revoked:
+        return True
+    if jti_key in revoked:
+        if payload.get('type') == 'refresh' and sid:
+            # A refresh token used twice was copied; end the whole session it belongs to
+            logger.warning('Refresh token reused, revoking its session', extra={
+                'event': 'refresh_token_reused',
+                'user_id': payload.get('sub'),
+            })
+            revoke_session(sid, _user_id(payload))
+        return True
+    return False
+
+def init_revocation(app, jwt):
+    """Register the revocation check with flask_jwt_extended"""
+    app.extensions['revocation'] = RevocationStore(
+        capacity=app.config.get('REVOCATION_BLOOM_CAPACITY', 100000),
+        error_rate=app.config.get('REVOCATION_BLOOM_ERROR_RATE', 0.001),
+        sync_seconds=app.config.get('REVOCATION_SYNC_SECONDS', 1),
+        prune_seconds=app.config.get('REVOCATION_PRUNE_SECONDS', 3600)
+    )
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        # Tokens from before expiry was switched on never expire; make their holders log in again
+        if 'exp' not in jwt_payload and current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES'):
+            return True
+        return is_revoked(jwt_payload)
+
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token has been revoked. Please login again.'}), 401
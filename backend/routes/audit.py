@@ -1,21 +1,22 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db, User, AuditLog
+from authz import require_role
+from serializers import AUDIT_LOG, MY_AUDIT_LOG
+from streaming import stream_format, batched_rows, stream_response
 from datetime import datetime, timedelta
 
 audit_bp = Blueprint('audit', __name__)
 
 @audit_bp.route('/logs', methods=['GET'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admin can view audit logs')
 def get_audit_logs():
-    """Get audit logs (Super Admin only)"""
+    """Get audit logs (Super Admin only, ?stream= exports the full date range)"""
     try:
-        user_id_str = get_jwt_identity()
-        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
-        user = User.query.get(user_id)
-        
-        if user.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admin can view audit logs'}), 403
+        try:
+            stream = stream_format()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Get query parameters
         action = request.args.get('action')
@@ -23,41 +24,31 @@ def get_audit_logs():
         user_filter = request.args.get('user_id')
         days = int(request.args.get('days', 30))
         
-        # Build query
-        query = AuditLog.query
+        # Build query; plain rows with the user's email joined in instead of one lookup per log
+        query = db.session.query(*AuditLog.__table__.columns, User.email.label('user_email')).outerjoin(
+            User, AuditLog.user_id == User.id
+        )
         
         if action:
-            query = query.filter_by(action=action)
+            query = query.filter(AuditLog.action == action)
         if resource_type:
-            query = query.filter_by(resource_type=resource_type)
+            query = query.filter(AuditLog.resource_type == resource_type)
         if user_filter:
-            query = query.filter_by(user_id=int(user_filter))
+            query = query.filter(AuditLog.user_id == int(user_filter))
         
         # Filter by date
         date_from = datetime.utcnow() - timedelta(days=days)
         query = query.filter(AuditLog.created_at >= date_from)
         
-        logs = query.order_by(AuditLog.created_at.desc()).limit(1000).all()
+        query = query.order_by(AuditLog.created_at.desc())
+        
+        # Streamed exports are not capped; rows are read and sent in batches
+        if stream:
+            return stream_response('logs', batched_rows(query), stream, AUDIT_LOG.dump)
         
-        result = []
-        for log in logs:
-            log_user = User.query.get(log.user_id)
-            result.append({
-                'id': log.id,
-                'user': {
-                    'id': log.user_id,
-                    'email': log_user.email if log_user else 'Unknown'
-                },
-                'action': log.action,
-                'resource_type': log.resource_type,
-                'resource_id': log.resource_id,
-                'ip_address': log.ip_address,
-                'user_agent': log.user_agent,
-                'details': log.details,
-                'created_at': log.created_at.isoformat()
-            })
+        logs = query.limit(1000).all()
         
-        return jsonify({'logs': result}), 200
+        return jsonify({'logs': AUDIT_LOG.dump_many(logs)}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -77,19 +68,7 @@ def get_my_audit_logs():
             AuditLog.created_at >= date_from
         ).order_by(AuditLog.created_at.desc()).limit(100).all()
         
-        result = []
-        for log in logs:
-            result.append({
-                'id': log.id,
-                'action': log.action,
-                'resource_type': log.resource_type,
-                'resource_id': log.resource_id,
-                'ip_address': log.ip_address,
-                'details': log.details,
-                'created_at': log.created_at.isoformat()
-            })
-        
-        return jsonify({'logs': result}), 200
+        return jsonify({'logs': MY_AUDIT_LOG.dump_many(logs)}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,9 +1,14 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
+from passwords import hash_password, verify_password, needs_rehash, PasswordHashBusy
+from revocation import revoke_token, revoke_session
+from authz import token_claims
 from database import db, User, AuditLog
+from serializers import USER, USER_PROFILE
+from http_cache import cached, weak_etag
 from datetime import datetime
 import re
+import uuid
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -33,6 +38,14 @@ def log_audit(user_id, action, resource_type=None, resource_id=None, details=Non
     db.session.add(log)
     db.session.commit()
 
+def issue_tokens(user, sid=None):
+    """Access and refresh token for a login session, carrying the user's role; identity must be a string"""
+    claims = {'sid': sid or uuid.uuid4().hex, **token_claims(user)}
+    return (
+        create_access_token(identity=str(user.id), additional_claims=claims),
+        create_refresh_token(identity=str(user.id), additional_claims=claims)
+    )
+
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
     """Signup for Company Secretary only"""
@@ -72,7 +85,7 @@ def signup():
         # Create user (Company Secretary role)
         user = User(
             email=email,
-            password_hash=generate_password_hash(password),
+            password_hash=hash_password(password),
             role='company_secretary',
             pan=pan,
             gstin=gstin,
@@ -83,21 +96,19 @@ def signup():
         
         log_audit(user.id, 'signup', 'user', user.id, f'New company secretary registered: {email}')
         
-        # Generate token - identity must be a string
-        access_token = create_access_token(identity=str(user.id))
+        access_token, refresh_token = issue_tokens(user)
         
         return jsonify({
             'message': 'Signup successful. Please create your entity.',
             'token': access_token,
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'role': user.role,
-                'pan': user.pan,
-                'gstin': user.gstin
-            }
+            'refresh_token': refresh_token,
+            'user': USER.dump(user)
         }), 201
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+        
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -115,12 +126,20 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not verify_password(user.password_hash, password):
             return jsonify({'error': 'Invalid email or password'}), 401
         
         if not user.is_active:
             return jsonify({'error': 'Account is deactivated'}), 403
         
+        # Store a fresh hash if the hashing algorithm or cost has changed since it was made;
+        # with the hashing queue full the upgrade waits for a later login
+        if needs_rehash(user.password_hash):
+            try:
+                user.password_hash = hash_password(password)
+            except PasswordHashBusy:
+                pass
+        
         # Update last login
         user.last_login = datetime.utcnow()
         db.session.commit()
@@ -128,26 +147,57 @@ def login():
         # Log login
         log_audit(user.id, 'login', 'user', user.id, f'User logged in: {email}')
         
-        # Generate token - identity must be a string
-        access_token = create_access_token(identity=str(user.id))
+        access_token, refresh_token = issue_tokens(user)
         
         return jsonify({
             'message': 'Login successful',
             'token': access_token,
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'role': user.role,
-                'pan': user.pan,
-                'gstin': user.gstin
-            }
+            'refresh_token': refresh_token,
+            'user': USER.dump(user)
         }), 200
         
+    except PasswordHashBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """Exchange a refresh token for a new access and refresh token; each refresh token works once"""
+    try:
+        claims = get_jwt()
+        user = User.query.get(int(get_jwt_identity()))
+        
+        if not user or not user.is_active:
+            return jsonify({'error': 'Account is deactivated'}), 403
+        
+        # A concurrent refresh with the same token got here first
+        if not revoke_token(claims):
+            revoke_session(claims.get('sid'), user.id)
+            return jsonify({'error': 'Token has been revoked. Please login again.'}), 401
+        
+        access_token, refresh_token = issue_tokens(user, claims.get('sid'))
+        
+        return jsonify({
+            'token': access_token,
+            'refresh_token': refresh_token
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def profile_etag():
+    """Tag /me by the user's row version so a revalidation costs one indexed lookup"""
+    user_id = get_jwt_identity()
+    version = db.session.query(User.row_version).filter(User.id == int(user_id)).scalar()
+    return weak_etag('me', user_id, version) if version is not None else None
+
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
+@cached(max_age=30, etag=profile_etag)
 def get_current_user():
     """Get current user information"""
     try:
@@ -158,15 +208,7 @@ def get_current_user():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({
-            'id': user.id,
-            'email': user.email,
-            'role': user.role,
-            'pan': user.pan,
-            'gstin': user.gstin,
-            'is_active': user.is_active,
-            'last_login': user.last_login.isoformat() if user.last_login else None
-        }), 200
+        return jsonify(USER_PROFILE.dump(user)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -177,6 +219,9 @@ def logout():
     """Logout user"""
     try:
         user_id = get_jwt_identity()
+        claims = get_jwt()
+        # End the session so its refresh token cannot mint new access tokens
+        revoke_session(claims.get('sid'), int(user_id))
         log_audit(user_id, 'logout', 'user', user_id, 'User logged out')
         return jsonify({'message': 'Logout successful'}), 200
     except Exception as e:
@@ -1,12 +1,24 @@
 
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from database import db, Entity, PermanentDocument, PeriodicDocument, User, AuditLog
+from database import db, Entity, PermanentDocument, PeriodicDocument, DocumentSlot, User, AuditLog, reserve_document_version
+from document_storage import store_as_delta, send_document
+from authz import require_role
+from field_selection import requested_fields, select_columns, row_to_dict
+from serializers import (UPLOADED_DOCUMENT, UPLOADED_PERIODIC_DOCUMENT, DOCUMENT_VERSION,
+                         ENTITY_PERMANENT_DOCUMENT, ADMIN_PERMANENT_DOCUMENT)
+from streaming import stream_format, batched_rows, stream_response
+from metrics import record_upload
+from sqlalchemy.orm import joinedload
 from datetime import datetime
+from itertools import chain
 from werkzeug.utils import secure_filename
+import logging
 import os
+import uuid
 
 documents_bp = Blueprint('documents', __name__)
+logger = logging.getLogger(__name__)
 
 # Accept all file types
 def allowed_file(filename):
@@ -79,74 +91,194 @@ def upload_document():
         elif user.role != 'super_admin':
             return jsonify({'error': 'You do not have permission to upload documents'}), 403
         
-        # Save file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        
         # Use configured upload folder
-        from flask import current_app
         base_upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
         entity_upload_folder = os.path.join(base_upload_folder, f'entity_{entity_id}', 'periodic')
         os.makedirs(entity_upload_folder, exist_ok=True)
         
-        file_path = os.path.join(entity_upload_folder, filename)
-        file.save(file_path)
+        # Save and delta-encode under a temporary name before reserving the version:
+        # the reservation holds the (SQLite: database) write lock until the commit
+        filename = secure_filename(file.filename)
+        stored_path = os.path.join(entity_upload_folder, f'.upload_{uuid.uuid4().hex}_{filename}')
+        file.save(stored_path)
+        try:
+            file_size = os.path.getsize(stored_path)
+            
+            # The slot's latest version is the expected base; a concurrent upload may still take
+            # the next number, which only shifts snapshot placement since a delta names its base
+            slot_key = {
+                'entity_id': int(entity_id),
+                'financial_year': financial_year,
+                'period': period_type,
+                'period_value': period_value,
+                'document_type': document_type
+            }
+            current = DocumentSlot.query.filter_by(**slot_key).first()
+            previous_doc = PeriodicDocument.query.filter(
+                PeriodicDocument.slot_id == current.id
+            ).order_by(PeriodicDocument.version.desc()).first() if current else None
+            
+            doc = PeriodicDocument(
+                entity_id=int(entity_id),
+                document_type=document_type,
+                file_path=stored_path,
+                file_name=filename,
+                file_size=file_size,
+                period=period_type,  # Use 'period' field as per database model
+                period_value=period_value,
+                financial_year=financial_year,
+                uploaded_by=user_id,
+                version=(current.current_version if current else 0) + 1
+            )
+            
+            # Optionally keep only a delta against the slot's previous version
+            store_as_delta(doc, previous_doc)
+            stored_path = doc.file_path
+            
+            # Reserve the next version for the slot atomically, then commit straight away
+            slot, version = reserve_document_version(
+                int(entity_id), financial_year, period_type, period_value, document_type
+            )
+            
+            # The version keeps re-uploads within the same second apart
+            timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+            filename = f"{timestamp}_v{version}_{filename}"
+            file_path = os.path.join(entity_upload_folder, filename)
+            if doc.storage == 'delta':
+                file_path += '.delta'
+            os.replace(stored_path, file_path)
+            stored_path = file_path
+            
+            doc.file_path = file_path
+            doc.file_name = filename
+            doc.slot_id = slot.id
+            doc.version = version
+            db.session.add(doc)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if os.path.exists(stored_path):
+                os.remove(stored_path)
+            raise
+        
+        record_upload('periodic', file_size)
+        log_audit(user_id, 'upload_document', 'document', doc.id, f'Uploaded document: {filename}')
         
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        return jsonify({
+            'message': 'Document uploaded successfully',
+            'document': UPLOADED_PERIODIC_DOCUMENT.dump(doc)
+        }), 201
         
-        # Check for existing document with same entity, period, period_value, document_type, and financial_year
-        # If exists, increment version number
-        existing_doc = PeriodicDocument.query.filter_by(
-            entity_id=int(entity_id),
-            period=period_type,
-            period_value=period_value,
-            document_type=document_type,
-            financial_year=financial_year
-        ).order_by(PeriodicDocument.version.desc()).first()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@documents_bp.route('/versions', methods=['GET'])
+@jwt_required()
+def get_document_versions():
+    """Get the version history of one periodic document slot"""
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+        user = User.query.get(user_id)
         
-        version = 1
-        if existing_doc:
-            version = existing_doc.version + 1
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         
-        # Create document record
-        doc = PeriodicDocument(
-            entity_id=int(entity_id),
-            document_type=document_type,
-            file_path=file_path,
-            file_name=filename,
-            file_size=file_size,
-            period=period_type,  # Use 'period' field as per database model
-            period_value=period_value,
-            financial_year=financial_year,
-            uploaded_by=user_id,
-            version=version
-        )
+        entity_id = request.args.get('entity_id', type=int)
+        period_type = request.args.get('period') or request.args.get('period_type')
+        period_value = request.args.get('period_value')
+        document_type = request.args.get('document_type')
+        financial_year = request.args.get('financial_year', '')
         
-        db.session.add(doc)
-        db.session.commit()
+        if not all([entity_id, period_type, period_value, document_type]):
+            return jsonify({'error': 'Missing required fields'}), 400
         
-        log_audit(user_id, 'upload_document', 'document', doc.id, f'Uploaded document: {filename}')
+        entity = Entity.query.get(entity_id)
+        if not entity:
+            return jsonify({'error': 'Entity not found'}), 404
+        
+        # Check access
+        if user.role == 'company_secretary':
+            if entity.secretary_id != user_id:
+                return jsonify({'error': 'Access denied'}), 403
+        elif user.role == 'accountant':
+            assigned = any(a.entity_id == entity_id for a in user.assigned_entities)
+            if not assigned:
+                return jsonify({'error': 'Access denied'}), 403
+        elif user.role != 'super_admin':
+            return jsonify({'error': 'Access denied'}), 403
+        
+        # Single query over the slot key and the (slot_id, version) index
+        rows = db.session.query(
+            PeriodicDocument.id,
+            PeriodicDocument.version,
+            PeriodicDocument.file_name,
+            PeriodicDocument.file_size,
+            PeriodicDocument.uploaded_at,
+            User.email.label('uploaded_by_email')
+        ).join(
+            DocumentSlot, PeriodicDocument.slot_id == DocumentSlot.id
+        ).outerjoin(
+            User, PeriodicDocument.uploaded_by == User.id
+        ).filter(
+            DocumentSlot.entity_id == entity_id,
+            DocumentSlot.financial_year == financial_year,
+            DocumentSlot.period == period_type,
+            DocumentSlot.period_value == period_value,
+            DocumentSlot.document_type == document_type
+        ).order_by(PeriodicDocument.version.desc()).all()
         
         return jsonify({
-            'message': 'Document uploaded successfully',
-            'document': {
-                'id': doc.id,
-                'file_name': doc.file_name,
-                'document_type': doc.document_type,
-                'uploaded_at': doc.uploaded_at.isoformat() if doc.uploaded_at else None
-            }
-        }), 201
+            'versions': DOCUMENT_VERSION.dump_many(rows)
+        }), 200
         
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+VAULT_FIELDS = ['id', 'entity_id', 'entity_name', 'document_type', 'file_name', 'period_type', 'period_value',
+                'financial_year', 'version', 'uploaded_at', 'uploaded_by_email', 'doc_type']
+
+# Vault field -> column per document table; permanent documents fill the periodic-only fields with constants
+PERIODIC_VAULT_COLUMNS = {
+    'id': PeriodicDocument.id,
+    'entity_id': PeriodicDocument.entity_id,
+    'entity_name': Entity.company_name,
+    'document_type': PeriodicDocument.document_type,
+    'file_name': PeriodicDocument.file_name,
+    'period_type': PeriodicDocument.period,
+    'period_value': PeriodicDocument.period_value,
+    'financial_year': PeriodicDocument.financial_year,
+    'version': PeriodicDocument.version,
+    'uploaded_at': PeriodicDocument.uploaded_at,
+    'uploaded_by_email': User.email
+}
+PERMANENT_VAULT_COLUMNS = {
+    'id': PermanentDocument.id,
+    'entity_id': PermanentDocument.entity_id,
+    'entity_name': Entity.company_name,
+    'document_type': PermanentDocument.document_type,
+    'file_name': PermanentDocument.file_name,
+    'period_value': PermanentDocument.document_type,
+    'uploaded_at': PermanentDocument.uploaded_at,
+    'uploaded_by_email': User.email
+}
+PERIODIC_VAULT_CONSTANTS = {'doc_type': 'periodic'}
+PERMANENT_VAULT_CONSTANTS = {'period_type': 'permanent', 'financial_year': '', 'version': 1, 'doc_type': 'permanent'}
+
+def vault_query(model, column_map, fields):
+    """Select only the requested vault columns, joining entity/uploader only when needed"""
+    query = db.session.query(*select_columns(column_map, fields)).select_from(model)
+    if 'entity_name' in fields:
+        query = query.outerjoin(Entity, Entity.id == model.entity_id)
+    if 'uploaded_by_email' in fields:
+        query = query.outerjoin(User, User.id == model.uploaded_by)
+    return query
+
 @documents_bp.route('/vault', methods=['GET'])
 @jwt_required()
 def get_vault():
-    """Get documents in vault with filtering"""
+    """Get documents in vault with filtering (supports ?fields= and ?stream=)"""
     try:
         user_id_str = get_jwt_identity()
         user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
@@ -155,86 +287,62 @@ def get_vault():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        try:
+            fields = requested_fields(VAULT_FIELDS)
+            stream = stream_format()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Get filter parameters
         entity_id = request.args.get('entity_id')
         financial_year = request.args.get('financial_year')
         document_type = request.args.get('document_type')
         
-        # Build query
-        query = PeriodicDocument.query
-        
         # Filter by user access
+        entity_ids = None  # super_admin sees all
         if user.role == 'company_secretary':
             # Get documents for entities owned by secretary
-            entity_ids = [e.id for e in user.entities]
-            query = query.filter(PeriodicDocument.entity_id.in_(entity_ids) if entity_ids else False)
+            entity_ids = [row.id for row in db.session.query(Entity.id).filter(Entity.secretary_id == user_id)]
         elif user.role == 'accountant':
             # Get documents for assigned entities
             entity_ids = [a.entity_id for a in user.assigned_entities]
+        
+        # Build query
+        query = vault_query(PeriodicDocument, PERIODIC_VAULT_COLUMNS, fields)
+        if entity_ids is not None:
             query = query.filter(PeriodicDocument.entity_id.in_(entity_ids) if entity_ids else False)
-        # super_admin sees all
         
         # Apply additional filters
         if entity_id:
-            query = query.filter_by(entity_id=int(entity_id))
+            query = query.filter(PeriodicDocument.entity_id == int(entity_id))
         
         if financial_year:
-            query = query.filter_by(financial_year=financial_year)
+            query = query.filter(PeriodicDocument.financial_year == financial_year)
         
         if document_type:
-            query = query.filter_by(document_type=document_type)
+            query = query.filter(PeriodicDocument.document_type == document_type)
         
-        documents = query.order_by(PeriodicDocument.uploaded_at.desc()).all()
+        query = query.order_by(PeriodicDocument.uploaded_at.desc())
         
         # Also get permanent documents for the same entities
-        perm_query = PermanentDocument.query
-        
-        if user.role == 'company_secretary':
-            perm_query = perm_query.filter(PermanentDocument.entity_id.in_(entity_ids) if entity_ids else False)
-        elif user.role == 'accountant':
+        perm_query = vault_query(PermanentDocument, PERMANENT_VAULT_COLUMNS, fields)
+        if entity_ids is not None:
             perm_query = perm_query.filter(PermanentDocument.entity_id.in_(entity_ids) if entity_ids else False)
-        # super_admin sees all
         
         if entity_id:
-            perm_query = perm_query.filter_by(entity_id=int(entity_id))
-        
-        permanent_docs = perm_query.order_by(PermanentDocument.uploaded_at.desc()).all()
-        
-        vault_items = []
-        
-        # Add periodic documents
-        for d in documents:
-            vault_items.append({
-                'id': d.id,
-                'entity_id': d.entity_id,
-                'entity_name': d.entity.company_name if d.entity else None,
-                'document_type': d.document_type,
-                'file_name': d.file_name,
-                'period_type': d.period,
-                'period_value': d.period_value,
-                'financial_year': d.financial_year,
-                'version': d.version,
-                'uploaded_at': d.uploaded_at.isoformat() if d.uploaded_at else None,
-                'uploaded_by_email': d.uploader.email if d.uploader else None,
-                'doc_type': 'periodic'
-            })
+            perm_query = perm_query.filter(PermanentDocument.entity_id == int(entity_id))
         
-        # Add permanent documents
-        for d in permanent_docs:
-            vault_items.append({
-                'id': d.id,
-                'entity_id': d.entity_id,
-                'entity_name': d.entity.company_name if d.entity else None,
-                'document_type': d.document_type,
-                'file_name': d.file_name,
-                'period_type': 'permanent',
-                'period_value': d.document_type,
-                'financial_year': '',
-                'version': 1,
-                'uploaded_at': d.uploaded_at.isoformat() if d.uploaded_at else None,
-                'uploaded_by_email': d.uploader.email if d.uploader else None,
-                'doc_type': 'permanent'
-            })
+        perm_query = perm_query.order_by(PermanentDocument.uploaded_at.desc())
+        
+        if stream:
+            rows = chain(
+                (row_to_dict(d, fields, PERIODIC_VAULT_CONSTANTS) for d in batched_rows(query)),
+                (row_to_dict(d, fields, PERMANENT_VAULT_CONSTANTS) for d in batched_rows(perm_query))
+            )
+            return stream_response('vault', rows, stream)
+        
+        vault_items = [row_to_dict(d, fields, PERIODIC_VAULT_CONSTANTS) for d in query.all()]
+        vault_items.extend(row_to_dict(d, fields, PERMANENT_VAULT_CONSTANTS) for d in perm_query.all())
         
         return jsonify({
             'vault': vault_items
@@ -316,7 +424,7 @@ def get_accountant_status():
                 'monthly_submissions': monthly_count,
                 'quarterly_submissions': quarterly_count,
                 'yearly_submissions': yearly_count,
-                'last_submission': last_doc.uploaded_at.isoformat() if last_doc else None
+                'last_submission': last_doc.uploaded_at if last_doc else None
             })
         
         return jsonify({'statuses': statuses}), 200
@@ -357,17 +465,10 @@ def view_permanent_document(doc_id):
         log_audit(user_id, 'view_document', 'document', doc_id, f'Viewed permanent document: {doc.file_name}')
         
         # Send file
-        return send_file(
-            doc.file_path,
-            as_attachment=False,  # View in browser
-            download_name=doc.file_name,
-            mimetype='application/octet-stream'
-        )
+        return send_document(doc, as_attachment=False)
         
     except Exception as e:
-        import traceback
-        print(f"Error viewing document: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error viewing document')
         return jsonify({'error': str(e)}), 500
 
 @documents_bp.route('/permanent/<int:doc_id>/download', methods=['GET'])
@@ -403,17 +504,10 @@ def download_permanent_document(doc_id):
         log_audit(user_id, 'download_document', 'document', doc_id, f'Downloaded permanent document: {doc.file_name}')
         
         # Send file for download
-        return send_file(
-            doc.file_path,
-            as_attachment=True,  # Force download
-            download_name=doc.file_name,
-            mimetype='application/octet-stream'
-        )
+        return send_document(doc, as_attachment=True)
         
     except Exception as e:
-        import traceback
-        print(f"Error downloading document: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error downloading document')
         return jsonify({'error': str(e)}), 500
 
 @documents_bp.route('/periodic/<int:doc_id>/view', methods=['GET'])
@@ -449,17 +543,10 @@ def view_periodic_document(doc_id):
         log_audit(user_id, 'view_document', 'document', doc_id, f'Viewed periodic document: {doc.file_name}')
         
         # Send file
-        return send_file(
-            doc.file_path,
-            as_attachment=False,  # View in browser
-            download_name=doc.file_name,
-            mimetype='application/octet-stream'
-        )
+        return send_document(doc, as_attachment=False)
         
     except Exception as e:
-        import traceback
-        print(f"Error viewing document: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error viewing document')
         return jsonify({'error': str(e)}), 500
 
 @documents_bp.route('/periodic/<int:doc_id>/download', methods=['GET'])
@@ -495,17 +582,10 @@ def download_periodic_document(doc_id):
         log_audit(user_id, 'download_document', 'document', doc_id, f'Downloaded periodic document: {doc.file_name}')
         
         # Send file for download
-        return send_file(
-            doc.file_path,
-            as_attachment=True,  # Force download
-            download_name=doc.file_name,
-            mimetype='application/octet-stream'
-        )
+        return send_document(doc, as_attachment=True)
         
     except Exception as e:
-        import traceback
-        print(f"Error downloading document: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error downloading document')
         return jsonify({'error': str(e)}), 500
 
 @documents_bp.route('/permanent/upload', methods=['POST'])
@@ -578,23 +658,17 @@ def upload_permanent_document():
         db.session.add(doc)
         db.session.commit()
         
+        record_upload('permanent', file_size)
         log_audit(user_id, 'upload_permanent_document', 'document', doc.id, f'Uploaded permanent document: {filename}')
         
         return jsonify({
             'message': 'Document uploaded successfully',
-            'document': {
-                'id': doc.id,
-                'file_name': doc.file_name,
-                'document_type': doc.document_type,
-                'uploaded_at': doc.uploaded_at.isoformat() if doc.uploaded_at else None
-            }
+            'document': UPLOADED_DOCUMENT.dump(doc)
         }), 201
         
     except Exception as e:
         db.session.rollback()
-        import traceback
-        print(f"Error uploading permanent document: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error uploading permanent document')
         return jsonify({'error': str(e)}), 500
 
 @documents_bp.route('/permanent/<int:entity_id>', methods=['GET'])
@@ -623,54 +697,35 @@ def get_permanent_documents(entity_id):
         elif user.role != 'super_admin':
             return jsonify({'error': 'Access denied'}), 403
         
-        documents = PermanentDocument.query.filter_by(entity_id=entity_id).all()
+        documents = PermanentDocument.query.options(joinedload(PermanentDocument.uploader)).filter_by(entity_id=entity_id).all()
         
         return jsonify({
-            'documents': [
-                {
-                    'id': doc.id,
-                    'document_type': doc.document_type,
-                    'file_name': doc.file_name,
-                    'file_size': doc.file_size,
-                    'uploaded_at': doc.uploaded_at.isoformat() if doc.uploaded_at else None,
-                    'uploaded_by': doc.uploader.email if doc.uploader else None
-                }
-                for doc in documents
-            ]
+            'documents': ENTITY_PERMANENT_DOCUMENT.dump_many(documents)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @documents_bp.route('/permanent/all', methods=['GET'])
-@jwt_required()
+@require_role('super_admin')
 def get_all_permanent_documents():
-    """Get all permanent documents (Super Admin only)"""
+    """Get all permanent documents (Super Admin only, supports ?stream=)"""
     try:
-        user_id_str = get_jwt_identity()
-        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
-        user = User.query.get(user_id)
+        try:
+            stream = stream_format()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if not user or user.role != 'super_admin':
-            return jsonify({'error': 'Access denied'}), 403
+        query = PermanentDocument.query.options(
+            joinedload(PermanentDocument.entity).joinedload(Entity.secretary),
+            joinedload(PermanentDocument.uploader)
+        ).order_by(PermanentDocument.id)
         
-        documents = PermanentDocument.query.all()
+        if stream:
+            return stream_response('documents', batched_rows(query), stream, ADMIN_PERMANENT_DOCUMENT.dump)
         
         return jsonify({
-            'documents': [
-                {
-                    'id': doc.id,
-                    'entity_id': doc.entity_id,
-                    'entity_name': doc.entity.company_name if doc.entity else None,
-                    'secretary_name': doc.entity.secretary.email if doc.entity and doc.entity.secretary else None,
-                    'document_type': doc.document_type,
-                    'file_name': doc.file_name,
-                    'file_size': doc.file_size,
-                    'uploaded_at': doc.uploaded_at.isoformat() if doc.uploaded_at else None,
-                    'uploaded_by_email': doc.uploader.email if doc.uploader else None
-                }
-                for doc in documents
-            ]
+            'documents': ADMIN_PERMANENT_DOCUMENT.dump_many(query.all())
         }), 200
         
     except Exception as e:
@@ -1,11 +1,23 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from database import db, Entity, User, AuditLog, PermanentDocument
+from database import db, Entity, User, AuditLog, PermanentDocument, Notification, EntityAssignment
+from field_selection import requested_fields, select_columns, row_to_dict
+from entity_import import iter_entity_rows, import_entities
+from authz import require_role
+from http_cache import cached, weak_etag
+from metrics import record_upload, record_audit_writes
+from serializers import ENTITY, ENTITY_SUMMARY, ENTITY_CREATED, ENTITY_DETAIL, PENDING_ENTITY, PERMANENT_DOCUMENT
+from sqlalchemy import func
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from werkzeug.utils import secure_filename
+import logging
 import os
+import shutil
+import uuid
 
 entities_bp = Blueprint('entities', __name__)
+logger = logging.getLogger(__name__)
 
 # Document categories from the requirements
 DOCUMENT_CATEGORIES = [
@@ -30,6 +42,45 @@ def allowed_file(filename):
     # Accept any file that has an extension
     return '.' in filename and len(filename.rsplit('.', 1)) > 1
 
+def stage_uploads(files_with_categories):
+    """Save uploaded files concurrently into a private staging folder.
+    
+    Runs before any database write so SQLite's write lock is not held during disk I/O.
+    Returns (staging_folder, [(filename, staged_path, file_size, category), ...]).
+    """
+    base_upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    staging_folder = os.path.join(base_upload_folder, 'staging', uuid.uuid4().hex)
+    os.makedirs(staging_folder, exist_ok=True)
+    
+    # Names are assigned up front so duplicate file names in one request never collide
+    timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S_')
+    jobs = []
+    used_names = set()
+    for file, category in files_with_categories:
+        filename = timestamp + secure_filename(file.filename)
+        stem, ext = os.path.splitext(filename)
+        counter = 1
+        while filename in used_names:
+            filename = f"{stem}_{counter}{ext}"
+            counter += 1
+        used_names.add(filename)
+        jobs.append((file, category, filename))
+    
+    def save(job):
+        file, category, filename = job
+        staged_path = os.path.join(staging_folder, filename)
+        file.save(staged_path)
+        return filename, staged_path, os.path.getsize(staged_path), category
+    
+    max_workers = max(1, min(current_app.config.get('ENTITY_UPLOAD_WORKERS', 4), len(jobs)))
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            staged = list(pool.map(save, jobs))
+    except Exception:
+        shutil.rmtree(staging_folder, ignore_errors=True)
+        raise
+    return staging_folder, staged
+
 def log_audit(user_id, action, resource_type=None, resource_id=None, details=None):
     """Log user action to audit trail"""
     log = AuditLog(
@@ -45,6 +96,7 @@ def log_audit(user_id, action, resource_type=None, resource_id=None, details=Non
     db.session.commit()
 
 @entities_bp.route('/categories', methods=['GET'])
+@cached(max_age=86400, private=False)
 def get_categories():
     """Get available document categories"""
     return jsonify({
@@ -55,17 +107,11 @@ def get_categories():
 @jwt_required()
 def create_entity():
     """Create a new entity with documents (Company Secretary only)"""
+    staging_folder = None
+    saved_paths = []
     try:
-        # Check content type
-        content_type = request.content_type or ''
-        print(f"Content-Type: {content_type}")
-        print(f"Request method: {request.method}")
-        print(f"Request is_json: {request.is_json}")
-        print(f"Authorization header: {request.headers.get('Authorization', 'Not found')}")
-        
         try:
             user_id_str = get_jwt_identity()
-            print(f"Raw JWT identity: {user_id_str} (type: {type(user_id_str)})")
             
             # Convert to int if it's a string, or use directly if already int
             if user_id_str is None:
@@ -79,15 +125,13 @@ def create_entity():
                     return jsonify({'error': f'Invalid user ID format in token: {user_id_str}'}), 401
             elif isinstance(user_id_str, int):
                 # Old token format - still accept it but log warning
-                print(f"WARNING: Token contains integer ID (old format). User should re-login.")
+                logger.warning('Token contains integer ID (old format). User should re-login.')
                 user_id = user_id_str
             else:
                 return jsonify({'error': f'Unexpected user ID type: {type(user_id_str)}'}), 401
-                
-            print(f"User ID from token: {user_id} (type: {type(user_id)})")
         except Exception as jwt_error:
             error_msg = str(jwt_error)
-            print(f"JWT Error: {error_msg}")
+            logger.info('JWT error creating entity: %s', error_msg)
             if 'Subject must be a string' in error_msg:
                 return jsonify({
                     'error': 'Token format is invalid. Please logout and login again.',
@@ -107,12 +151,7 @@ def create_entity():
             return jsonify({'error': 'Only Company Secretaries can create entities'}), 403
         
         # Get form data
-        print(f"Received form data keys: {list(request.form.keys())}")
-        print(f"Received files keys: {list(request.files.keys())}")
-        
-        # Debug: Print all form values
-        for key in request.form.keys():
-            print(f"  {key}: {request.form.get(key)}")
+        logger.debug('Create entity form fields: %s, file fields: %s', list(request.form.keys()), list(request.files.keys()))
         
         company_name = request.form.get('company_name', '').strip()
         pan = request.form.get('pan', '').strip().upper()
@@ -121,8 +160,6 @@ def create_entity():
         address = request.form.get('address', '').strip()
         contact = request.form.get('contact', '').strip()
         cin = request.form.get('cin', '').strip().upper() if request.form.get('cin') else None
-        
-        print(f"Parsed form data - Company: {company_name}, PAN: {pan}, GSTIN: {gstin}")
         incorporation_date = request.form.get('incorporation_date', '').strip()
         fy_start = request.form.get('fy_start', '').strip()
         fy_end = request.form.get('fy_end', '').strip()
@@ -163,6 +200,21 @@ def create_entity():
         except ValueError:
             return jsonify({'error': 'Invalid financial year end date format'}), 400
         
+        # Persist uploaded files before the transaction opens
+        uploaded_files = []
+        if 'files[]' in request.files:
+            files = request.files.getlist('files[]')
+            categories = request.form.getlist('categories[]')
+            logger.debug('Create entity: %d files, %d categories', len(files), len(categories))
+            uploaded_files = [
+                (file, category) for file, category in zip(files, categories)
+                if file and file.filename and allowed_file(file.filename)
+            ]
+        
+        if uploaded_files:
+            staging_folder, staged = stage_uploads(uploaded_files)
+            saved_paths = [staged_path for _, staged_path, _, _ in staged]
+        
         # Create entity
         entity = Entity(
             company_name=company_name,
@@ -182,76 +234,123 @@ def create_entity():
         db.session.add(entity)
         db.session.flush()  # Get the entity ID without committing
         
-        # Handle file uploads
+        # Move staged files into the entity folder and insert all document rows at once
         uploaded_docs = []
-        print(f"Files in request: {list(request.files.keys())}")
-        print(f"Form data keys: {list(request.form.keys())}")
-        
-        if 'files[]' in request.files:
-            files = request.files.getlist('files[]')
-            categories = request.form.getlist('categories[]')
-            print(f"Number of files: {len(files)}, Number of categories: {len(categories)}")
+        if uploaded_files:
+            base_upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+            upload_folder = os.path.join(base_upload_folder, f'entity_{entity.id}', 'permanent')
+            os.makedirs(upload_folder, exist_ok=True)
+            
+            document_rows = []
+            saved_paths = []
+            for filename, staged_path, file_size, category in staged:
+                file_path = os.path.join(upload_folder, filename)
+                os.replace(staged_path, file_path)
+                saved_paths.append(file_path)
+                document_rows.append({
+                    'entity_id': entity.id,
+                    'document_type': category,
+                    'file_path': file_path,
+                    'file_name': filename,
+                    'file_size': file_size,
+                    'uploaded_by': user_id
+                })
+                uploaded_docs.append(filename)
+            shutil.rmtree(staging_folder, ignore_errors=True)
+            staging_folder = None
             
-            for file, category in zip(files, categories):
-                if file and file.filename and allowed_file(file.filename):
-                    print(f"Processing file: {file.filename}, Category: {category}")
-                    # Create upload folder using app config
-                    from flask import current_app
-                    base_upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-                    upload_folder = os.path.join(base_upload_folder, f'entity_{entity.id}', 'permanent')
-                    os.makedirs(upload_folder, exist_ok=True)
-                    
-                    # Save file
-                    filename = secure_filename(file.filename)
-                    timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S_')
-                    filename = timestamp + filename
-                    
-                    file_path = os.path.join(upload_folder, filename)
-                    file.save(file_path)
-                    
-                    # Get file size
-                    file_size = os.path.getsize(file_path)
-                    
-                    # Create document record
-                    doc = PermanentDocument(
-                        entity_id=entity.id,
-                        document_type=category,
-                        file_path=file_path,
-                        file_name=filename,
-                        file_size=file_size,
-                        uploaded_by=user_id
-                    )
-                    db.session.add(doc)
-                    uploaded_docs.append(filename)
+            db.session.bulk_insert_mappings(PermanentDocument, document_rows)
         
         db.session.commit()
+        saved_paths = []
+        if uploaded_files:
+            record_upload('permanent', sum(file_size for _, _, file_size, _ in staged))
         
         log_audit(user_id, 'create_entity', 'entity', entity.id, 
                  f'Created entity: {company_name} with {len(uploaded_docs)} documents')
         
         return jsonify({
             'message': 'Entity created successfully and pending approval',
-            'entity': {
-                'id': entity.id,
-                'company_name': entity.company_name,
-                'pan': entity.pan,
-                'gstin': entity.gstin,
-                'status': entity.status,
-                'documents_uploaded': len(uploaded_docs)
-            }
+            'entity': ENTITY_CREATED.dump(entity, documents_uploaded=len(uploaded_docs))
         }), 201
         
     except Exception as e:
         db.session.rollback()
-        import traceback
-        print(f"Error creating entity: {str(e)}")
-        print(traceback.format_exc())
+        # Remove files that were saved for an entity that was never created
+        for path in saved_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        if staging_folder:
+            shutil.rmtree(staging_folder, ignore_errors=True)
+        logger.exception('Error creating entity')
         return jsonify({'error': f'Failed to create entity: {str(e)}'}), 500
 
+@entities_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_entities_file():
+    """Bulk create entities from a CSV/XLSX file (Company Secretary only)"""
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        if user.role != 'company_secretary':
+            return jsonify({'error': 'Only Company Secretaries can import entities'}), 403
+        
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        dry_run = request.form.get('dry_run', 'false').lower() == 'true'
+        chunk_size = current_app.config.get('ENTITY_IMPORT_CHUNK_SIZE', 500)
+        
+        try:
+            report = import_entities(
+                iter_entity_rows(file.stream, file.filename),
+                user_id,
+                chunk_size=chunk_size,
+                dry_run=dry_run
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not dry_run and report['created']:
+            log_audit(user_id, 'import_entities', 'entity', None,
+                     f"Imported {report['created']} of {report['total']} entities from {file.filename}")
+        
+        return jsonify({
+            'message': f"{report['created']} entities {'valid' if dry_run else 'created'}, {report['failed']} failed",
+            'dry_run': dry_run,
+            'report': report
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Public field name -> column for entity list responses
+ENTITY_LIST_COLUMNS = {
+    'id': Entity.id,
+    'company_name': Entity.company_name,
+    'pan': Entity.pan,
+    'gstin': Entity.gstin,
+    'company_type': Entity.company_type,
+    'address': Entity.address,
+    'status': Entity.status,
+    'created_at': Entity.created_at,
+    'access_type': EntityAssignment.access_type
+}
+
 @entities_bp.route('/my-entities', methods=['GET'])
 @jwt_required()
 def get_my_entities():
-    """Get entities owned or assigned to the user"""
+    """Get entities owned or assigned to the user (supports ?fields=)"""
     try:
         user_id_str = get_jwt_identity()
         user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
@@ -260,54 +359,28 @@ def get_my_entities():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        # access_type only exists for accountants' assignments
+        available = list(ENTITY_LIST_COLUMNS)
+        if user.role != 'accountant':
+            available.remove('access_type')
+        try:
+            fields = requested_fields(available)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        query = db.session.query(*select_columns(ENTITY_LIST_COLUMNS, fields)).select_from(Entity)
+        
         if user.role == 'company_secretary':
             # Get entities created by this secretary
-            entities = Entity.query.filter_by(secretary_id=user_id).all()
-            result_entities = [
-                {
-                    'id': e.id,
-                    'company_name': e.company_name,
-                    'pan': e.pan,
-                    'gstin': e.gstin,
-                    'company_type': e.company_type,
-                    'address': e.address,
-                    'status': e.status,
-                    'created_at': e.created_at.isoformat() if e.created_at else None
-                }
-                for e in entities
-            ]
+            query = query.filter(Entity.secretary_id == user_id)
         elif user.role == 'accountant':
             # Get entities assigned to this accountant with access_type
-            result_entities = []
-            for assignment in user.assigned_entities:
-                e = assignment.entity
-                result_entities.append({
-                    'id': e.id,
-                    'company_name': e.company_name,
-                    'pan': e.pan,
-                    'gstin': e.gstin,
-                    'company_type': e.company_type,
-                    'address': e.address,
-                    'status': e.status,
-                    'created_at': e.created_at.isoformat() if e.created_at else None,
-                    'access_type': assignment.access_type  # Include access type for accountants
-                })
-        else:
-            # Super admin gets all entities
-            entities = Entity.query.all()
-            result_entities = [
-                {
-                    'id': e.id,
-                    'company_name': e.company_name,
-                    'pan': e.pan,
-                    'gstin': e.gstin,
-                    'company_type': e.company_type,
-                    'address': e.address,
-                    'status': e.status,
-                    'created_at': e.created_at.isoformat() if e.created_at else None
-                }
-                for e in entities
-            ]
+            query = query.join(EntityAssignment, EntityAssignment.entity_id == Entity.id).filter(
+                EntityAssignment.accountant_id == user_id
+            )
+        # Super admin gets all entities
+        
+        result_entities = [row_to_dict(row, fields) for row in query.order_by(Entity.id).all()]
         
         return jsonify({
             'entities': result_entities
@@ -316,11 +389,36 @@ def get_my_entities():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def entity_etag(entity_id):
+    """Tag an entity by its row version and the requester's row and assignments, which decide
+    their access, so a revalidation costs one query of indexed lookups"""
+    user_id = int(get_jwt_identity())
+    assignments = db.session.query(EntityAssignment.id, EntityAssignment.row_version).filter(
+        EntityAssignment.accountant_id == user_id
+    ).subquery()
+    version, user_version, assigned, assignment_version = db.session.query(
+        db.session.query(Entity.row_version).filter(Entity.id == entity_id).scalar_subquery(),
+        db.session.query(User.row_version).filter(User.id == user_id).scalar_subquery(),
+        db.session.query(func.count(assignments.c.id)).scalar_subquery(),
+        db.session.query(func.max(assignments.c.row_version)).scalar_subquery()
+    ).one()
+    if version is None:
+        return None
+    return weak_etag('entity', entity_id, version, user_id, user_version, assigned, assignment_version)
+
 @entities_bp.route('/<int:entity_id>', methods=['GET'])
 @jwt_required()
+@cached(max_age=30, etag=entity_etag)
 def get_entity(entity_id):
     """Get a specific entity"""
     try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
         entity = Entity.query.get(entity_id)
         
         if not entity:
@@ -336,84 +434,105 @@ def get_entity(entity_id):
                 return jsonify({'error': 'You are not assigned to this entity'}), 403
         
         return jsonify({
-            'entity': {
-                'id': entity.id,
-                'company_name': entity.company_name,
-                'pan': entity.pan,
-                'gstin': entity.gstin,
-                'company_type': entity.company_type,
-                'address': entity.address,
-                'status': entity.status,
-                'created_at': entity.created_at.isoformat() if entity.created_at else None,
-                'approved_at': entity.approved_at.isoformat() if entity.approved_at else None
-            }
+            'entity': ENTITY.dump(entity)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @entities_bp.route('/pending', methods=['GET'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admins can view pending entities')
 def get_pending_entities():
-    """Get all pending entities (Admin only)"""
+    """Get a page of pending entities with document totals (Admin only)"""
+    try:
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 25, type=int), 1), 100)
+        
+        # Document count and size per row come from correlated subqueries on the entity_id index
+        document_count = db.select(func.count(PermanentDocument.id)).where(
+            PermanentDocument.entity_id == Entity.id
+        ).correlate(Entity).scalar_subquery()
+        documents_size = db.select(func.coalesce(func.sum(PermanentDocument.file_size), 0)).where(
+            PermanentDocument.entity_id == Entity.id
+        ).correlate(Entity).scalar_subquery()
+        
+        query = db.session.query(
+            Entity.id,
+            Entity.company_name,
+            Entity.pan,
+            Entity.gstin,
+            Entity.company_type,
+            Entity.status,
+            Entity.secretary_id,
+            Entity.created_at,
+            User.email.label('secretary_email'),
+            document_count.label('document_count'),
+            documents_size.label('documents_size')
+        ).outerjoin(User, Entity.secretary_id == User.id).filter(
+            Entity.status == 'pending_approval'
+        )
+        
+        total = Entity.query.filter_by(status='pending_approval').count()
+        rows = query.order_by(Entity.created_at.asc(), Entity.id.asc()).offset((page - 1) * per_page).limit(per_page).all()
+        
+        return jsonify({
+            'entities': PENDING_ENTITY.dump_many(rows),
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page
+        }), 200
+        
+    except Exception as e:
+        logger.exception('Error fetching pending entities')
+        return jsonify({'error': str(e)}), 500
+
+@entities_bp.route('/<int:entity_id>/documents', methods=['GET'])
+@jwt_required()
+def get_entity_documents(entity_id):
+    """Get one entity's full details and permanent documents"""
     try:
         user_id_str = get_jwt_identity()
         user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
         user = User.query.get(user_id)
         
-        if not user or user.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admins can view pending entities'}), 403
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
         
-        entities = Entity.query.filter_by(status='pending_approval').all()
+        entity = Entity.query.get(entity_id)
+        if not entity:
+            return jsonify({'error': 'Entity not found'}), 404
+        
+        # Check access
+        if user.role == 'company_secretary':
+            if entity.secretary_id != user_id:
+                return jsonify({'error': 'Access denied'}), 403
+        elif user.role == 'accountant':
+            assigned = any(a.entity_id == entity_id for a in user.assigned_entities)
+            if not assigned:
+                return jsonify({'error': 'Access denied'}), 403
+        elif user.role != 'super_admin':
+            return jsonify({'error': 'Access denied'}), 403
+        
+        documents = PermanentDocument.query.filter_by(entity_id=entity_id).order_by(
+            PermanentDocument.uploaded_at.asc()
+        ).all()
         
         return jsonify({
-            'entities': [
-                {
-                    'id': e.id,
-                    'company_name': e.company_name,
-                    'pan': e.pan,
-                    'gstin': e.gstin,
-                    'company_type': e.company_type,
-                    'address': e.address,
-                    'status': e.status,
-                    'secretary_email': e.secretary.email if e.secretary else None,
-                    'secretary': {
-                        'email': e.secretary.email if e.secretary else None,
-                        'id': e.secretary.id if e.secretary else None
-                    },
-                    'documents': [
-                        {
-                            'id': doc.id,
-                            'document_type': doc.document_type,
-                            'file_name': doc.file_name,
-                            'file_size': doc.file_size,
-                            'uploaded_at': doc.uploaded_at.isoformat() if doc.uploaded_at else None
-                        }
-                        for doc in e.permanent_documents
-                    ],
-                    'created_at': e.created_at.isoformat() if e.created_at else None
-                }
-                for e in entities
-            ]
+            'entity': ENTITY_DETAIL.dump(entity),
+            'documents': PERMANENT_DOCUMENT.dump_many(documents)
         }), 200
         
     except Exception as e:
-        import traceback
-        print(f"Error fetching pending entities: {str(e)}")
-        print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
 @entities_bp.route('/<int:entity_id>/approve', methods=['POST'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admins can approve entities')
 def approve_entity(entity_id):
     """Approve an entity (Admin only)"""
     try:
         user_id_str = get_jwt_identity()
         user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
-        user = User.query.get(user_id)
-        
-        if not user or user.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admins can approve entities'}), 403
         
         entity = Entity.query.get(entity_id)
         
@@ -438,11 +557,7 @@ def approve_entity(entity_id):
         
         return jsonify({
             'message': 'Entity approved successfully',
-            'entity': {
-                'id': entity.id,
-                'company_name': entity.company_name,
-                'status': entity.status
-            }
+            'entity': ENTITY_SUMMARY.dump(entity)
         }), 200
         
     except Exception as e:
@@ -450,16 +565,12 @@ def approve_entity(entity_id):
         return jsonify({'error': str(e)}), 500
 
 @entities_bp.route('/<int:entity_id>/reject', methods=['POST'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admins can reject entities')
 def reject_entity(entity_id):
     """Reject an entity (Admin only)"""
     try:
         user_id_str = get_jwt_identity()
         user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
-        user = User.query.get(user_id)
-        
-        if not user or user.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admins can reject entities'}), 403
         
         entity = Entity.query.get(entity_id)
         
@@ -483,13 +594,130 @@ def reject_entity(entity_id):
         
         return jsonify({
             'message': 'Entity rejected',
-            'entity': {
-                'id': entity.id,
-                'company_name': entity.company_name,
-                'status': entity.status
-            }
+            'entity': ENTITY_SUMMARY.dump(entity)
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+def review_entities(entity_ids, approve, remarks, admin_id):
+    """Approve or reject many pending entities in one transaction.
+    
+    Returns (entities, error, status_code) - entities is a list of (id, company_name, secretary_id).
+    """
+    # Validate every status in one query
+    rows = db.session.query(Entity.id, Entity.company_name, Entity.secretary_id, Entity.status).filter(
+        Entity.id.in_(entity_ids)
+    ).all()
+    found = {row.id: row for row in rows}
+    missing = [entity_id for entity_id in entity_ids if entity_id not in found]
+    not_pending = [row.id for row in rows if row.status != 'pending_approval']
+    if missing or not_pending:
+        return None, {
+            'error': 'Some entities cannot be reviewed',
+            'not_found': missing,
+            'not_pending': not_pending
+        }, 400
+    
+    now = datetime.utcnow()
+    values = {'status': 'active' if approve else 'rejected', 'approved_by': admin_id}
+    if approve:
+        values['approved_at'] = now
+    if remarks:
+        values['admin_remarks'] = remarks
+    
+    # The status guard makes a concurrent review of the same entity fail the whole batch
+    updated = Entity.query.filter(
+        Entity.id.in_(entity_ids),
+        Entity.status == 'pending_approval'
+    ).update(values, synchronize_session=False)
+    if updated != len(entity_ids):
+        db.session.rollback()
+        return None, {'error': 'Some entities were reviewed by someone else. Please refresh and try again.'}, 409
+    
+    action = 'approve_entity' if approve else 'reject_entity'
+    verb = 'Approved' if approve else 'Rejected'
+    ip_address = request.remote_addr
+    user_agent = request.headers.get('User-Agent')
+    db.session.bulk_insert_mappings(AuditLog, [
+        {
+            'user_id': admin_id,
+            'action': action,
+            'resource_type': 'entity',
+            'resource_id': row.id,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'details': f'{verb} entity: {row.company_name} (bulk)',
+            'created_at': now
+        }
+        for row in rows
+    ])
+    db.session.bulk_insert_mappings(Notification, [
+        {
+            'user_id': row.secretary_id,
+            'title': f'Entity {verb.lower()}',
+            'message': f'{row.company_name} has been {verb.lower()}.' + (f' Remarks: {remarks}' if remarks else ''),
+            'type': 'approval' if approve else 'rejection',
+            'related_entity_id': row.id,
+            'created_at': now
+        }
+        for row in rows
+    ])
+    db.session.commit()
+    record_audit_writes(action, len(rows))
+    return [(row.id, row.company_name, row.secretary_id) for row in rows], None, 200
+
+def bulk_review(approve):
+    user_id_str = get_jwt_identity()
+    user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    
+    data = request.get_json() or {}
+    remarks = (data.get('remarks') or '').strip()
+    try:
+        entity_ids = list(dict.fromkeys(int(entity_id) for entity_id in data.get('entity_ids', [])))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'entity_ids must be a list of entity IDs'}), 400
+    
+    if not entity_ids:
+        return jsonify({'error': 'No entities selected'}), 400
+    
+    max_batch = current_app.config.get('ENTITY_REVIEW_BATCH_LIMIT', 1000)
+    if len(entity_ids) > max_batch:
+        return jsonify({'error': f'At most {max_batch} entities can be reviewed at once'}), 400
+    
+    if not approve and not remarks:
+        return jsonify({'error': 'Remarks are required for rejection'}), 400
+    
+    reviewed, error, status_code = review_entities(entity_ids, approve, remarks, user_id)
+    if error:
+        return jsonify(error), status_code
+    
+    status = 'active' if approve else 'rejected'
+    return jsonify({
+        'message': f"{len(reviewed)} entities {'approved' if approve else 'rejected'}",
+        'entities': [
+            {'id': entity_id, 'company_name': company_name, 'status': status}
+            for entity_id, company_name, _ in reviewed
+        ]
+    }), 200
+
+@entities_bp.route('/bulk-approve', methods=['POST'])
+@require_role('super_admin', error='Only Super Admins can approve entities')
+def bulk_approve_entities():
+    """Approve many pending entities at once (Admin only)"""
+    try:
+        return bulk_review(approve=True)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@entities_bp.route('/bulk-reject', methods=['POST'])
+@require_role('super_admin', error='Only Super Admins can reject entities')
+def bulk_reject_entities():
+    """Reject many pending entities at once (Admin only)"""
+    try:
+        return bulk_review(approve=False)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
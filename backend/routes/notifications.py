@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db, Notification
+from serializers import NOTIFICATION
 
 notifications_bp = Blueprint('notifications', __name__)
 
@@ -19,19 +20,7 @@ def get_notifications():
         
         notifications = query.order_by(Notification.created_at.desc()).limit(100).all()
         
-        result = []
-        for notif in notifications:
-            result.append({
-                'id': notif.id,
-                'title': notif.title,
-                'message': notif.message,
-                'type': notif.type,
-                'is_read': notif.is_read,
-                'created_at': notif.created_at.isoformat(),
-                'related_entity_id': notif.related_entity_id
-            })
-        
-        return jsonify({'notifications': result}), 200
+        return jsonify({'notifications': NOTIFICATION.dump_many(notifications)}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,73 @@
+from flask import Blueprint, request, jsonify, current_app
+from authz import require_role
+from profiling import load_settings, save_settings, list_profile_ids, load_profile, to_collapsed, to_speedscope
+import re
+
+profiling_bp = Blueprint('profiling', __name__)
+
+@profiling_bp.route('/settings', methods=['GET'])
+@require_role('super_admin', error='Only Super Admin can manage profiling')
+def get_profiling_settings():
+    """Get the current profiling settings (Super Admin only)"""
+    try:
+        return jsonify({'settings': load_settings(max_age=0)}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@profiling_bp.route('/settings', methods=['PUT'])
+@require_role('super_admin', error='Only Super Admin can manage profiling')
+def update_profiling_settings():
+    """Switch profiling on/off for a route or a sample of requests (Super Admin only)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            settings = save_settings(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({'message': 'Profiling settings updated', 'settings': settings}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@profiling_bp.route('/profiles', methods=['GET'])
+@require_role('super_admin', error='Only Super Admin can view profiles')
+def get_profiles():
+    """List the stored request profiles, newest first (Super Admin only)"""
+    try:
+        profiles = []
+        for profile_id in list_profile_ids():
+            profile = load_profile(profile_id)
+            if profile:
+                profile.pop('stacks', None)
+                profiles.append(profile)
+
+        return jsonify({'profiles': profiles}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@profiling_bp.route('/profiles/<profile_id>', methods=['GET'])
+@require_role('super_admin', error='Only Super Admin can view profiles')
+def download_profile(profile_id):
+    """Download a profile as collapsed stacks (?format=collapsed, default) or speedscope JSON (Super Admin only)"""
+    try:
+        profile = load_profile(profile_id)
+        if not profile:
+            return jsonify({'error': 'Profile not found'}), 404
+
+        fmt = request.args.get('format', 'collapsed')
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{profile['endpoint']}_{profile['id']}")
+        if fmt == 'speedscope':
+            response = jsonify(to_speedscope(profile))
+            response.headers['Content-Disposition'] = f'attachment; filename={name}.speedscope.json'
+            return response, 200
+        if fmt == 'collapsed':
+            response = current_app.response_class(to_collapsed(profile), mimetype='text/plain')
+            response.headers['Content-Disposition'] = f'attachment; filename={name}.folded'
+            return response, 200
+        return jsonify({'error': 'format must be collapsed or speedscope'}), 400
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,215 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from database import (db, User, Entity, EntityAssignment, PermanentDocument, PeriodicDocument, Notification,
+                      Tombstone, current_row_version)
+from serializers import (SYNC_ENTITY, SYNC_ASSIGNMENT, SYNC_PERMANENT_DOCUMENT, SYNC_PERIODIC_DOCUMENT, SYNC_USER,
+                         NOTIFICATION)
+from field_selection import select_columns, row_to_dict
+from routes.entities import ENTITY_LIST_COLUMNS
+from routes.documents import (VAULT_FIELDS, PERIODIC_VAULT_COLUMNS, PERMANENT_VAULT_COLUMNS,
+                              PERIODIC_VAULT_CONSTANTS, PERMANENT_VAULT_CONSTANTS, vault_query)
+from sqlalchemy import or_
+
+sync_bp = Blueprint('sync', __name__)
+
+# resource -> (model, serializer, column holding the entity id or None for the entity itself)
+SYNC_RESOURCES = {
+    'entities': (Entity, SYNC_ENTITY, Entity.id),
+    'assignments': (EntityAssignment, SYNC_ASSIGNMENT, EntityAssignment.entity_id),
+    'permanent_documents': (PermanentDocument, SYNC_PERMANENT_DOCUMENT, PermanentDocument.entity_id),
+    'periodic_documents': (PeriodicDocument, SYNC_PERIODIC_DOCUMENT, PeriodicDocument.entity_id),
+    'users': (User, SYNC_USER, None)
+}
+
+def visible_entity_ids(user):
+    """Subquery of the entity ids a user can see, or None for all entities"""
+    if user.role == 'company_secretary':
+        return db.select(Entity.id).where(Entity.secretary_id == user.id)
+    if user.role == 'accountant':
+        return db.select(EntityAssignment.entity_id).where(EntityAssignment.accountant_id == user.id)
+    return None
+
+def tombstones(user, since, resource, entity_ids):
+    """Tombstones of one table after since that the user may learn about"""
+    query = db.session.query(Tombstone.row_id, Tombstone.entity_id).filter(
+        Tombstone.resource == resource,
+        Tombstone.row_version > since
+    )
+    if user.role != 'super_admin':
+        scope = Tombstone.user_id == user.id
+        if entity_ids is not None:
+            scope = or_(scope, Tombstone.entity_id.in_(entity_ids))
+        query = query.filter(scope)
+    return query.all()
+
+@sync_bp.route('/changes', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """Get rows inserted, updated or deleted after a row version (?since=<version>&resources=a,b)"""
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        since = request.args.get('since', 0, type=int)
+        available = [r for r in SYNC_RESOURCES if r != 'users' or user.role == 'super_admin']
+        raw = request.args.get('resources', '').strip()
+        resources = [r.strip() for r in raw.split(',') if r.strip()] if raw else available
+        unknown = [r for r in resources if r not in available]
+        if unknown:
+            return jsonify({'error': f"Unknown resources: {', '.join(unknown)}. Available: {', '.join(available)}"}), 400
+        
+        # Read the high-water mark first so a write committed mid-request is picked up next time
+        version = current_row_version()
+        entity_ids = visible_entity_ids(user)
+        
+        changes = {}
+        deleted = {}
+        for resource in resources:
+            model, serializer, entity_column = SYNC_RESOURCES[resource]
+            query = model.query.filter(model.row_version > since)
+            if entity_ids is not None and entity_column is not None:
+                query = query.filter(entity_column.in_(entity_ids))
+            changes[resource] = serializer.dump_many(query.order_by(model.row_version, model.id).all())
+            deleted[resource] = [row_id for row_id, _ in tombstones(user, since, model.__tablename__, entity_ids)]
+        
+        return jsonify({
+            'since': since,
+            'version': version,
+            'changes': changes,
+            'deleted': deleted
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+DELTA_RESOURCES = ('entities', 'vault', 'notifications')
+
+def newly_visible_entity_ids(user, since):
+    """Entities assigned to an accountant after since; their older rows are new to the client"""
+    if user.role != 'accountant':
+        return []
+    return [row.entity_id for row in db.session.query(EntityAssignment.entity_id).filter(
+        EntityAssignment.accountant_id == user.id,
+        EntityAssignment.row_version > since
+    )]
+
+def removed_entity_ids(user, since, entity_ids):
+    """Entities deleted or unassigned after since that the user can no longer see"""
+    removed = {row_id for row_id, _ in tombstones(user, since, Entity.__tablename__, None)}
+    if user.role == 'accountant':
+        removed.update(entity_id for _, entity_id in tombstones(user, since, EntityAssignment.__tablename__, None))
+    if not removed:
+        return []
+    query = db.session.query(Entity.id).filter(Entity.id.in_(removed))
+    if entity_ids is not None:
+        query = query.filter(Entity.id.in_(entity_ids))
+    return sorted(removed - {row.id for row in query})
+
+def entities_delta(user, since, entity_ids, added, removed):
+    """Entities in the /entities/my-entities shape changed after since"""
+    fields = [f for f in ENTITY_LIST_COLUMNS if f != 'access_type' or user.role == 'accountant']
+    query = db.session.query(*select_columns(ENTITY_LIST_COLUMNS, fields)).select_from(Entity)
+    changed = Entity.row_version > since
+    if user.role == 'accountant':
+        query = query.join(EntityAssignment, EntityAssignment.entity_id == Entity.id).filter(
+            EntityAssignment.accountant_id == user.id
+        )
+        changed = or_(changed, EntityAssignment.row_version > since)
+    elif entity_ids is not None:
+        query = query.filter(Entity.id.in_(entity_ids))
+    rows = query.filter(changed).order_by(Entity.id).all()
+    return {
+        'upserted': [row_to_dict(row, fields) for row in rows],
+        'deleted': removed
+    }
+
+def vault_delta(user, since, entity_ids, added, removed):
+    """Vault items in the /documents/vault shape changed after since"""
+    upserted = []
+    deleted = []
+    for model, column_map, constants in (
+        (PeriodicDocument, PERIODIC_VAULT_COLUMNS, PERIODIC_VAULT_CONSTANTS),
+        (PermanentDocument, PERMANENT_VAULT_COLUMNS, PERMANENT_VAULT_CONSTANTS)
+    ):
+        changed = model.row_version > since
+        if added:
+            changed = or_(changed, model.entity_id.in_(added))
+        query = vault_query(model, column_map, VAULT_FIELDS).filter(changed)
+        if entity_ids is not None:
+            query = query.filter(model.entity_id.in_(entity_ids))
+        rows = query.order_by(model.uploaded_at.desc()).all()
+        upserted.extend(row_to_dict(row, VAULT_FIELDS, constants) for row in rows)
+        deleted.extend(
+            {'id': row_id, 'doc_type': constants['doc_type']}
+            for row_id, _ in tombstones(user, since, model.__tablename__, entity_ids)
+        )
+    return {
+        'upserted': upserted,
+        'deleted': deleted,
+        'deleted_entity_ids': removed
+    }
+
+def notifications_delta(user, since, entity_ids, added, removed):
+    """The user's notifications changed after since (the latest 100 on a first sync)"""
+    query = Notification.query.filter(Notification.user_id == user.id, Notification.row_version > since)
+    if since == 0:
+        query = query.order_by(Notification.created_at.desc()).limit(100)
+    deleted = [row.row_id for row in db.session.query(Tombstone.row_id).filter(
+        Tombstone.resource == Notification.__tablename__,
+        Tombstone.row_version > since,
+        Tombstone.user_id == user.id
+    )]
+    return {
+        'upserted': NOTIFICATION.dump_many(query.all()),
+        'deleted': deleted
+    }
+
+DELTA_BUILDERS = {
+    'entities': entities_delta,
+    'vault': vault_delta,
+    'notifications': notifications_delta
+}
+
+@sync_bp.route('/delta', methods=['GET'])
+@jwt_required()
+def get_delta():
+    """Get what changed in the frontend lists since each list's high-water mark (?entities=<v>&vault=<v>)"""
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        marks = {}
+        for resource in DELTA_RESOURCES:
+            if resource in request.args:
+                since = request.args.get(resource, type=int)
+                if since is None or since < 0:
+                    return jsonify({'error': f'{resource} must be a row version (0 for a full sync)'}), 400
+                marks[resource] = since
+        if not marks:
+            return jsonify({'error': f"Give a version for at least one of: {', '.join(DELTA_RESOURCES)}"}), 400
+        
+        # Read the high-water mark first so a write committed mid-request is picked up next time
+        version = current_row_version()
+        entity_ids = visible_entity_ids(user)
+        
+        result = {}
+        access_changes = {}  # The marks are usually equal, so look up access changes once per distinct mark
+        for resource, since in marks.items():
+            if since not in access_changes:
+                access_changes[since] = (newly_visible_entity_ids(user, since), removed_entity_ids(user, since, entity_ids))
+            added, removed = access_changes[since]
+            result[resource] = DELTA_BUILDERS[resource](user, since, entity_ids, added, removed)
+            result[resource]['version'] = version
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
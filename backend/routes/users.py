@@ -1,9 +1,18 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash
+from passwords import hash_password, PasswordHashBusy
+from revocation import revoke_user_tokens
+from authz import require_role, bump_acl_version
 from database import db, User, Entity, EntityAssignment, AuditLog, PermanentDocument, PeriodicDocument
+from field_selection import requested_fields, select_columns, row_to_dict
+from serializers import ENTITY_ACCOUNTANT, ASSIGNED_ENTITY
+from http_cache import cached, weak_etag
+from streaming import stream_format, batched_rows, stream_response
+from sqlalchemy import func
+import logging
 
 users_bp = Blueprint('users', __name__)
+logger = logging.getLogger(__name__)
 
 def log_audit(user_id, action, resource_type=None, resource_id=None, details=None):
     log = AuditLog(
@@ -18,42 +27,38 @@ def log_audit(user_id, action, resource_type=None, resource_id=None, details=Non
     db.session.add(log)
     db.session.commit()
 
+# Public field name -> column for list responses (supports ?fields=)
+USER_LIST_COLUMNS = {
+    'id': User.id,
+    'email': User.email,
+    'role': User.role,
+    'pan': User.pan,
+    'gstin': User.gstin,
+    'is_active': User.is_active,
+    'created_at': User.created_at,
+    'last_login': User.last_login
+}
+
+USER_DOCUMENT_FIELDS = ['id', 'document_type', 'file_name', 'file_size', 'period', 'period_value',
+                        'financial_year', 'version', 'uploaded_at', 'entity_id', 'entity_name']
+
 @users_bp.route('/', methods=['GET'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admin can view users')
 def get_users():
-    """Get all users (Super Admin only)"""
+    """Get all users (Super Admin only, supports ?fields= and ?stream=)"""
     try:
-        print("get_users called")
-        user_id_str = get_jwt_identity()
-        print(f"user_id_str: {user_id_str}")
-        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
-        print(f"user_id: {user_id}")
-        user = User.query.get(user_id)
-        print(f"user: {user}, role: {user.role if user else None}")
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        if user.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admin can view users'}), 403
-        
-        users = User.query.all()
-        print(f"Found {len(users)} users")
-        
-        result = []
-        for u in users:
-            result.append({
-                'id': u.id,
-                'email': u.email,
-                'role': u.role,
-                'pan': u.pan,
-                'gstin': u.gstin,
-                'is_active': u.is_active,
-                'created_at': u.created_at.isoformat() if u.created_at else None,
-                'last_login': u.last_login.isoformat() if u.last_login else None
-            })
-        
-        print(f"Returning {len(result)} users to super admin")
+        try:
+            fields = requested_fields(list(USER_LIST_COLUMNS))
+            stream = stream_format()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        query = db.session.query(*select_columns(USER_LIST_COLUMNS, fields)).order_by(User.id)
+        if stream:
+            return stream_response('users', batched_rows(query), stream, lambda u: row_to_dict(u, fields))
+        
+        users = query.all()
+        result = [row_to_dict(u, fields) for u in users]
         return jsonify({'users': result}), 200
         
     except (ValueError, TypeError) as e:
@@ -62,15 +67,11 @@ def get_users():
         return jsonify({'error': str(e)}), 500
 
 @users_bp.route('/create', methods=['POST'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admin can create users')
 def create_user():
     """Create user (Super Admin only)"""
     try:
         user_id = get_jwt_identity()
-        admin = User.query.get(user_id)
-        
-        if admin.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admin can create users'}), 403
         
         data = request.get_json()
         email = data.get('email', '').strip().lower()
@@ -90,7 +91,7 @@ def create_user():
         
         user = User(
             email=email,
-            password_hash=generate_password_hash(password),
+            password_hash=hash_password(password),
             role=role,
             pan=pan,
             gstin=gstin,
@@ -110,20 +111,20 @@ def create_user():
             }
         }), 201
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+        
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @users_bp.route('/<int:user_id>/toggle-active', methods=['POST'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admin can modify users')
 def toggle_user_active(user_id):
     """Activate/deactivate user (Super Admin only)"""
     try:
-        admin_id = get_jwt_identity()
-        admin = User.query.get(admin_id)
-        
-        if admin.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admin can modify users'}), 403
+        admin_id = int(get_jwt_identity())
         
         user = User.query.get(user_id)
         if not user:
@@ -133,8 +134,13 @@ def toggle_user_active(user_id):
             return jsonify({'error': 'Cannot deactivate yourself'}), 400
         
         user.is_active = not user.is_active
+        bump_acl_version(user)
         db.session.commit()
         
+        # Existing tokens stop working at once instead of every request checking is_active
+        if not user.is_active:
+            revoke_user_tokens(user.id)
+        
         action = 'activated' if user.is_active else 'deactivated'
         log_audit(admin_id, 'update', 'user', user_id, f'{action.capitalize()} user: {user.email}')
         
@@ -152,15 +158,11 @@ def toggle_user_active(user_id):
         return jsonify({'error': str(e)}), 500
 
 @users_bp.route('/assign-entity', methods=['POST'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admin can assign entities')
 def assign_entity():
     """Assign entity to accountant (Super Admin only)"""
     try:
         admin_id = get_jwt_identity()
-        admin = User.query.get(admin_id)
-        
-        if admin.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admin can assign entities'}), 403
         
         data = request.get_json()
         entity_id = data.get('entity_id')
@@ -273,7 +275,7 @@ def create_accountant():
         # Create accountant user
         accountant = User(
             email=email,
-            password_hash=generate_password_hash(password),
+            password_hash=hash_password(password),
             role='accountant',
             is_active=True
         )
@@ -306,15 +308,39 @@ def create_accountant():
             }
         }), 201
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+        
     except Exception as e:
         db.session.rollback()
-        import traceback
-        print(f"Error creating accountant: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error creating accountant')
         return jsonify({'error': str(e)}), 500
 
+def entity_accountants_etag(entity_id):
+    """Tag an entity's accountant list by the row versions it is built from - the entity (its
+    secretary), the requester, the assignments and the assigned users - in one query"""
+    user_id = int(get_jwt_identity())
+    assignments = db.session.query(EntityAssignment.id, EntityAssignment.row_version, EntityAssignment.accountant_id).filter(
+        EntityAssignment.entity_id == entity_id
+    ).subquery()
+    version, user_version, assigned, assignment_version, accountant_version = db.session.query(
+        db.session.query(Entity.row_version).filter(Entity.id == entity_id).scalar_subquery(),
+        db.session.query(User.row_version).filter(User.id == user_id).scalar_subquery(),
+        db.session.query(func.count(assignments.c.id)).scalar_subquery(),
+        db.session.query(func.max(assignments.c.row_version)).scalar_subquery(),
+        db.session.query(func.max(User.row_version)).filter(User.id.in_(
+            db.session.query(assignments.c.accountant_id)
+        )).scalar_subquery()
+    ).one()
+    if version is None:
+        return None
+    return weak_etag('entity-accountants', entity_id, version, user_id, user_version,
+                     assigned, assignment_version, accountant_version)
+
 @users_bp.route('/entity/<int:entity_id>/accountants', methods=['GET'])
 @jwt_required()
+@cached(etag=entity_accountants_etag)  # Revalidated on every use; the secretary edits this list
 def get_entity_accountants(entity_id):
     """Get accountants assigned to an entity (Company Secretary of that entity only)"""
     try:
@@ -335,41 +361,31 @@ def get_entity_accountants(entity_id):
         elif user.role != 'super_admin' and user.role != 'company_secretary':
             return jsonify({'error': 'Access denied'}), 403
         
-        assignments = EntityAssignment.query.filter_by(entity_id=entity_id).all()
-        
-        accountants = []
-        for assignment in assignments:
-            accountant = User.query.get(assignment.accountant_id)
-            if accountant:
-                accountants.append({
-                    'id': accountant.id,
-                    'email': accountant.email,
-                    'is_active': accountant.is_active,
-                    'assigned_at': assignment.assigned_at.isoformat() if assignment.assigned_at else None,
-                    'access_type': assignment.access_type
-                })
+        rows = db.session.query(
+            User.id,
+            User.email,
+            User.is_active,
+            EntityAssignment.assigned_at,
+            EntityAssignment.access_type
+        ).join(User, EntityAssignment.accountant_id == User.id).filter(
+            EntityAssignment.entity_id == entity_id
+        ).order_by(EntityAssignment.id).all()
         
         return jsonify({
-            'accountants': accountants
+            'accountants': ENTITY_ACCOUNTANT.dump_many(rows)
         }), 200
         
     except Exception as e:
-        import traceback
-        print(f"Error fetching accountants: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error fetching accountants')
         return jsonify({'error': str(e)}), 500
 
 @users_bp.route('/unassign-entity', methods=['POST'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admin can unassign entities')
 def unassign_entity():
     """Unassign entity from accountant (Super Admin only)"""
     try:
         admin_id_str = get_jwt_identity()
         admin_id = int(admin_id_str) if isinstance(admin_id_str, str) else admin_id_str
-        admin = User.query.get(admin_id)
-        
-        if admin.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admin can unassign entities'}), 403
         
         data = request.get_json()
         entity_id = data.get('entity_id')
@@ -395,114 +411,75 @@ def unassign_entity():
         return jsonify({'error': str(e)}), 500
 
 @users_bp.route('/<int:user_id>/documents', methods=['GET'])
-@jwt_required()
+@require_role('super_admin', error='Only Super Admin can view user documents')
 def get_user_documents(user_id):
     """Get all documents uploaded by a user (Super Admin only)"""
     try:
-        admin_id_str = get_jwt_identity()
-        admin_id = int(admin_id_str) if isinstance(admin_id_str, str) else admin_id_str
-        admin = User.query.get(admin_id)
-        
-        if not admin:
-            return jsonify({'error': 'Admin user not found'}), 404
-        
-        if admin.role != 'super_admin':
-            return jsonify({'error': 'Only Super Admin can view user documents'}), 403
-        
         target_user = User.query.get(user_id)
         if not target_user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get permanent documents uploaded by this user
-        permanent_docs = PermanentDocument.query.filter_by(uploaded_by=user_id).all()
-        
-        # Get periodic documents uploaded by this user
-        periodic_docs = PeriodicDocument.query.filter_by(uploaded_by=user_id).all()
+        try:
+            fields = requested_fields(USER_DOCUMENT_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        def document_rows(model, periodic):
+            column_map = {
+                'id': model.id,
+                'document_type': model.document_type,
+                'file_name': model.file_name,
+                'file_size': model.file_size,
+                'uploaded_at': model.uploaded_at,
+                'entity_id': model.entity_id,
+                'entity_name': func.coalesce(Entity.company_name, 'Unknown')
+            }
+            if periodic:
+                column_map.update({
+                    'period': model.period,
+                    'period_value': model.period_value,
+                    'financial_year': model.financial_year,
+                    'version': model.version
+                })
+            model_fields = [f for f in fields if f in column_map]
+            query = db.session.query(*select_columns(column_map, model_fields)).select_from(model)
+            if 'entity_name' in model_fields:
+                query = query.outerjoin(Entity, Entity.id == model.entity_id)
+            rows = query.filter(model.uploaded_by == user_id).order_by(model.id).all()
+            return [row_to_dict(row, model_fields) for row in rows]
         
         return jsonify({
-            'permanent_documents': [
-                {
-                    'id': doc.id,
-                    'document_type': doc.document_type,
-                    'file_name': doc.file_name,
-                    'file_size': doc.file_size,
-                    'uploaded_at': doc.uploaded_at.isoformat() if doc.uploaded_at else None,
-                    'entity_id': doc.entity_id,
-                    'entity_name': doc.entity.company_name if doc.entity else 'Unknown'
-                }
-                for doc in permanent_docs
-            ],
-            'periodic_documents': [
-                {
-                    'id': doc.id,
-                    'document_type': doc.document_type,
-                    'file_name': doc.file_name,
-                    'file_size': doc.file_size,
-                    'period': doc.period,
-                    'period_value': doc.period_value,
-                    'financial_year': doc.financial_year,
-                    'version': doc.version,
-                    'uploaded_at': doc.uploaded_at.isoformat() if doc.uploaded_at else None,
-                    'entity_id': doc.entity_id,
-                    'entity_name': doc.entity.company_name if doc.entity else 'Unknown'
-                }
-                for doc in periodic_docs
-            ]
+            'permanent_documents': document_rows(PermanentDocument, periodic=False),
+            'periodic_documents': document_rows(PeriodicDocument, periodic=True)
         }), 200
         
     except Exception as e:
-        import traceback
-        print(f"Error fetching user documents: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error fetching user documents')
         return jsonify({'error': str(e)}), 500
 
 @users_bp.route('/<int:user_id>/assigned-entities', methods=['GET'])
-@jwt_required()
+@require_role('super_admin')
 def get_user_assigned_entities(user_id):
     """Get entities assigned to a user (Super Admin only)"""
     try:
-        print(f"get_user_assigned_entities called for user_id: {user_id}")
-        current_user_id_str = get_jwt_identity()
-        current_user_id = int(current_user_id_str) if isinstance(current_user_id_str, str) else current_user_id_str
-        current_user = User.query.get(current_user_id)
-        print(f"Current user: {current_user}, role: {current_user.role if current_user else None}")
-        
-        if not current_user or current_user.role != 'super_admin':
-            print("Access denied")
-            return jsonify({'error': 'Access denied'}), 403
-        
         target_user = User.query.get(user_id)
-        print(f"Target user: {target_user}, role: {target_user.role if target_user else None}")
         if not target_user:
             return jsonify({'error': 'User not found'}), 404
         
         assigned_entities = []
         if target_user.role == 'accountant':
-            for assignment in target_user.assigned_entities:
-                assigned_entities.append({
-                    'id': assignment.entity.id,
-                    'company_name': assignment.entity.company_name,
-                    'pan': assignment.entity.pan,
-                    'gstin': assignment.entity.gstin,
-                    'status': assignment.entity.status,
-                    'access_type': assignment.access_type
-                })
+            assigned_entities = [
+                ASSIGNED_ENTITY.dump(assignment.entity, access_type=assignment.access_type)
+                for assignment in target_user.assigned_entities
+            ]
         elif target_user.role == 'company_secretary':
-            for entity in target_user.entities:
-                assigned_entities.append({
-                    'id': entity.id,
-                    'company_name': entity.company_name,
-                    'pan': entity.pan,
-                    'gstin': entity.gstin,
-                    'status': entity.status,
-                    'access_type': 'owner'
-                })
+            assigned_entities = [
+                ASSIGNED_ENTITY.dump(entity, access_type='owner')
+                for entity in target_user.entities
+            ]
         
-        print(f"Returning {len(assigned_entities)} assigned entities")
         return jsonify({'entities': assigned_entities}), 200
         
     except Exception as e:
-        import traceback
-        print(f"Error fetching assigned entities: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception('Error fetching assigned entities')
         return jsonify({'error': str(e)}), 500
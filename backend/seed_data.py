@@ -0,0 +1,307 @@
+"""Synthetic data generator for benchmarks and load tests.
+
+Fills a database with a reproducible data set at a chosen scale: company
+secretaries and accountants, entities owned by the secretaries and assigned
+to accountants, permanent and periodic documents per entity, notifications
+and an audit history. Rows are written with bulk inserts in chunks, so a
+six-figure data set takes seconds rather than minutes. The same scale and
+seed always produce the same rows.
+
+Documents point at a small pool of real files written to the upload folder,
+so views, downloads and re-uploads work against the seeded rows. Every
+generated user has the password SEED_PASSWORD.
+
+Usage: python seed_data.py --database /tmp/gm_seed.db [--scale medium] [--users 200] [--entities 1000] ...
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+SEED_PASSWORD = 'bench-password'
+
+# Rows per scale; any count can be overridden on its own
+SCALES = {
+    'small': {'users': 20, 'entities': 50, 'documents_per_entity': 12, 'permanent_per_entity': 2,
+              'audit_logs': 2000, 'notifications_per_user': 5},
+    'medium': {'users': 200, 'entities': 1000, 'documents_per_entity': 24, 'permanent_per_entity': 4,
+               'audit_logs': 50000, 'notifications_per_user': 20},
+    'large': {'users': 1000, 'entities': 10000, 'documents_per_entity': 48, 'permanent_per_entity': 4,
+              'audit_logs': 500000, 'notifications_per_user': 50},
+}
+
+SECRETARY_SHARE = 0.3  # the rest of the generated users are accountants
+ACCOUNTANTS_PER_ENTITY = 2
+CHUNK_SIZE = 5000
+
+MONTHS = ['April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December', 'January', 'February', 'March']
+PERIODIC_TYPES = ['GSTR-1', 'GSTR-3B', 'TDS Return', 'Bank Statement', 'Ledger']
+PERMANENT_TYPES = ['pan_card', 'gst_certificate', 'incorporation_cert', 'moa_aoa']
+COMPANY_TYPES = ['Private Limited', 'Public Limited', 'LLP', 'Partnership', 'Proprietorship']
+AUDIT_ACTIONS = [
+    ('login', 20), ('logout', 15), ('view_document', 30), ('download_document', 15),
+    ('upload_document', 10), ('create_entity', 3), ('approve_entity', 2), ('assign_accountant', 2),
+]
+FILE_SIZES = [16_000, 48_000, 120_000, 300_000, 750_000, 2_000_000]
+
+def financial_years(today=None, count=2):
+    """Labels of the current and previous financial years, e.g. ['2024-2025', '2023-2024']"""
+    today = today or datetime.utcnow()
+    start = today.year if today.month >= 4 else today.year - 1
+    return [f'{start - i}-{start - i + 1}' for i in range(count)]
+
+def _tax_ids(i):
+    """Unique, validly formatted PAN and GSTIN for entity number i"""
+    letters = ''
+    n = i // 10000
+    for _ in range(3):
+        letters = chr(ord('A') + n % 26) + letters
+        n //= 26
+    pan = f'AA{letters}{i % 10000:04d}E'
+    return pan, f'27{pan}1Z5'
+
+def user_emails(users):
+    """Logins generate() creates for a user count, by role"""
+    secretaries = max(1, int(users * SECRETARY_SHARE))
+    accountants = max(1, users - secretaries)
+    return {
+        'company_secretary': [f'secretary{i}@seed.gmfinance.test' for i in range(secretaries)],
+        'accountant': [f'accountant{i}@seed.gmfinance.test' for i in range(accountants)],
+    }
+
+def _insert(db, model, rows):
+    """Bulk insert an iterable of row dicts in chunks, committing each chunk"""
+    chunk = []
+    total = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            db.session.bulk_insert_mappings(model, chunk)
+            db.session.commit()
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.bulk_insert_mappings(model, chunk)
+        db.session.commit()
+        total += len(chunk)
+    return total
+
+def write_file_pool(upload_folder, rng):
+    """Write the shared document files once and return [(path, size)]"""
+    folder = os.path.join(upload_folder, 'seed')
+    os.makedirs(folder, exist_ok=True)
+    pool = []
+    for size in FILE_SIZES:
+        path = os.path.join(folder, f'sample_{size}.pdf')
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            with open(path, 'wb') as f:
+                f.write(b'%PDF-1.4\n' + rng.randbytes(size - 9))
+        pool.append((path, size))
+    return pool
+
+def generate(db, upload_folder, users=20, entities=50, documents_per_entity=12, permanent_per_entity=2,
+             audit_logs=2000, notifications_per_user=5, seed=42):
+    """Seed the database; returns row counts and a sample login per role.
+
+    Expects an initialized schema with the default super admin (app startup
+    creates both). Run inside an app context.
+    """
+    from database import (User, Entity, EntityAssignment, PermanentDocument, PeriodicDocument,
+                          DocumentSlot, Notification, AuditLog)
+    from passwords import hash_password
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    admin = User.query.filter_by(email='admin@gmfinance.com').first()
+    files = write_file_pool(upload_folder, rng)
+    counts = {}
+
+    # Users - one hash shared by all, hashing is deliberately slow
+    password_hash = hash_password(SEED_PASSWORD)
+    emails = user_emails(users)
+    counts['users'] = _insert(db, User, ({
+        'email': email,
+        'password_hash': password_hash,
+        'role': role,
+        'is_active': True,
+        'created_at': now - timedelta(days=rng.randint(30, 720))
+    } for role in ('company_secretary', 'accountant') for email in emails[role]))
+    secretary_ids = [u.id for u in db.session.query(User.id).filter(User.role == 'company_secretary').order_by(User.id)]
+    accountant_ids = [u.id for u in db.session.query(User.id).filter(User.role == 'accountant').order_by(User.id)]
+
+    # Entities, spread round-robin over the secretaries
+    def entity_rows():
+        for i in range(entities):
+            pan, gstin = _tax_ids(i)
+            company_type = rng.choice(COMPANY_TYPES)
+            created = now - timedelta(days=rng.randint(1, 720))
+            yield {
+                'company_name': f'Seed Client {i} {company_type}',
+                'pan': pan,
+                'gstin': gstin,
+                'company_type': company_type,
+                'address': f'{rng.randint(1, 999)} Market Road, Mumbai',
+                'contact': f'9{rng.randint(100000000, 999999999)}',
+                'owner': f'Owner {i}',
+                'status': 'active' if rng.random() < 0.9 else 'pending_approval',
+                'secretary_id': secretary_ids[i % len(secretary_ids)],
+                'created_at': created,
+                'approved_at': created + timedelta(days=1),
+                'approved_by': admin.id
+            }
+    counts['entities'] = _insert(db, Entity, entity_rows())
+    owners = db.session.query(Entity.id, Entity.secretary_id).order_by(Entity.id).all()
+    entity_ids = [e.id for e in owners]
+    owner_of = {e.id: e.secretary_id for e in owners}
+
+    # Assignments, so every accountant has a realistic slice of the entities
+    assigned = {}
+    def assignment_rows():
+        per_entity = min(ACCOUNTANTS_PER_ENTITY, len(accountant_ids))
+        for entity_id in entity_ids:
+            chosen = rng.sample(accountant_ids, per_entity)
+            assigned[entity_id] = chosen
+            for accountant_id in chosen:
+                yield {
+                    'entity_id': entity_id,
+                    'accountant_id': accountant_id,
+                    'assigned_by': admin.id,
+                    'access_type': 'all'
+                }
+    counts['assignments'] = _insert(db, EntityAssignment, assignment_rows())
+
+    def permanent_rows():
+        for entity_id in entity_ids:
+            for doc_type in PERMANENT_TYPES[:permanent_per_entity]:
+                path, size = rng.choice(files)
+                yield {
+                    'entity_id': entity_id,
+                    'document_type': doc_type,
+                    'file_path': path,
+                    'file_name': f'{doc_type}_{entity_id}.pdf',
+                    'file_size': size,
+                    'uploaded_at': now - timedelta(days=rng.randint(1, 720)),
+                    'uploaded_by': owner_of[entity_id]
+                }
+    counts['permanent_documents'] = _insert(db, PermanentDocument, permanent_rows())
+
+    # Periodic documents: one version per slot, drawn from this and last FY
+    years = financial_years(now)
+    periods = ([('monthly', m) for m in MONTHS] + [('quarterly', f'Q{q}') for q in range(1, 5)])
+    candidates = [(fy, period, value, doc_type) for fy in years for period, value in periods
+                  for doc_type in PERIODIC_TYPES] + [(fy, 'yearly', f'FY{fy}', 'Annual Return') for fy in years]
+    per_entity = min(documents_per_entity, len(candidates))
+    picks = {entity_id: rng.sample(candidates, per_entity) for entity_id in entity_ids}
+
+    _insert(db, DocumentSlot, ({
+        'entity_id': entity_id,
+        'financial_year': fy,
+        'period': period,
+        'period_value': value,
+        'document_type': doc_type,
+        'current_version': 1
+    } for entity_id, keys in picks.items() for fy, period, value, doc_type in keys))
+    slot_ids = {
+        (s.entity_id, s.financial_year, s.period, s.period_value, s.document_type): s.id
+        for s in db.session.query(DocumentSlot.id, DocumentSlot.entity_id, DocumentSlot.financial_year,
+                                  DocumentSlot.period, DocumentSlot.period_value, DocumentSlot.document_type)
+    }
+
+    def periodic_rows():
+        for entity_id, keys in picks.items():
+            uploaders = [owner_of[entity_id]] + assigned.get(entity_id, [])
+            for fy, period, value, doc_type in keys:
+                path, size = rng.choice(files)
+                yield {
+                    'entity_id': entity_id,
+                    'slot_id': slot_ids[(entity_id, fy, period, value, doc_type)],
+                    'financial_year': fy,
+                    'period': period,
+                    'period_value': value,
+                    'document_type': doc_type,
+                    'file_path': path,
+                    'file_name': f"{now.strftime('%Y%m%d%H%M%S')}_v1_{doc_type.replace(' ', '_')}_{value}.pdf",
+                    'file_size': size,
+                    'version': 1,
+                    'storage': 'full',
+                    'uploaded_by': rng.choice(uploaders),
+                    'uploaded_at': now - timedelta(minutes=rng.randint(1, 525600))
+                }
+    counts['periodic_documents'] = _insert(db, PeriodicDocument, periodic_rows())
+
+    all_user_ids = secretary_ids + accountant_ids
+    counts['notifications'] = _insert(db, Notification, ({
+        'user_id': user_id,
+        'title': 'Document uploaded',
+        'message': f'A new document was uploaded for Seed Client {rng.randrange(max(entities, 1))}',
+        'type': rng.choice(['upload', 'approval', 'missing', 'deadline']),
+        'is_read': rng.random() < 0.5,
+        'created_at': now - timedelta(minutes=rng.randint(1, 43200))
+    } for user_id in all_user_ids for _ in range(notifications_per_user)))
+
+    actions = [a for a, _ in AUDIT_ACTIONS]
+    weights = [w for _, w in AUDIT_ACTIONS]
+    counts['audit_logs'] = _insert(db, AuditLog, ({
+        'user_id': rng.choice(all_user_ids),
+        'action': action,
+        'resource_type': 'user' if action in ('login', 'logout') else 'document',
+        'resource_id': rng.randint(1, max(counts['periodic_documents'], 1)),
+        'ip_address': f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        'details': f'{action.replace("_", " ").capitalize()} #{i}',
+        'created_at': now - timedelta(seconds=rng.randint(0, 90 * 86400))
+    } for i, action in enumerate(rng.choices(actions, weights, k=audit_logs))))
+
+    return {
+        'counts': counts,
+        'users': {
+            'super_admin': 'admin@gmfinance.com',
+            'company_secretary': emails['company_secretary'][0],
+            'accountant': emails['accountant'][0],
+        },
+        'password': SEED_PASSWORD
+    }
+
+def scale_options(parser):
+    """Add --scale and the per-table count overrides to an argument parser"""
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Preset row counts')
+    for name in SCALES['small']:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, help=f'Override the preset {name}')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same rows')
+
+def scale_from_args(args):
+    """Row counts for generate() from parsed scale_options() arguments"""
+    scale = dict(SCALES[args.scale])
+    for name in scale:
+        if getattr(args, name) is not None:
+            scale[name] = getattr(args, name)
+    return scale
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a database with synthetic data')
+    parser.add_argument('--database', required=True, help='SQLite file to create (must not exist yet)')
+    scale_options(parser)
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.database)
+    if os.path.exists(path):
+        parser.error(f'{path} already exists - seeding expects a fresh database')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+    from app import app
+    from database import db
+
+    scale = scale_from_args(args)
+    start = time.perf_counter()
+    with app.app_context():
+        result = generate(db, app.config['UPLOAD_FOLDER'], seed=args.seed, **scale)
+    elapsed = time.perf_counter() - start
+
+    for table, count in result['counts'].items():
+        print(f'{table:<20} {count:>9}')
+    print(f'Seeded {path} in {elapsed:.1f}s; generated users log in with password {SEED_PASSWORD!r}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Response serialization.
+
+Routes describe each response object once here as a Serializer (a list of
+fields) instead of building dict literals inline. Datetimes and dates are left
+as-is and encoded by the app's JSON provider, which uses orjson when it is
+installed and falls back to the standard library encoder otherwise. Both
+encoders emit ISO 8601 so responses are the same either way.
+"""
+from flask.json.provider import DefaultJSONProvider
+from datetime import date, datetime
+from operator import attrgetter
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class Serializer:
+    """Turns a model instance or a selected row into a response dict.
+
+    Fields are attribute names, or (name, getter) pairs for computed values.
+    """
+
+    def __init__(self, *fields):
+        self.fields = [
+            (f, attrgetter(f)) if isinstance(f, str) else f
+            for f in fields
+        ]
+
+    def extend(self, *fields):
+        """A new serializer with extra fields appended"""
+        return Serializer(*self.fields, *fields)
+
+    def dump(self, obj, **extra):
+        data = {name: getter(obj) for name, getter in self.fields}
+        if extra:
+            data.update(extra)
+        return data
+
+    def dump_many(self, objs):
+        fields = self.fields
+        return [{name: getter(obj) for name, getter in fields} for obj in objs]
+
+def _email_or(attr, default=None):
+    """Getter for a related user's email that tolerates a missing user"""
+    def getter(obj):
+        user = getattr(obj, attr)
+        return user.email if user else default
+    return getter
+
+USER = Serializer('id', 'email', 'role', 'pan', 'gstin')
+USER_PROFILE = Serializer('id', 'email', 'role', 'pan', 'gstin', 'is_active', 'last_login')
+
+ENTITY_SUMMARY = Serializer('id', 'company_name', 'status')
+ENTITY_CREATED = Serializer('id', 'company_name', 'pan', 'gstin', 'status')
+ENTITY = Serializer('id', 'company_name', 'pan', 'gstin', 'company_type', 'address', 'status',
+                    'created_at', 'approved_at')
+ASSIGNED_ENTITY = Serializer('id', 'company_name', 'pan', 'gstin', 'status')
+ENTITY_DETAIL = Serializer('id', 'company_name', 'address', 'contact', 'cin', 'owner',
+                           'incorporation_date', 'fy_start', 'fy_end', 'status')
+
+# Rows selected with secretary_email, document_count and documents_size labels
+PENDING_ENTITY = Serializer(
+    'id', 'company_name', 'pan', 'gstin', 'company_type', 'status', 'secretary_email',
+    ('secretary', lambda e: {'email': e.secretary_email, 'id': e.secretary_id}),
+    'document_count', 'documents_size', 'created_at'
+)
+
+# Rows selected from an assignment joined to its accountant
+ENTITY_ACCOUNTANT = Serializer('id', 'email', 'is_active', 'assigned_at', 'access_type')
+
+UPLOADED_DOCUMENT = Serializer('id', 'file_name', 'document_type', 'uploaded_at')
+UPLOADED_PERIODIC_DOCUMENT = Serializer('id', 'file_name', 'document_type', 'version', 'uploaded_at')
+
+PERMANENT_DOCUMENT = Serializer('id', 'document_type', 'file_name', 'file_size', 'uploaded_at')
+ENTITY_PERMANENT_DOCUMENT = Serializer('id', 'document_type', 'file_name', 'file_size', 'uploaded_at',
+                                       ('uploaded_by', _email_or('uploader')))
+ADMIN_PERMANENT_DOCUMENT = Serializer(
+    'id', 'entity_id',
+    ('entity_name', lambda d: d.entity.company_name if d.entity else None),
+    ('secretary_name', lambda d: d.entity.secretary.email if d.entity and d.entity.secretary else None),
+    'document_type', 'file_name', 'file_size', 'uploaded_at',
+    ('uploaded_by_email', _email_or('uploader'))
+)
+
+# Rows selected with an uploaded_by_email label
+DOCUMENT_VERSION = Serializer('id', 'version', 'file_name', 'file_size', 'uploaded_at', 'uploaded_by_email')
+
+# Rows selected with a user_email label
+AUDIT_LOG = Serializer(
+    'id',
+    ('user', lambda log: {'id': log.user_id, 'email': log.user_email or 'Unknown'}),
+    'action', 'resource_type', 'resource_id', 'ip_address', 'user_agent', 'details', 'created_at'
+)
+MY_AUDIT_LOG = Serializer('id', 'action', 'resource_type', 'resource_id', 'ip_address', 'details', 'created_at')
+
+NOTIFICATION = Serializer('id', 'title', 'message', 'type', 'is_read', 'created_at', 'related_entity_id')
+
+# Change feeds carry the owning ids and the row version/timestamp of each row
+SYNC_ENTITY = ENTITY.extend('secretary_id', 'row_version', 'updated_at')
+SYNC_ASSIGNMENT = Serializer('id', 'entity_id', 'accountant_id', 'access_type', 'assigned_at', 'row_version', 'updated_at')
+SYNC_PERMANENT_DOCUMENT = PERMANENT_DOCUMENT.extend('entity_id', 'uploaded_by', 'row_version', 'updated_at')
+SYNC_PERIODIC_DOCUMENT = PERMANENT_DOCUMENT.extend('entity_id', 'period', 'period_value', 'financial_year', 'version',
+                                                   'uploaded_by', 'row_version', 'updated_at')
+SYNC_USER = USER_PROFILE.extend('created_at', 'row_version', 'updated_at')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider with native datetime support, backed by orjson when available"""
+
+    # Keep the field order the serializers define instead of sorting keys
+    sort_keys = False
+    use_orjson = orjson is not None
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def _orjson_option(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if not self.use_orjson:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # orjson returns bytes, which the response takes without re-encoding
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_option(indent))
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,56 @@
+"""Streaming JSON list responses.
+
+Large list endpoints accept ?stream=json or ?stream=ndjson. Rows are read
+from the database in batches (yield_per) and encoded as they arrive instead
+of building the whole list in memory first:
+
+- stream=json keeps the normal response shape, e.g. {"vault": [...]}
+- stream=ndjson sends one JSON object per line (application/x-ndjson)
+"""
+from flask import request, current_app, stream_with_context
+
+STREAM_FORMATS = ('json', 'ndjson')
+
+def stream_format():
+    """Requested stream format, or None for a normal in-memory response.
+
+    Raises ValueError for an unknown format.
+    """
+    fmt = request.args.get('stream', '').strip().lower()
+    if not fmt:
+        return None
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Unknown stream format: {fmt}. Use one of: {', '.join(STREAM_FORMATS)}")
+    return fmt
+
+def batched_rows(query):
+    """Iterate a query's rows, fetching STREAM_BATCH_SIZE rows at a time from the cursor"""
+    return query.yield_per(current_app.config.get('STREAM_BATCH_SIZE', 500))
+
+def stream_response(key, rows, fmt, to_dict=None):
+    """Stream rows as {key: [...]} or NDJSON, encoding a batch of rows per chunk"""
+    dumps = current_app.json.dumps
+    batch_size = current_app.config.get('STREAM_BATCH_SIZE', 500)
+    separator = ',' if fmt == 'json' else '\n'
+
+    def generate():
+        if fmt == 'json':
+            yield '{' + dumps(key) + ':['
+        batch = []
+        first = True
+        for row in rows:
+            batch.append(dumps(to_dict(row) if to_dict else row))
+            if len(batch) >= batch_size:
+                yield ('' if first else separator) + separator.join(batch)
+                first = False
+                batch = []
+        if batch:
+            yield ('' if first else separator) + separator.join(batch)
+            first = False
+        if fmt == 'json':
+            yield ']}'
+        elif not first:
+            yield '\n'
+
+    mimetype = 'application/json' if fmt == 'json' else 'application/x-ndjson'
+    return current_app.response_class(stream_with_context(generate()), mimetype=mimetype)
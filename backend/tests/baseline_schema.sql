@@ -0,0 +1,117 @@
+-- Schema created by db.create_all() before the migrations in app.py existed
+
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    role VARCHAR(50) NOT NULL,
+    pan VARCHAR(10),
+    gstin VARCHAR(15),
+    is_active BOOLEAN,
+    created_at DATETIME,
+    last_login DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (email),
+    UNIQUE (pan),
+    UNIQUE (gstin)
+);
+
+CREATE TABLE entities (
+    id INTEGER NOT NULL,
+    company_name VARCHAR(255) NOT NULL,
+    pan VARCHAR(10) NOT NULL,
+    gstin VARCHAR(15) NOT NULL,
+    company_type VARCHAR(100) NOT NULL,
+    address TEXT NOT NULL,
+    contact VARCHAR(20),
+    cin VARCHAR(21),
+    incorporation_date DATE,
+    fy_start DATE,
+    fy_end DATE,
+    owner VARCHAR(255),
+    status VARCHAR(50),
+    secretary_id INTEGER NOT NULL,
+    admin_remarks TEXT,
+    created_at DATETIME,
+    approved_at DATETIME,
+    approved_by INTEGER,
+    PRIMARY KEY (id),
+    UNIQUE (pan),
+    UNIQUE (gstin),
+    FOREIGN KEY(secretary_id) REFERENCES users (id),
+    FOREIGN KEY(approved_by) REFERENCES users (id)
+);
+
+CREATE TABLE audit_logs (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    action VARCHAR(100) NOT NULL,
+    resource_type VARCHAR(50),
+    resource_id INTEGER,
+    ip_address VARCHAR(45),
+    user_agent VARCHAR(255),
+    details TEXT,
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
+);
+
+CREATE TABLE permanent_documents (
+    id INTEGER NOT NULL,
+    entity_id INTEGER NOT NULL,
+    document_type VARCHAR(100) NOT NULL,
+    file_path VARCHAR(500) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    file_size INTEGER NOT NULL,
+    uploaded_at DATETIME,
+    uploaded_by INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(entity_id) REFERENCES entities (id),
+    FOREIGN KEY(uploaded_by) REFERENCES users (id)
+);
+
+CREATE TABLE periodic_documents (
+    id INTEGER NOT NULL,
+    entity_id INTEGER NOT NULL,
+    financial_year VARCHAR(10) NOT NULL,
+    period VARCHAR(50) NOT NULL,
+    period_value VARCHAR(50) NOT NULL,
+    document_type VARCHAR(100) NOT NULL,
+    file_path VARCHAR(500) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    file_size INTEGER NOT NULL,
+    version INTEGER,
+    uploaded_at DATETIME,
+    uploaded_by INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(entity_id) REFERENCES entities (id),
+    FOREIGN KEY(uploaded_by) REFERENCES users (id)
+);
+
+CREATE TABLE entity_assignments (
+    id INTEGER NOT NULL,
+    entity_id INTEGER NOT NULL,
+    accountant_id INTEGER NOT NULL,
+    assigned_at DATETIME,
+    assigned_by INTEGER NOT NULL,
+    access_type VARCHAR(50),
+    PRIMARY KEY (id),
+    CONSTRAINT unique_assignment UNIQUE (entity_id, accountant_id),
+    FOREIGN KEY(entity_id) REFERENCES entities (id),
+    FOREIGN KEY(accountant_id) REFERENCES users (id),
+    FOREIGN KEY(assigned_by) REFERENCES users (id)
+);
+
+CREATE TABLE notifications (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    type VARCHAR(50) NOT NULL,
+    is_read BOOLEAN,
+    created_at DATETIME,
+    related_entity_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id),
+    FOREIGN KEY(related_entity_id) REFERENCES entities (id)
+);
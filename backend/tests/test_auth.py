@@ -0,0 +1,36 @@
+"""Login: the password hashing queue and the client address"""
+import routes.auth
+from passwords import PasswordHashBusy
+
+def busy(*args):
+    raise PasswordHashBusy('Too many logins at once, try again shortly')
+
+def test_login_skips_rehash_when_hashing_is_busy(app, client, seeded, monkeypatch):
+    from database import User
+    email = seeded['users']['accountant']
+    with app.app_context():
+        stored_hash = User.query.filter_by(email=email).first().password_hash
+    monkeypatch.setattr(routes.auth, 'needs_rehash', lambda stored: True)
+    monkeypatch.setattr(routes.auth, 'hash_password', busy)
+
+    response = client.post('/api/auth/login', json={'email': email, 'password': seeded['password']})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    with app.app_context():
+        assert User.query.filter_by(email=email).first().password_hash == stored_hash
+
+def test_login_busy_before_verifying_is_retryable(client, seeded, monkeypatch):
+    monkeypatch.setattr(routes.auth, 'verify_password', busy)
+    response = client.post('/api/auth/login', json={'email': seeded['users']['accountant'], 'password': seeded['password']})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+def test_client_address_comes_from_the_proxy(app, client, seeded):
+    from database import AuditLog, User
+    email = seeded['users']['accountant']
+    response = client.post('/api/auth/login', json={'email': email, 'password': seeded['password']},
+                           headers={'X-Forwarded-For': '203.0.113.9'}, environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert response.status_code == 200
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        log = AuditLog.query.filter_by(user_id=user.id, action='login').order_by(AuditLog.id.desc()).first()
+        assert log.ip_address == '203.0.113.9'
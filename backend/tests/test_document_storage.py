@@ -0,0 +1,109 @@
+"""Delta and cold-tier storage of periodic documents"""
+import pytest
+
+import document_storage
+from document_storage import CODECS, compress_document, read_document_bytes, store_as_delta
+
+def version_bytes(version):
+    return ''.join(f'ledger,row {i},{i * version if i == version else i}\n' for i in range(200)).encode()
+
+@pytest.fixture
+def slot_versions(app, seeded, tmp_path, monkeypatch):
+    """upload(version) stores one version of a CSV the way the upload route does and returns its row"""
+    from database import db, Entity, PeriodicDocument
+    monkeypatch.setitem(app.config, 'DOCUMENT_DELTA_STORAGE', True)
+    with app.app_context():
+        entity = Entity.query.first()
+        previous = []
+
+        def upload(version):
+            path = tmp_path / f'v{version}.csv'
+            path.write_bytes(version_bytes(version))
+            doc = PeriodicDocument(entity_id=entity.id, financial_year='2000-2001', period='monthly',
+                                   period_value='April', document_type='Delta test', file_path=str(path),
+                                   file_name='ledger.csv', file_size=path.stat().st_size, version=version,
+                                   uploaded_by=entity.secretary_id)
+            store_as_delta(doc, previous[-1] if previous else None)
+            db.session.add(doc)
+            db.session.commit()
+            previous.append(doc)
+            return doc
+
+        yield upload
+        for doc in previous:
+            db.session.delete(doc)
+        db.session.commit()
+
+def test_versions_round_trip_through_deltas(app, slot_versions, monkeypatch):
+    monkeypatch.setitem(app.config, 'DELTA_SNAPSHOT_INTERVAL', 5)
+    docs = [slot_versions(version) for version in range(1, 8)]
+    assert [doc.storage for doc in docs] == ['full', 'delta', 'delta', 'delta', 'delta', 'full', 'delta']
+    for version, doc in enumerate(docs, start=1):
+        assert read_document_bytes(doc) == version_bytes(version)
+
+def test_chain_is_capped_when_snapshots_are_off(app, slot_versions, monkeypatch):
+    # An interval longer than the chain cap: the cap forces the snapshot
+    monkeypatch.setitem(app.config, 'DELTA_SNAPSHOT_INTERVAL', 1000)
+    monkeypatch.setattr(document_storage, 'MAX_DELTA_CHAIN', 3)
+    docs = [slot_versions(version) for version in range(1, 10)]
+    assert [doc.storage for doc in docs] == ['full', 'delta', 'delta', 'delta', 'full', 'delta', 'delta', 'delta', 'full']
+    assert read_document_bytes(docs[-2]) == version_bytes(8)
+
+def test_over_long_chain_fails_cleanly(app, slot_versions, monkeypatch):
+    # A chain stored before the cap existed is refused with an error instead of recursing
+    monkeypatch.setitem(app.config, 'DELTA_SNAPSHOT_INTERVAL', 1000)
+    docs = [slot_versions(version) for version in range(1, 8)]
+    monkeypatch.setattr(document_storage, 'MAX_DELTA_CHAIN', 3)
+    with pytest.raises(ValueError, match='Delta chain'):
+        read_document_bytes(docs[-1])
+    assert read_document_bytes(docs[2]) == version_bytes(3)
+
+class SendfileWrapper:
+    """wsgi.file_wrapper that sends what is behind fileno(), as gunicorn's sendfile does"""
+
+    def __init__(self, filelike, block_size=8192):
+        self.filelike = filelike
+        self.block_size = block_size
+
+    def __iter__(self):
+        try:
+            fd = self.filelike.fileno()
+        except (AttributeError, OSError):
+            yield from iter(lambda: self.filelike.read(self.block_size), b'')
+        else:
+            with open(fd, 'rb', closefd=False) as f:
+                f.seek(0)
+                yield f.read()
+
+    def close(self):
+        self.filelike.close()
+
+@pytest.mark.parametrize('codec', sorted(CODECS))
+def test_cold_document_download_sends_decompressed_bytes(app, client, headers, tmp_path, codec):
+    from database import db, Entity, PeriodicDocument
+    content = version_bytes(3) * 50
+    path = tmp_path / 'trial-balance.csv'
+    path.write_bytes(content)
+    with app.app_context():
+        entity = Entity.query.first()
+        doc = PeriodicDocument(entity_id=entity.id, financial_year='2000-2001', period='monthly',
+                               period_value='May', document_type='Cold test', file_path=str(path),
+                               file_name='trial-balance.csv', file_size=len(content), version=1,
+                               uploaded_by=entity.secretary_id)
+        db.session.add(doc)
+        db.session.flush()
+        compress_document(doc, codec)
+        db.session.commit()
+        doc_id = doc.id
+
+    try:
+        response = client.get(f'/api/documents/periodic/{doc_id}/download', headers=headers['super_admin'],
+                              environ_overrides={'wsgi.file_wrapper': SendfileWrapper})
+        assert response.status_code == 200
+        assert response.get_data() == content
+        assert response.content_length == len(content)
+        assert response.headers['Content-Disposition'] == 'attachment; filename=trial-balance.csv'
+    finally:
+        with app.app_context():
+            db.session.delete(PeriodicDocument.query.get(doc_id))
+            db.session.commit()
@@ -0,0 +1,28 @@
+"""Row validation for bulk entity imports"""
+from datetime import date
+
+import pytest
+
+from entity_import import parse_date, validate_entity_row
+
+ROW = {'company_name': 'Acme', 'pan': 'AAAAA1111A', 'gstin': '29AAAAA1111A1Z5',
+       'company_type': 'pvt', 'address': 'x'}
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-04-01', date(2024, 4, 1)),
+    ('01/04/2024', date(2024, 4, 1)),
+    ('45383', date(2024, 4, 1)),
+    ('45383.0', date(2024, 4, 1)),
+])
+def test_parse_date(value, expected):
+    assert parse_date(value) == expected
+
+def test_out_of_range_serial_is_a_row_error():
+    entity, errors = validate_entity_row({**ROW, 'incorporation_date': '20240401'})
+    assert errors == ['Invalid incorporation_date date: 20240401']
+    assert entity['incorporation_date'] is None
+
+def test_valid_row_has_no_errors():
+    entity, errors = validate_entity_row({**ROW, 'fy_start': '2024-04-01'})
+    assert errors == []
+    assert entity['fy_start'] == date(2024, 4, 1)
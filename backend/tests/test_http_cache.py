@@ -0,0 +1,78 @@
+"""ETags from row versions: a revalidation answers 304 without running the view"""
+import pytest
+
+@pytest.fixture
+def assignment(app, seeded):
+    """The seeded accountant's first assignment: (accountant id, entity id)"""
+    from database import EntityAssignment, User
+    with app.app_context():
+        accountant = User.query.filter_by(email=seeded['users']['accountant']).first()
+        row = EntityAssignment.query.filter_by(accountant_id=accountant.id).order_by(EntityAssignment.id).first()
+        return accountant.id, row.entity_id
+
+def revalidate(client, path, headers, query_budget):
+    first = client.get(path, headers=headers)
+    assert first.status_code == 200, first.get_data(as_text=True)
+    etag = first.headers['ETag']
+    with query_budget(limit=1):
+        again = client.get(path, headers={**headers, 'If-None-Match': etag})
+    assert again.status_code == 304
+    return etag
+
+def test_entity_etag_follows_row_version(app, client, headers, assignment, query_budget):
+    from database import db, Entity
+    _, entity_id = assignment
+    path = f'/api/entities/{entity_id}'
+    client.get('/api/auth/me', headers=headers['accountant'])
+    etag = revalidate(client, path, headers['accountant'], query_budget)
+
+    with app.app_context():
+        entity = Entity.query.get(entity_id)
+        entity.address = entity.address + ' '
+        db.session.commit()
+    response = client.get(path, headers={**headers['accountant'], 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_entity_etag_follows_access(app, client, headers, assignment, query_budget):
+    from database import db, EntityAssignment
+    accountant_id, entity_id = assignment
+    path = f'/api/entities/{entity_id}'
+    client.get('/api/auth/me', headers=headers['accountant'])
+    etag = revalidate(client, path, headers['accountant'], query_budget)
+
+    with app.app_context():
+        row = EntityAssignment.query.filter_by(accountant_id=accountant_id, entity_id=entity_id).first()
+        saved = {c: getattr(row, c) for c in ('entity_id', 'accountant_id', 'assigned_by', 'access_type')}
+        db.session.delete(row)
+        db.session.commit()
+    try:
+        response = client.get(path, headers={**headers['accountant'], 'If-None-Match': etag})
+        assert response.status_code == 403
+    finally:
+        with app.app_context():
+            db.session.add(EntityAssignment(**saved))
+            db.session.commit()
+
+def test_entity_accountants_etag_follows_accountants(app, client, login, seeded, assignment, query_budget):
+    from database import db, Entity, User
+    accountant_id, entity_id = assignment
+    with app.app_context():
+        secretary = User.query.get(Entity.query.get(entity_id).secretary_id)
+        secretary_headers = login(secretary.email, seeded['password'])
+    path = f'/api/users/entity/{entity_id}/accountants'
+    client.get('/api/auth/me', headers=secretary_headers)
+    etag = revalidate(client, path, secretary_headers, query_budget)
+
+    def rename(suffix):
+        with app.app_context():
+            accountant = User.query.get(accountant_id)
+            accountant.email = accountant.email.removesuffix('.renamed') + suffix
+            db.session.commit()
+    rename('.renamed')
+    try:
+        response = client.get(path, headers={**secretary_headers, 'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+    finally:
+        rename('')
@@ -0,0 +1,38 @@
+"""Prometheus counters fed by request handling"""
+import itertools
+
+import pytest
+
+prometheus_client = pytest.importorskip('prometheus_client')
+
+_serial = itertools.count()
+
+def audit_writes(action):
+    return prometheus_client.REGISTRY.get_sample_value('audit_log_writes_total', {'action': action}) or 0
+
+@pytest.fixture
+def pending_entities(app, seeded):
+    from database import db, Entity, User
+    with app.app_context():
+        secretary = User.query.filter_by(email=seeded['users']['company_secretary']).first()
+        serials = [next(_serial) for _ in range(3)]
+        entities = [Entity(company_name=f'Metrics {i}', pan=f'MTRCS{i:04d}A', gstin=f'29MTRCS{i:04d}A1Z5',
+                           company_type='pvt', address='x', secretary_id=secretary.id, status='pending_approval')
+                    for i in serials]
+        db.session.add_all(entities)
+        db.session.commit()
+        return [entity.id for entity in entities]
+
+def test_bulk_review_counts_audit_writes(client, headers, pending_entities):
+    before = audit_writes('approve_entity')
+    response = client.post('/api/entities/bulk-approve', headers=headers['super_admin'],
+                           json={'entity_ids': pending_entities})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert audit_writes('approve_entity') - before == len(pending_entities)
+
+def test_single_review_counts_audit_write(client, headers, pending_entities):
+    before = audit_writes('reject_entity')
+    response = client.post(f'/api/entities/{pending_entities[0]}/reject', headers=headers['super_admin'],
+                           json={'remarks': 'Wrong GSTIN'})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert audit_writes('reject_entity') - before == 1
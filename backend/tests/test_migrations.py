@@ -0,0 +1,61 @@
+"""Startup migrations on a database created before they existed.
+
+app.py migrates the schema when it is imported, so each test boots the app in
+a fresh interpreter against its own database file.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_schema.sql')
+
+def baseline_database(path):
+    """A database with the original schema and a few versions of one periodic document"""
+    con = sqlite3.connect(path)
+    with open(BASELINE_SCHEMA) as f:
+        con.executescript(f.read())
+    con.execute("INSERT INTO users (id, email, password_hash, role, is_active, created_at) "
+                "VALUES (1, 'sec@example.com', 'x', 'company_secretary', 1, '2024-04-01 09:00:00')")
+    con.execute("INSERT INTO entities (id, company_name, pan, gstin, company_type, address, status, secretary_id, created_at) "
+                "VALUES (1, 'Acme', 'AAAAA1111A', '29AAAAA1111A1Z5', 'pvt', 'x', 'active', 1, '2024-04-01 09:00:00')")
+    for version in (1, 2, 3):
+        con.execute("INSERT INTO periodic_documents (entity_id, financial_year, period, period_value, document_type, "
+                    "file_path, file_name, file_size, version, uploaded_at, uploaded_by) "
+                    "VALUES (1, '2024-2025', 'monthly', 'April', 'GST Return', 'f', 'f.pdf', 10, ?, '2024-05-01 09:00:00', 1)",
+                    (version,))
+    con.commit()
+    con.close()
+
+def boot(path, tmp_path):
+    """Import app.py against the database at path, as a server start would"""
+    env = dict(os.environ,
+               DATABASE_URL=f'sqlite:///{path}',
+               UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+               PROFILE_DIR=str(tmp_path / 'profiles'),
+               LOG_LEVEL='WARNING',
+               PASSWORD_BCRYPT_ROUNDS='4')
+    result = subprocess.run([sys.executable, '-c', 'import app'], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return result.stderr
+
+def test_first_boot_migrates_baseline_database(tmp_path):
+    path = tmp_path / 'baseline.db'
+    baseline_database(path)
+    log = boot(path, tmp_path)
+    assert 'migration incomplete' not in log
+
+    con = sqlite3.connect(path)
+    indexes = {row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'ix_periodic_documents_slot_version' in indexes
+    assert con.execute('SELECT COUNT(*) FROM periodic_documents WHERE slot_id IS NULL OR row_version IS NULL').fetchone()[0] == 0
+    assert con.execute('SELECT current_version FROM document_slots').fetchall() == [(3,)]
+    assert con.execute("SELECT COUNT(*) FROM users WHERE email = 'admin@gmfinance.com'").fetchone()[0] == 1
+
+def test_second_boot_is_clean(tmp_path):
+    path = tmp_path / 'baseline.db'
+    baseline_database(path)
+    boot(path, tmp_path)
+    assert 'migration incomplete' not in boot(path, tmp_path)
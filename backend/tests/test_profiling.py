@@ -0,0 +1,94 @@
+"""On-demand request profiling: settings and profile export through the API"""
+import json
+import os
+
+import pytest
+
+STACKS = {
+    'wsgi_app (flask/app.py:1478);get_users (routes/users.py:51)': 1500,
+    'wsgi_app (flask/app.py:1478);get_users (routes/users.py:51);execute (sqlalchemy/engine/base.py:1412)': 2500,
+}
+
+@pytest.fixture
+def admin(headers):
+    return headers['super_admin']
+
+@pytest.fixture(autouse=True)
+def default_settings(client, admin):
+    """Settings persist between saves; put the defaults back so no test sees another's"""
+    yield
+    from profiling import DEFAULT_SETTINGS
+    changes = {k: v for k, v in DEFAULT_SETTINGS.items() if k != 'expires_at'}
+    assert client.put('/api/profiling/settings', headers=admin, json=changes).status_code == 200
+
+@pytest.fixture
+def stored_profile(app):
+    """A profile file as _save_profile writes it, with known stacks"""
+    profile = {
+        'id': '20240401090000000000-0badcafe', 'method': 'GET', 'path': '/api/users/',
+        'endpoint': 'users.get_users', 'request_id': None, 'mode': 'wall', 'interval_ms': 5,
+        'started_at': '2024-04-01T09:00:00', 'wall_ms': 4.0, 'samples': 2, 'stacks': STACKS
+    }
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+    path = os.path.join(app.config['PROFILE_DIR'], f"{profile['id']}.json")
+    with open(path, 'w') as f:
+        json.dump(profile, f)
+    yield profile
+    if os.path.exists(path):
+        os.remove(path)
+
+def test_settings_round_trip(client, admin):
+    response = client.put('/api/profiling/settings', headers=admin, json={
+        'enabled': True, 'route': 'users.get_users', 'sample_rate': 0.5, 'mode': 'wall', 'interval_ms': 2, 'duration_s': 60
+    })
+    assert response.status_code == 200, response.get_data(as_text=True)
+    settings = client.get('/api/profiling/settings', headers=admin).get_json()['settings']
+    assert settings['enabled'] is True
+    assert settings['route'] == 'users.get_users'
+    assert settings['sample_rate'] == 0.5
+    assert settings['interval_ms'] == 2
+    assert settings['expires_at']
+
+    client.put('/api/profiling/settings', headers=admin, json={'enabled': False})
+    assert client.get('/api/profiling/settings', headers=admin).get_json()['settings']['enabled'] is False
+
+@pytest.mark.parametrize('changes', [{'mode': 'gpu'}, {'sample_rate': 0}, {'interval_ms': 5000}])
+def test_invalid_settings_rejected(client, admin, changes):
+    assert client.put('/api/profiling/settings', headers=admin, json=changes).status_code == 400
+
+def test_selected_route_is_profiled(client, admin, app):
+    client.put('/api/profiling/settings', headers=admin, json={'enabled': True, 'route': 'users.get_users', 'interval_ms': 1})
+    before = set(p['id'] for p in client.get('/api/profiling/profiles', headers=admin).get_json()['profiles'])
+    assert client.get('/api/users/', headers=admin).status_code == 200
+    profiles = client.get('/api/profiling/profiles', headers=admin).get_json()['profiles']
+    new = [p for p in profiles if p['id'] not in before]
+    assert [p['endpoint'] for p in new] == ['users.get_users']
+    assert 'stacks' not in new[0]
+
+def test_collapsed_export(client, admin, stored_profile):
+    response = client.get(f"/api/profiling/profiles/{stored_profile['id']}?format=collapsed", headers=admin)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'users.get_users' in response.headers['Content-Disposition']
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines == sorted(f'{stack} {weight}' for stack, weight in STACKS.items())
+
+def test_speedscope_export(client, admin, stored_profile):
+    response = client.get(f"/api/profiling/profiles/{stored_profile['id']}?format=speedscope", headers=admin)
+    assert response.status_code == 200
+    document = response.get_json()
+    frames = document['shared']['frames']
+    profile = document['profiles'][0]
+    assert [frame['name'] for frame in frames] == ['wsgi_app', 'get_users', 'execute']
+    assert frames[2] == {'name': 'execute', 'file': 'sqlalchemy/engine/base.py', 'line': 1412}
+    assert sorted(profile['weights']) == [1500, 2500]
+    assert profile['endValue'] == 4000
+    assert sorted(len(sample) for sample in profile['samples']) == [2, 3]
+
+def test_unknown_profile_and_format(client, admin, stored_profile):
+    assert client.get('/api/profiling/profiles/../settings', headers=admin).status_code == 404
+    assert client.get('/api/profiling/profiles/nope', headers=admin).status_code == 404
+    assert client.get(f"/api/profiling/profiles/{stored_profile['id']}?format=svg", headers=admin).status_code == 400
+
+def test_profiling_requires_super_admin(client, headers):
+    assert client.get('/api/profiling/settings', headers=headers['accountant']).status_code == 403
@@ -0,0 +1,22 @@
+"""Query budgets of list endpoints, measured against seeded data so a query per row fails"""
+import pytest
+
+@pytest.mark.parametrize('role, path', [
+    ('company_secretary', '/api/documents/vault'),
+    ('accountant', '/api/documents/vault'),
+    ('super_admin', '/api/audit/logs'),
+    ('super_admin', '/api/users/'),
+    ('super_admin', '/api/entities/pending'),
+])
+def test_endpoint_within_query_budget(client, headers, query_budget, role, path):
+    # The first authenticated request loads this worker's revocation filter and ACL versions
+    client.get('/api/auth/me', headers=headers[role])
+    with query_budget() as recorded:
+        response = client.get(path, headers=headers[role])
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert len(recorded) == 1
+
+def test_query_budget_fails_requests_over_budget(client, headers, query_budget):
+    with pytest.raises(AssertionError, match='Query budget exceeded'):
+        with query_budget(limit=0):
+            client.get('/api/users/', headers=headers['super_admin'])
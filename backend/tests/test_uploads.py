@@ -0,0 +1,72 @@
+"""Periodic document uploads: versioning, delta storage and clean-up on failure"""
+import io
+import os
+
+import pytest
+
+import routes.documents
+
+ROWS = ''.join(f'ledger,row {i},{i}\n' for i in range(300))
+
+@pytest.fixture
+def upload(app, client, headers, seeded, monkeypatch):
+    """upload(content, document_type) posts a CSV to an entity the seeded accountant is assigned to"""
+    from database import EntityAssignment, User
+    monkeypatch.setitem(app.config, 'DOCUMENT_DELTA_STORAGE', True)
+    with app.app_context():
+        accountant = User.query.filter_by(email=seeded['users']['accountant']).first()
+        entity_id = EntityAssignment.query.filter_by(accountant_id=accountant.id).first().entity_id
+
+    def upload(content, document_type):
+        return client.post('/api/documents/upload', headers=headers['accountant'],
+                           content_type='multipart/form-data', data={
+                               'file': (io.BytesIO(content.encode()), 'ledger.csv'),
+                               'entity_id': str(entity_id), 'period': 'monthly', 'period_value': 'June',
+                               'document_type': document_type, 'financial_year': '2001-02'})
+    upload.folder = os.path.join(app.config['UPLOAD_FOLDER'], f'entity_{entity_id}', 'periodic')
+    return upload
+
+def leftover_uploads(folder):
+    return [name for name in os.listdir(folder) if name.startswith('.upload_')]
+
+def test_reupload_is_versioned_and_stored_as_delta(app, client, headers, upload):
+    first = upload(ROWS, 'Upload delta test')
+    second = upload(ROWS.replace('row 7,7', 'row 7,70'), 'Upload delta test')
+    assert first.status_code == 201, first.get_data(as_text=True)
+    assert second.status_code == 201, second.get_data(as_text=True)
+
+    from database import PeriodicDocument
+    with app.app_context():
+        doc = PeriodicDocument.query.get(second.get_json()['document']['id'])
+        assert doc.version == 2
+        assert doc.storage == 'delta'
+        assert '_v2_ledger.csv' in doc.file_name
+        assert doc.file_path.endswith(doc.file_name + '.delta')
+        doc_id = doc.id
+
+    response = client.get(f'/api/documents/periodic/{doc_id}/download', headers=headers['accountant'])
+    assert response.get_data(as_text=True) == ROWS.replace('row 7,7', 'row 7,70')
+    assert leftover_uploads(upload.folder) == []
+
+def test_failed_upload_leaves_no_file(app, upload, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('database is locked')
+    monkeypatch.setattr(routes.documents, 'reserve_document_version', fail)
+    before = set(os.listdir(upload.folder)) if os.path.isdir(upload.folder) else set()
+
+    response = upload(ROWS, 'Upload failure test')
+    assert response.status_code == 500
+    assert set(os.listdir(upload.folder)) == before
+
+def test_version_reserved_after_file_is_stored(upload, monkeypatch):
+    # The reservation takes the database write lock until the commit; saving and delta encoding happen first
+    reserve = routes.documents.reserve_document_version
+    on_disk = []
+    def reserve_and_look(*args):
+        on_disk.append(leftover_uploads(upload.folder))
+        return reserve(*args)
+    monkeypatch.setattr(routes.documents, 'reserve_document_version', reserve_and_look)
+
+    assert upload(ROWS, 'Upload order test').status_code == 201
+    assert upload(ROWS + 'ledger,row 300,300\n', 'Upload order test').status_code == 201
+    assert [[name.rsplit('.', 1)[-1] for name in names] for names in on_disk] == [['csv'], ['delta']]
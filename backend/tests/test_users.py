@@ -0,0 +1,41 @@
+"""User creation while the password hashing queue is full"""
+import pytest
+
+import routes.users
+from passwords import PasswordHashBusy
+
+@pytest.fixture
+def hashing_busy(monkeypatch):
+    def busy(password):
+        raise PasswordHashBusy('Too many logins at once, try again shortly')
+    monkeypatch.setattr(routes.users, 'hash_password', busy)
+
+@pytest.fixture
+def secretary_entity(app, seeded):
+    from database import Entity, User
+    with app.app_context():
+        secretary = User.query.filter_by(email=seeded['users']['company_secretary']).first()
+        entity = Entity.query.filter_by(secretary_id=secretary.id, status='active').first()
+        assert entity is not None
+        return entity.id
+
+def test_create_user_busy_is_retryable(app, client, headers, hashing_busy):
+    response = client.post('/api/users/create', headers=headers['super_admin'],
+                           json={'email': 'busy.user@example.com', 'password': 'password123', 'role': 'accountant'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    from database import User
+    with app.app_context():
+        assert User.query.filter_by(email='busy.user@example.com').first() is None
+
+def test_create_accountant_busy_is_retryable(app, client, headers, secretary_entity, hashing_busy):
+    response = client.post('/api/users/create-accountant', headers=headers['company_secretary'],
+                           json={'name': 'Busy', 'email': 'busy.accountant@example.com',
+                                 'password': 'password123', 'entity_id': secretary_entity})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    from database import User
+    with app.app_context():
+        assert User.query.filter_by(email='busy.accountant@example.com').first() is None
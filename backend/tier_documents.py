@@ -0,0 +1,33 @@
+"""Move cold documents to compressed storage.
+
+Compresses documents uploaded more than COLD_STORAGE_AGE_DAYS ago or belonging
+to a closed financial year. Safe to run repeatedly (e.g. nightly from cron or
+Task Scheduler); already compressed documents are skipped.
+
+Usage: python tier_documents.py [--age-days 180] [--codec gzip] [--dry-run]
+"""
+import argparse
+
+from app import app
+from document_storage import tier_cold_documents, CODECS
+
+def main():
+    parser = argparse.ArgumentParser(description='Compress cold documents in the upload folder')
+    parser.add_argument('--age-days', type=int, default=None, help='Compress documents older than this (default: COLD_STORAGE_AGE_DAYS)')
+    parser.add_argument('--codec', choices=sorted(CODECS), default=None, help='Compression codec (default: COLD_STORAGE_CODEC)')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be compressed')
+    args = parser.parse_args()
+
+    with app.app_context():
+        stats = tier_cold_documents(age_days=args.age_days, codec=args.codec, dry_run=args.dry_run)
+
+    if args.dry_run:
+        print(f"[DRY RUN] {stats['documents']} documents ({stats['raw_bytes'] / 1024:.1f} KB) would be compressed")
+    else:
+        saved = stats['raw_bytes'] - stats['stored_bytes']
+        print(f"[OK] Compressed {stats['documents']} documents: "
+              f"{stats['raw_bytes'] / 1024:.1f} KB -> {stats['stored_bytes'] / 1024:.1f} KB "
+              f"({saved / 1024:.1f} KB saved)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+app.py's __main__ block starts the single-process Werkzeug development
+server; production servers import the application object from here instead.
+"""
+from app import app  # noqa: F401
@@ -1,5 +1,6 @@
 import { createContext, useContext, useState, useEffect, ReactNode } from 'react'
 import api from '../utils/api'
+import { clearSyncCache } from '../utils/syncCache'
 
 interface User {
   id: number
@@ -50,6 +51,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
         setUser(JSON.parse(storedUser))
       } catch (error) {
         localStorage.removeItem('token')
+        localStorage.removeItem('refresh_token')
         localStorage.removeItem('user')
       }
     }
@@ -63,9 +65,10 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
       throw new Error(response.error)
     }
 
-    const data = response.data as { token: string; user: any }
-    const { token, user: userData } = data
+    const data = response.data as { token: string; refresh_token: string; user: any }
+    const { token, refresh_token, user: userData } = data
     localStorage.setItem('token', token)
+    localStorage.setItem('refresh_token', refresh_token)
     localStorage.setItem('user', JSON.stringify(userData))
     setUser(userData)
   }
@@ -82,15 +85,20 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
       throw new Error(response.error)
     }
 
-    const signupData = response.data as { token: string; user: any }
-    const { token, user: userData } = signupData
+    const signupData = response.data as { token: string; refresh_token: string; user: any }
+    const { token, refresh_token, user: userData } = signupData
     localStorage.setItem('token', token)
+    localStorage.setItem('refresh_token', refresh_token)
     localStorage.setItem('user', JSON.stringify(userData))
     setUser(userData)
   }
 
   const logout = () => {
+    // Revoke the session server-side so its refresh token stops working; the token is read before it is cleared below
+    api.post('/auth/logout')
+    clearSyncCache()
     localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
     localStorage.removeItem('user')
     setUser(null)
   }
@@ -4,7 +4,7 @@ import Head from 'next/head'
 import Link from 'next/link'
 import Header from '../../components/Header'
 import { useAuth } from '../../contexts/AuthContext'
-import api from '../../utils/api'
+import { syncLists } from '../../utils/syncCache'
 import styles from '../../styles/AccountantDashboard.module.css'
 
 export default function AccountantDashboard() {
@@ -35,16 +35,10 @@ export default function AccountantDashboard() {
 
   const fetchData = async () => {
     try {
-      const [entitiesRes, notificationsRes] = await Promise.all([
-        api.get('/entities/my-entities'),
-        api.get('/notifications?unread_only=true')
-      ])
+      const lists = await syncLists(['entities', 'notifications'])
       
-      const entitiesData = entitiesRes.data as { entities: any[] }
-      const notificationsData = notificationsRes.data as { notifications: any[] }
-      
-      setEntities(entitiesData.entities || [])
-      setNotifications(notificationsData.notifications || [])
+      setEntities(lists.entities)
+      setNotifications(lists.notifications.filter(n => !n.is_read))
       
       // Set current financial year
       const now = new Date()
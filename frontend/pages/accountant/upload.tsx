@@ -43,7 +43,7 @@ export default function AccountantUpload() {
 
   const fetchEntities = async () => {
     try {
-      const res = await api.get('/entities/my-entities')
+      const res = await api.get('/entities/my-entities?fields=id,company_name')
       const data = res.data as { entities: any[] }
       setEntities(data.entities || [])
     } catch (error) {
@@ -3,9 +3,11 @@ import { useRouter } from 'next/router'
 import Head from 'next/head'
 import Header from '../../components/Header'
 import { useAuth } from '../../contexts/AuthContext'
-import api from '../../utils/api'
+import api, { authFetch } from '../../utils/api'
 import styles from '../../styles/AdminApprovals.module.css'
 
+const PER_PAGE = 25
+
 export default function AdminApprovals() {
   const router = useRouter()
   const { user, isAuthenticated } = useAuth()
@@ -13,6 +15,12 @@ export default function AdminApprovals() {
   const [loading, setLoading] = useState(true)
   const [selectedEntity, setSelectedEntity] = useState<any>(null)
   const [remarks, setRemarks] = useState('')
+  const [selectedIds, setSelectedIds] = useState<number[]>([])
+  const [page, setPage] = useState(1)
+  const [pages, setPages] = useState(1)
+  const [total, setTotal] = useState(0)
+  const [expandedIds, setExpandedIds] = useState<number[]>([])
+  const [details, setDetails] = useState<Record<number, { entity: any, documents: any[] }>>({})
 
   useEffect(() => {
     if (!isAuthenticated || user?.role !== 'super_admin') {
@@ -22,33 +30,14 @@ export default function AdminApprovals() {
     fetchPendingEntities()
   }, [isAuthenticated])
 
-  const fetchPendingEntities = async () => {
+  const fetchPendingEntities = async (pageNumber: number = page) => {
     try {
-      const res = await api.get('/entities/pending')
-      const data = res.data as { entities: any[] }
-      const entitiesList = data.entities || []
-      
-      // Fetch documents for each entity
-      const entitiesWithDocs = await Promise.all(
-        entitiesList.map(async (entity: any) => {
-          try {
-            const docsRes = await api.get(`/documents/entity/${entity.id}/all`)
-            const docsData = docsRes.data as { permanent_documents: any[], periodic_documents: any[] }
-            return {
-              ...entity,
-              documents: [
-                ...(docsData.permanent_documents || []).map((doc: any) => ({ ...doc, type: 'permanent' })),
-                ...(docsData.periodic_documents || []).map((doc: any) => ({ ...doc, type: 'periodic' }))
-              ]
-            }
-          } catch (error) {
-            console.error(`Failed to fetch documents for entity ${entity.id}:`, error)
-            return { ...entity, documents: [] }
-          }
-        })
-      )
-      
-      setEntities(entitiesWithDocs)
+      const res = await api.get(`/entities/pending?page=${pageNumber}&per_page=${PER_PAGE}`)
+      const data = res.data as { entities: any[], page: number, pages: number, total: number }
+      setEntities(data?.entities || [])
+      setPage(data?.page || 1)
+      setPages(data?.pages || 1)
+      setTotal(data?.total || 0)
     } catch (error) {
       console.error('Failed to fetch pending entities:', error)
     } finally {
@@ -56,6 +45,35 @@ export default function AdminApprovals() {
     }
   }
 
+  // Documents and address are loaded only when a card is expanded
+  const toggleDetails = async (entityId: number) => {
+    if (expandedIds.includes(entityId)) {
+      setExpandedIds(prev => prev.filter(id => id !== entityId))
+      return
+    }
+    setExpandedIds(prev => [...prev, entityId])
+    if (details[entityId]) return
+
+    const res = await api.get(`/entities/${entityId}/documents`)
+    if (res.error) {
+      alert(res.error)
+      return
+    }
+    const data = res.data as { entity: any, documents: any[] }
+    setDetails(prev => ({
+      ...prev,
+      [entityId]: {
+        entity: data.entity,
+        documents: (data.documents || []).map((doc: any) => ({ ...doc, type: 'permanent' }))
+      }
+    }))
+  }
+
+  const goToPage = (pageNumber: number) => {
+    setSelectedIds([])
+    fetchPendingEntities(pageNumber)
+  }
+
   const handleApprove = async (entityId: number) => {
     if (!confirm('Are you sure you want to approve this entity?')) return
 
@@ -88,6 +106,35 @@ export default function AdminApprovals() {
     }
   }
 
+  const toggleSelected = (entityId: number) => {
+    setSelectedIds(prev =>
+      prev.includes(entityId) ? prev.filter(id => id !== entityId) : [...prev, entityId]
+    )
+  }
+
+  const toggleSelectAll = () => {
+    setSelectedIds(selectedIds.length === entities.length ? [] : entities.map(entity => entity.id))
+  }
+
+  const handleBulkReview = async (action: 'approve' | 'reject') => {
+    if (selectedIds.length === 0) return
+    if (action === 'reject' && !remarks.trim()) {
+      alert('Please provide remarks for rejection')
+      return
+    }
+    if (!confirm(`Are you sure you want to ${action} ${selectedIds.length} entities?`)) return
+
+    const res = await api.post(`/entities/bulk-${action}`, { entity_ids: selectedIds, remarks })
+    if (res.error) {
+      alert(res.error)
+      return
+    }
+    alert((res.data as { message: string }).message)
+    setSelectedIds([])
+    setRemarks('')
+    fetchPendingEntities()
+  }
+
   if (loading) {
     return (
       <>
@@ -106,7 +153,7 @@ export default function AdminApprovals() {
       <main className={styles.main}>
         <div className={styles.container}>
           <h1 className={styles.title}>Pending Entity Approvals</h1>
-          <p className={styles.subtitle}>Review and approve or reject pending entity submissions</p>
+          <p className={styles.subtitle}>Review and approve or reject pending entity submissions ({total} pending)</p>
 
           {entities.length === 0 ? (
             <div className={styles.emptyState}>
@@ -114,10 +161,43 @@ export default function AdminApprovals() {
             </div>
           ) : (
             <div className={styles.entitiesList}>
+              <div className={styles.bulkBar}>
+                <label className={styles.selectLabel}>
+                  <input
+                    type="checkbox"
+                    checked={selectedIds.length === entities.length}
+                    onChange={toggleSelectAll}
+                  />
+                  Select all ({selectedIds.length}/{entities.length} selected)
+                </label>
+                <div className={styles.bulkActions}>
+                  <button
+                    className={styles.approveBtn}
+                    disabled={selectedIds.length === 0}
+                    onClick={() => handleBulkReview('approve')}
+                  >
+                    Approve Selected
+                  </button>
+                  <button
+                    className={styles.rejectBtn}
+                    disabled={selectedIds.length === 0}
+                    onClick={() => handleBulkReview('reject')}
+                  >
+                    Reject Selected
+                  </button>
+                </div>
+              </div>
               {entities.map(entity => (
                 <div key={entity.id} className={styles.entityCard}>
                   <div className={styles.entityHeader}>
-                    <h2>{entity.company_name}</h2>
+                    <label className={styles.selectLabel}>
+                      <input
+                        type="checkbox"
+                        checked={selectedIds.includes(entity.id)}
+                        onChange={() => toggleSelected(entity.id)}
+                      />
+                      <h2>{entity.company_name}</h2>
+                    </label>
                     <span className={styles.status}>Pending Approval</span>
                   </div>
 
@@ -131,9 +211,11 @@ export default function AdminApprovals() {
                     <div className={styles.detailRow}>
                       <strong>Company Type:</strong> {entity.company_type}
                     </div>
-                    <div className={styles.detailRow}>
-                      <strong>Address:</strong> {entity.address}
-                    </div>
+                    {details[entity.id] && (
+                      <div className={styles.detailRow}>
+                        <strong>Address:</strong> {details[entity.id].entity.address}
+                      </div>
+                    )}
                     <div className={styles.detailRow}>
                       <strong>Secretary:</strong> {entity.secretary_email || (entity.secretary?.email) || 'N/A'}
                     </div>
@@ -143,12 +225,21 @@ export default function AdminApprovals() {
                   </div>
 
                   <div className={styles.documentsSection}>
-                    <h3>Documents ({entity.documents?.length || 0})</h3>
-                    {!entity.documents || entity.documents.length === 0 ? (
+                    <div className={styles.documentsHeader}>
+                      <h3>
+                        Documents ({entity.document_count || 0}, {((entity.documents_size || 0) / 1024).toFixed(2)} KB)
+                      </h3>
+                      <button className={styles.viewBtn} onClick={() => toggleDetails(entity.id)}>
+                        {expandedIds.includes(entity.id) ? 'Hide details' : 'Show details'}
+                      </button>
+                    </div>
+                    {!expandedIds.includes(entity.id) ? null : !details[entity.id] ? (
+                      <p className={styles.noDocs}>Loading...</p>
+                    ) : details[entity.id].documents.length === 0 ? (
                       <p className={styles.noDocs}>No documents uploaded</p>
                     ) : (
                       <div className={styles.documentsList}>
-                        {entity.documents?.map((doc: any) => (
+                        {details[entity.id].documents.map((doc: any) => (
                           <div key={doc.id} className={styles.documentItem}>
                             <div className={styles.documentInfo}>
                               <span className={styles.docType}>{doc.document_type}</span>
@@ -162,14 +253,9 @@ export default function AdminApprovals() {
                                 className={styles.viewBtn}
                                 onClick={async () => {
                                   try {
-                                    const token = localStorage.getItem('token')
                                     const docType = doc.type || 'permanent'
                                     const url = `${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000/api'}/documents/${docType}/${doc.id}/view`
-                                    const response = await fetch(url, {
-                                      headers: {
-                                        'Authorization': `Bearer ${token}`
-                                      }
-                                    })
+                                    const response = await authFetch(url)
                                     if (response.ok) {
                                       const blob = await response.blob()
                                       const blobUrl = window.URL.createObjectURL(blob)
@@ -190,14 +276,9 @@ export default function AdminApprovals() {
                                 className={styles.downloadBtn}
                                 onClick={async () => {
                                   try {
-                                    const token = localStorage.getItem('token')
                                     const docType = doc.type || 'permanent'
                                     const url = `${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000/api'}/documents/${docType}/${doc.id}/download`
-                                    const response = await fetch(url, {
-                                      headers: {
-                                        'Authorization': `Bearer ${token}`
-                                      }
-                                    })
+                                    const response = await authFetch(url)
                                     if (response.ok) {
                                       const blob = await response.blob()
                                       const blobUrl = window.URL.createObjectURL(blob)
@@ -251,6 +332,17 @@ export default function AdminApprovals() {
                   </div>
                 </div>
               ))}
+              {pages > 1 && (
+                <div className={styles.pagination}>
+                  <button className={styles.viewBtn} disabled={page <= 1} onClick={() => goToPage(page - 1)}>
+                    Previous
+                  </button>
+                  <span>Page {page} of {pages}</span>
+                  <button className={styles.viewBtn} disabled={page >= pages} onClick={() => goToPage(page + 1)}>
+                    Next
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -34,13 +34,14 @@ export default function Dashboard() {
     try {
       if (user?.role === 'super_admin') {
         const [entitiesRes, usersRes] = await Promise.all([
-          api.get('/entities/pending'),
+          // Paginated: one row is enough, the count comes from total
+          api.get('/entities/pending?per_page=1'),
           api.get('/users')
         ])
-        const entitiesData = entitiesRes.data as { entities: any[] }
+        const entitiesData = entitiesRes.data as { total?: number }
         const usersData = usersRes.data as { users?: any[] }
         setStats({
-          pendingEntities: entitiesData.entities?.length || 0,
+          pendingEntities: entitiesData.total || 0,
           totalUsers: usersData?.users?.length || (Array.isArray(usersData) ? usersData.length : 0)
         })
       } else if (user?.role === 'company_secretary') {
@@ -32,7 +32,7 @@ export default function UploadDocument() {
 
   const fetchEntities = async () => {
     try {
-      const res = await api.get('/entities/my-entities')
+      const res = await api.get('/entities/my-entities?fields=id,company_name,status')
       const data = res.data as { entities: any[] }
       setEntities(data.entities || [])
     } catch (error) {
@@ -5,6 +5,7 @@ import Link from 'next/link'
 import Header from '../../components/Header'
 import { useAuth } from '../../contexts/AuthContext'
 import api from '../../utils/api'
+import { syncLists } from '../../utils/syncCache'
 import styles from '../../styles/EntitiesList.module.css'
 
 export default function EntitiesList() {
@@ -34,11 +35,10 @@ export default function EntitiesList() {
 
   const fetchEntities = async () => {
     try {
-      const res = await api.get('/entities/my-entities')
-      console.log('Entities API response:', res.data)
-      alert('Entities API response: ' + JSON.stringify(res.data))
-      const data = res.data as { entities: any[] }
-      setEntities(data.entities || [])
+      const { entities } = await syncLists(['entities'])
+      console.log('Entities API response:', entities)
+      alert('Entities API response: ' + JSON.stringify({ entities }))
+      setEntities(entities)
     } catch (error) {
       console.error('Failed to fetch entities:', error)
       alert('Failed to fetch entities: ' + JSON.stringify(error))
@@ -4,6 +4,7 @@ import Head from 'next/head'
 import Header from '../components/Header'
 import { useAuth } from '../contexts/AuthContext'
 import api from '../utils/api'
+import { syncLists } from '../utils/syncCache'
 import styles from '../styles/Notifications.module.css'
 
 export default function Notifications() {
@@ -23,10 +24,8 @@ export default function Notifications() {
 
   const fetchNotifications = async () => {
     try {
-      const queryParams = filter === 'unread' ? '?unread_only=true' : ''
-      const res = await api.get(`/notifications${queryParams}`)
-      const data = res.data as { notifications: any[] }
-      setNotifications(data.notifications || [])
+      const { notifications } = await syncLists(['notifications'])
+      setNotifications(filter === 'unread' ? notifications.filter(n => !n.is_read) : notifications)
     } catch (error) {
       console.error('Failed to fetch notifications:', error)
     } finally {
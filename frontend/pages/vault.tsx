@@ -3,7 +3,8 @@ import { useRouter } from 'next/router'
 import Head from 'next/head'
 import Header from '../components/Header'
 import { useAuth } from '../contexts/AuthContext'
-import api from '../utils/api'
+import { syncLists } from '../utils/syncCache'
+import { authFetch } from '../utils/api'
 import styles from '../styles/Vault.module.css'
 
 export default function DocumentVault() {
@@ -24,16 +25,15 @@ export default function DocumentVault() {
 
   const fetchVault = async () => {
     try {
-      const queryParams = []
-      if (selectedEntity) queryParams.push(`entity_id=${selectedEntity}`)
-      if (selectedYear) queryParams.push(`financial_year=${selectedYear}`)
-      
-      const queryString = queryParams.length > 0 ? `?${queryParams.join('&')}` : ''
-      const res = await api.get(`/documents/vault${queryString}`)
-      console.log('Vault API response:', res.data)
-      alert('Vault API response: ' + JSON.stringify(res.data))
-      const data = res.data as { vault: any[] }
-      setVault(data.vault || [])
+      // Same filters as /documents/vault: the year only applies to periodic documents
+      const { vault } = await syncLists(['vault'])
+      const filtered = vault.filter(doc =>
+        (!selectedEntity || String(doc.entity_id) === selectedEntity) &&
+        (!selectedYear || doc.doc_type !== 'periodic' || doc.financial_year === selectedYear)
+      )
+      console.log('Vault API response:', filtered)
+      alert('Vault API response: ' + JSON.stringify({ vault: filtered }))
+      setVault(filtered)
     } catch (error) {
       console.error('Failed to fetch vault:', error)
       alert('Failed to fetch vault: ' + JSON.stringify(error))
@@ -44,13 +44,8 @@ export default function DocumentVault() {
 
   const downloadDocument = async (docId: number, fileName: string, docType: string = 'periodic') => {
     try {
-      const token = localStorage.getItem('token')
       const url = `${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000/api'}/documents/${docType}/${docId}/download`
-      const response = await fetch(url, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      })
+      const response = await authFetch(url)
       
       if (response.ok) {
         const blob = await response.blob()
@@ -74,13 +69,8 @@ export default function DocumentVault() {
 
   const viewDocument = async (docId: number, docType: string = 'periodic') => {
     try {
-      const token = localStorage.getItem('token')
       const url = `${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000/api'}/documents/${docType}/${docId}/view`
-      const response = await fetch(url, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      })
+      const response = await authFetch(url)
       
       if (response.ok) {
         const blob = await response.blob()
@@ -5,6 +5,70 @@ interface ApiResponse<T = any> {
   error?: string
 }
 
+let refreshing: Promise<boolean> | null = null
+
+// Run fn while holding a lock shared by all of this site's tabs, where the browser has Web Locks
+async function withRefreshLock(fn: () => Promise<boolean>): Promise<boolean> {
+  if (typeof navigator !== 'undefined' && navigator.locks) {
+    return navigator.locks.request('token-refresh', fn)
+  }
+  return fn()
+}
+
+// Trade the refresh token for a new token pair. Each refresh token works once and
+// reusing one ends the session, so requests that hit a 401 together share a single
+// refresh, and tabs (which share the stored pair) take turns. A tab that gets the
+// lock after another tab rotated the pair uses the stored pair instead
+export function refreshTokens(): Promise<boolean> {
+  if (!refreshing) {
+    const seenRefreshToken = localStorage.getItem('refresh_token')
+    refreshing = withRefreshLock(async () => {
+      const refreshToken = localStorage.getItem('refresh_token')
+      if (!refreshToken) return false
+      if (refreshToken !== seenRefreshToken) return true
+      try {
+        const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+          method: 'POST',
+          headers: { Authorization: `Bearer ${refreshToken}` },
+        })
+        if (!response.ok) return false
+        const data = await response.json()
+        localStorage.setItem('token', data.token)
+        localStorage.setItem('refresh_token', data.refresh_token)
+        return true
+      } catch (error) {
+        return false
+      }
+    }).finally(() => {
+      refreshing = null
+    })
+  }
+  return refreshing
+}
+
+// Whether a request that got a 401 with `usedToken` is worth sending again:
+// another tab or request already renewed the token, or a refresh succeeds now
+async function renewedSince(usedToken: string | null): Promise<boolean> {
+  const current = localStorage.getItem('token')
+  if (current && current !== usedToken) return true
+  return refreshTokens()
+}
+
+// fetch() with the access token for responses read as blobs (downloads, previews),
+// renewing an expired access token once like the API client does
+export async function authFetch(url: string, init: RequestInit = {}): Promise<Response> {
+  const token = localStorage.getItem('token')
+  const send = () => fetch(url, {
+    ...init,
+    headers: { ...init.headers, Authorization: `Bearer ${localStorage.getItem('token')}` },
+  })
+  const response = await send()
+  if (response.status === 401 && await renewedSince(token)) {
+    return send()
+  }
+  return response
+}
+
 class ApiClient {
   private baseURL: string
 
@@ -14,7 +78,8 @@ class ApiClient {
 
   private async request<T>(
     endpoint: string,
-    options: RequestInit = {}
+    options: RequestInit = {},
+    retried = false
   ): Promise<ApiResponse<T>> {
     const url = `${this.baseURL}${endpoint}`
     const token = localStorage.getItem('token')
@@ -24,9 +89,9 @@ class ApiClient {
       ...options.headers,
     }
 
-    // Only set Content-Type if not already set (for FormData)
+    // Only set Content-Type if not already set (for FormData); bodiless GETs need none
     if (!options.headers || !(options.headers as any)['Content-Type']) {
-      if (!(options.body instanceof FormData)) {
+      if (options.body && !(options.body instanceof FormData)) {
         headers['Content-Type'] = 'application/json'
       }
     }
@@ -55,8 +120,13 @@ class ApiClient {
 
       if (!response.ok) {
         if (response.status === 401) {
+          // Access token expired: renew it and try once more
+          if (!retried && endpoint !== '/auth/login' && await renewedSince(token)) {
+            return this.request<T>(endpoint, options, true)
+          }
           // Token expired or invalid
           localStorage.removeItem('token')
+          localStorage.removeItem('refresh_token')
           localStorage.removeItem('user')
           window.location.href = '/login'
           return { error: 'Unauthorized - Please login again' }
@@ -66,6 +136,7 @@ class ApiClient {
           if (data.code === 'INVALID_TOKEN_FORMAT' || (data.error && data.error.includes('Token format'))) {
             console.error('Invalid token format detected - clearing tokens')
             localStorage.removeItem('token')
+            localStorage.removeItem('refresh_token')
             localStorage.removeItem('user')
             // Redirect to login with message
             window.location.href = '/login?error=invalid_token'
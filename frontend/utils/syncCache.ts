@@ -0,0 +1,121 @@
+import api from './api'
+
+// Lists kept in a local cache and brought up to date with /sync/delta
+export type SyncResource = 'entities' | 'vault' | 'notifications'
+
+interface ResourceCache {
+  version: number
+  items: { [key: string]: any }
+}
+
+interface ResourceDelta {
+  version: number
+  upserted: any[]
+  deleted: any[]
+  deleted_entity_ids?: number[]
+}
+
+const STORAGE_PREFIX = 'syncCache:'
+const NOTIFICATION_LIMIT = 100
+
+// Periodic and permanent documents share the vault list, so their ids can collide
+const itemKey = (resource: SyncResource, item: any) =>
+  resource === 'vault' ? `${item.doc_type}:${item.id}` : String(item.id)
+
+const storageKey = (): string | null => {
+  try {
+    const user = JSON.parse(localStorage.getItem('user') || 'null')
+    return user ? `${STORAGE_PREFIX}${user.id}` : null
+  } catch (error) {
+    return null
+  }
+}
+
+const loadCache = (): { [resource: string]: ResourceCache } => {
+  const key = storageKey()
+  if (!key) return {}
+  try {
+    return JSON.parse(localStorage.getItem(key) || '{}')
+  } catch (error) {
+    return {}
+  }
+}
+
+const saveCache = (cache: { [resource: string]: ResourceCache }) => {
+  const key = storageKey()
+  if (!key) return
+  try {
+    localStorage.setItem(key, JSON.stringify(cache))
+  } catch (error) {
+    // Storage full - the next load simply does a full sync
+    localStorage.removeItem(key)
+  }
+}
+
+const applyDelta = (resource: SyncResource, entry: ResourceCache, delta: ResourceDelta) => {
+  delta.deleted.forEach(deleted => {
+    delete entry.items[typeof deleted === 'object' ? itemKey(resource, deleted) : String(deleted)]
+  })
+
+  // Documents of entities the user lost access to
+  const removedEntities = delta.deleted_entity_ids || []
+  if (removedEntities.length > 0) {
+    Object.keys(entry.items).forEach(key => {
+      if (removedEntities.indexOf(entry.items[key].entity_id) !== -1) {
+        delete entry.items[key]
+      }
+    })
+  }
+
+  delta.upserted.forEach(item => {
+    entry.items[itemKey(resource, item)] = item
+  })
+  entry.version = delta.version
+}
+
+const byDateDesc = (field: string) => (a: any, b: any) =>
+  (b[field] || '').localeCompare(a[field] || '')
+
+// Same ordering as the full list endpoints
+const toList = (resource: SyncResource, entry: ResourceCache): any[] => {
+  const items = Object.keys(entry.items).map(key => entry.items[key])
+  if (resource === 'entities') {
+    return items.sort((a, b) => a.id - b.id)
+  }
+  if (resource === 'vault') {
+    const periodic = items.filter(item => item.doc_type === 'periodic').sort(byDateDesc('uploaded_at'))
+    const permanent = items.filter(item => item.doc_type === 'permanent').sort(byDateDesc('uploaded_at'))
+    return periodic.concat(permanent)
+  }
+  return items.sort(byDateDesc('created_at')).slice(0, NOTIFICATION_LIMIT)
+}
+
+/**
+ * Fetch only what changed since the last call and return the full, current lists.
+ * The first call for a resource (or after logout) does a full sync.
+ */
+export async function syncLists(resources: SyncResource[]): Promise<{ [resource: string]: any[] }> {
+  const cache = loadCache()
+  const params = resources.map(resource => `${resource}=${cache[resource] ? cache[resource].version : 0}`)
+  const res = await api.get(`/sync/delta?${params.join('&')}`)
+  if (res.error || !res.data) {
+    throw new Error(res.error || 'Sync failed')
+  }
+
+  const data = res.data as { [resource: string]: ResourceDelta }
+  const lists: { [resource: string]: any[] } = {}
+  resources.forEach(resource => {
+    const entry = cache[resource] || { version: 0, items: {} }
+    applyDelta(resource, entry, data[resource])
+    cache[resource] = entry
+    lists[resource] = toList(resource, entry)
+  })
+  saveCache(cache)
+  return lists
+}
+
+export function clearSyncCache() {
+  Object.keys(localStorage)
+    .filter(key => key.indexOf(STORAGE_PREFIX) === 0)
+    .forEach(key => localStorage.removeItem(key))
+}